@@ -2,8 +2,13 @@ import streamlit as st
 import pandas as pd
 import sqlite3
 import os
+import sys
 from PIL import Image
-from secciones import kpis, alertas, cliente_detalle, resumen, comparacion_modelos
+
+# Módulos compartidos con el pipeline (almacén gold, esquema de la base de datos)
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
+
+from secciones import kpis, alertas, cliente_detalle, resumen, comparacion_modelos, datos
 
 
 # Configuración general de la app
@@ -24,13 +29,13 @@ def obtener_fecha_extremos():
     conn = sqlite3.connect("db/optigas.db")
     df = pd.read_sql("SELECT MIN(timestamp) as min_fecha, MAX(timestamp) as max_fecha FROM gold_anomalias", conn)
     conn.close()
-    return pd.to_datetime(df["min_fecha"].iloc[0]), pd.to_datetime(df["max_fecha"].iloc[0])
+    return pd.to_datetime(df["min_fecha"].iloc[0], unit="s"), pd.to_datetime(df["max_fecha"].iloc[0], unit="s")
 
 # 🧭 Filtros globales
 with st.sidebar:
     st.header("🎛️ Filtros")
 
-    clientes = ["Todos"] + kpis.obtener_clientes()
+    clientes = ["Todos"] + datos.clientes()
     cliente = st.selectbox("Cliente", options=clientes)
 
     fecha_min_data, fecha_max_data = obtener_fecha_extremos()
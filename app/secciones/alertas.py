@@ -1,30 +1,22 @@
 import streamlit as st
 import pandas as pd
-import sqlite3
 import plotly.express as px
-
-@st.cache_data
-def cargar_datos():
-    conn = sqlite3.connect("db/optigas.db")
-    df = pd.read_sql("SELECT * FROM gold_anomalias", conn)
-    df['timestamp'] = pd.to_datetime(df['timestamp'])
-    conn.close()
-    return df
+from secciones import datos
 
 def mostrar_alertas(cliente="Todos", fecha=None, severidades=None):
-    df = cargar_datos()
-
-    if cliente != "Todos":
-        df = df[df['cliente_id'] == cliente]
-    if fecha:
-        fecha_inicio, fecha_fin = fecha
-        df = df[(df['timestamp'] >= pd.to_datetime(fecha_inicio)) & (df['timestamp'] <= pd.to_datetime(fecha_fin))]
-    if severidades:
-        df = df[df['severidad'].isin(severidades)]
-
-    # Filtrar alertas recientes
-    df_alertas = df[df['severidad'] != "OK"].sort_values(by="timestamp", ascending=False)
-    df_ultimos3 = df_alertas[df_alertas['timestamp'] >= df_alertas['timestamp'].max() - pd.Timedelta(days=5)]
+    # Solo las 50 alertas (severidad distinta de OK) más recientes
+    df_alertas_ordenadas = datos.lecturas(cliente, fecha, severidades, solo_alertas=True, recientes=50)
+
+    # Alertas de los 5 días previos a la última alerta (cliente_id como texto para
+    # que los conteos y gráficos solo incluyan los clientes con alertas)
+    df_ultimos3 = df_alertas_ordenadas.iloc[0:0]
+    if not df_alertas_ordenadas.empty:
+        ultima = df_alertas_ordenadas['timestamp'].max()
+        inicio = ultima - pd.Timedelta(days=5)
+        if fecha:
+            inicio = max(inicio, pd.to_datetime(fecha[0]))
+        df_ultimos3 = datos.lecturas(cliente, (inicio, ultima), severidades, solo_alertas=True)
+    df_ultimos3['cliente_id'] = df_ultimos3['cliente_id'].astype(str)
 
     # Layout en dos columnas
     col1, col2 = st.columns([2,3])
@@ -32,9 +24,6 @@ def mostrar_alertas(cliente="Todos", fecha=None, severidades=None):
     with col1:
         st.subheader("🚨 Alertas recientes de anomalías (últimas 50)")
 
-        # Ordenar por timestamp descendente y tomar las 50 más recientes
-        df_alertas_ordenadas = df_alertas.sort_values(by="timestamp", ascending=False).head(50)
-
         st.dataframe(
             df_alertas_ordenadas[['timestamp', 'cliente_id', 'presion', 'temperatura', 'volumen', 'severidad']],
             use_container_width=True
@@ -1,17 +1,14 @@
 import streamlit as st
-import pandas as pd
-import sqlite3
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
-
-@st.cache_data(ttl=3600)  # Cache por 1 hora
+from secciones import datos, submuestreo
 
 def visualizar_cliente(cliente="Todos", fecha=None, severidades=None):
     if cliente == "Todos":
         st.info("Selecciona un cliente para ver su análisis detallado.")
         return
 
-    df = filtrar_datos(cargar_datos(), cliente, fecha, severidades)
+    df = datos.lecturas(cliente, fecha, severidades)
     
     if df.empty:
         st.warning("No hay datos disponibles para el cliente y rango de fechas seleccionado.")
@@ -36,25 +33,6 @@ def visualizar_cliente(cliente="Todos", fecha=None, severidades=None):
         #comparacion_modelos.mostrar_comparacion(cliente_id=cliente)
 
 
-def cargar_datos():
-    conn = sqlite3.connect("db/optigas.db")
-    df = pd.read_sql("SELECT timestamp, cliente_id, volumen, presion, temperatura, severidad FROM gold_anomalias", conn)
-    conn.close()
-    
-    # Optimizar tipos de datos
-    df['timestamp'] = pd.to_datetime(df['timestamp'])
-    df['severidad'] = df['severidad'].astype('category')
-    return df
-
-def filtrar_datos(df, cliente, fecha, severidades):
-    fecha_inicio, fecha_fin = fecha
-    df_filtrado = df[df['cliente_id'] == cliente].copy()    
-    mask = (df_filtrado['timestamp'] >= pd.to_datetime(fecha_inicio)) & (df_filtrado['timestamp'] <= pd.to_datetime(fecha_fin))
-    df_filtrado = df_filtrado[mask]
-    df_filtrado = df_filtrado[df_filtrado['severidad'].isin(severidades)]
-    
-    return df_filtrado
-
 def crear_grafico_scatter(df, x_col, y_col, color_map):
     fig = go.Figure()
     
@@ -78,6 +56,9 @@ def crear_grafico_scatter(df, x_col, y_col, color_map):
     return fig
 
 def crear_time_series(df, y_col, title, color_map):
+    # Min/max por cubeta de tiempo; las lecturas Alto y Potencial se conservan todas
+    df = submuestreo.submuestrear(df, [y_col])
+
     fig = go.Figure()
     fig.add_trace(
         go.Scattergl(
@@ -89,9 +70,8 @@ def crear_time_series(df, y_col, title, color_map):
         )
     )   
 
-    df_sample = df.sample(1000) if len(df) > 1000 else df.copy()# Muestrear datos si hay muchos puntos (>1000)
     for severity, color in color_map.items():
-        df_sub = df_sample[df_sample['severidad'] == severity]
+        df_sub = df[df['severidad'] == severity]
         fig.add_trace(
             go.Scattergl(
                 x=df_sub['timestamp'],
@@ -153,21 +133,26 @@ def visualizar_variables(df_filtrado):
     fig = make_subplots(rows=3, cols=1, shared_xaxes=True, 
                         subplot_titles=("Volumen", "Presión", "Temperatura"))
 
+    # Cada serie se reduce por separado con min/max por cubeta de tiempo
+    serie_volumen = submuestreo.submuestrear(df_filtrado, ['volumen'])
+    serie_presion = submuestreo.submuestrear(df_filtrado, ['presion'])
+    serie_temperatura = submuestreo.submuestrear(df_filtrado, ['temperatura'])
+
     fig.add_trace(
-        go.Scatter(x=df_filtrado['timestamp'], y=df_filtrado['volumen'], 
-                   mode='lines', name='Volumen', line=dict(color='steelblue')),
+        go.Scattergl(x=serie_volumen['timestamp'], y=serie_volumen['volumen'],
+                     mode='lines', name='Volumen', line=dict(color='steelblue')),
         row=1, col=1
     )
 
     fig.add_trace(
-        go.Scatter(x=df_filtrado['timestamp'], y=df_filtrado['presion'], 
-                   mode='lines', name='Presión', line=dict(color='darkred')),
+        go.Scattergl(x=serie_presion['timestamp'], y=serie_presion['presion'],
+                     mode='lines', name='Presión', line=dict(color='darkred')),
         row=2, col=1
     )
 
     fig.add_trace(
-        go.Scatter(x=df_filtrado['timestamp'], y=df_filtrado['temperatura'], 
-                   mode='lines', name='Temperatura', line=dict(color='green')),
+        go.Scattergl(x=serie_temperatura['timestamp'], y=serie_temperatura['temperatura'],
+                     mode='lines', name='Temperatura', line=dict(color='green')),
         row=3, col=1
     )
 
@@ -1,21 +1,21 @@
 import streamlit as st
 import sqlite3
 import pandas as pd
+import esquema_db
 
 def mostrar_comparacion(cliente_id):
     st.markdown("### 📊 Comparación con Normativa OIML R137")
 
-    # Cargar datos
+    # Cargar datos del cliente. gold_anomalias guarda el timestamp en segundos
+    # epoch; ambos lados se convierten a datetime antes de unir
+    clausula, params = esquema_db.filtro_sql([cliente_id])
     conn = sqlite3.connect("db/optigas.db")
-    df_fisica = pd.read_sql("SELECT cliente_id, timestamp, tipo_anomalia_fisica FROM gold_validacion_fisica", conn)
-    df_modelo = pd.read_sql("SELECT cliente_id, timestamp, anomalia_iso, anomalia_svm FROM gold_anomalias", conn)
+    df_fisica = esquema_db.leer_sql(
+        f"SELECT cliente_id, timestamp, tipo_anomalia_fisica FROM gold_validacion_fisica{clausula}", conn, params)
+    df_modelo = esquema_db.leer_sql(
+        f"SELECT cliente_id, timestamp, anomalia_iso, anomalia_svm FROM gold_anomalias{clausula}", conn, params)
     conn.close()
 
-    # Filtrar por cliente_id
-    df_fisica = df_fisica[df_fisica['cliente_id'] == cliente_id]
-    df_modelo = df_modelo[df_modelo['cliente_id'] == cliente_id]
-
-
     # Unir
     df = pd.merge(df_modelo, df_fisica, on=['cliente_id', 'timestamp'], how='left')
 
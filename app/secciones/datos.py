@@ -0,0 +1,260 @@
+import copy
+import functools
+import inspect
+import os
+import sqlite3
+import threading
+from collections import OrderedDict
+
+import pandas as pd
+import streamlit as st
+
+import almacen_gold
+import esquema_db
+import resumen_diario
+
+DB_PATH = "db/optigas.db"
+
+# Columnas de gold_anomalias que usan las secciones del dashboard
+COLUMNAS = ['timestamp', 'cliente_id', 'presion', 'temperatura', 'volumen', 'severidad']
+
+# Columnas de las lecturas que entran al resumen diario
+COLUMNAS_RESUMEN = ['timestamp', 'cliente_id', 'volumen', 'severidad']
+
+# Tipos compactos en memoria: categorías para textos repetidos y float32 para medidas
+TIPOS = {
+    'cliente_id': 'category',
+    'severidad': 'category',
+    'presion': 'float32',
+    'temperatura': 'float32',
+    'volumen': 'float32',
+}
+
+# Bytes por fila con esos tipos: timestamp, dos códigos de categoría y tres float32
+BYTES_POR_FILA = 8 + 1 + 1 + 3 * 4
+
+# Memoria máxima (MB) del conjunto compartido. Si la tabla no cabe, cada sección
+# lee solo las filas de sus filtros desde el almacén o SQLite
+PRESUPUESTO_MB = float(os.environ.get("OPTIGAS_PRESUPUESTO_MB", 256))
+
+# Resultados por combinación de filtros que se conservan en memoria; al superar
+# cualquiera de los dos límites se descartan los usados hace más tiempo
+ENTRADAS_CACHE = 64
+MEMORIA_CACHE_MB = PRESUPUESTO_MB / 4
+
+
+class CacheLRU:
+    """
+    Resultados de consultas por clave con desalojo LRU, válidos para una versión de
+    los datos: al consultar con otra versión se vacía por completo.
+    """
+
+    def __init__(self, entradas=ENTRADAS_CACHE, memoria_mb=MEMORIA_CACHE_MB):
+        self.entradas = entradas
+        self.memoria = memoria_mb * 1024 * 1024
+        self.version = None
+        self.resultados = OrderedDict()
+        self.bytes = 0
+        self.candado = threading.Lock()
+
+    def obtener(self, version, clave, calcular):
+        with self.candado:
+            if version != self.version:
+                self.resultados.clear()
+                self.bytes = 0
+                self.version = version
+            if clave in self.resultados:
+                self.resultados.move_to_end(clave)
+                return self.resultados[clave][0]
+
+        valor = calcular()
+        tamano = int(valor.memory_usage(index=True).sum()) if isinstance(valor, pd.DataFrame) else 0
+        with self.candado:
+            if version == self.version and clave not in self.resultados:
+                self.resultados[clave] = (valor, tamano)
+                self.bytes += tamano
+                while len(self.resultados) > self.entradas or (self.bytes > self.memoria and len(self.resultados) > 1):
+                    self.bytes -= self.resultados.popitem(last=False)[1][1]
+        return valor
+
+
+def compactar(df):
+    return df.astype({c: t for c, t in TIPOS.items() if c in df.columns})
+
+
+def leer(clientes=None, desde=None, hasta=None, columnas=COLUMNAS, severidades=None, recientes=None):
+    """
+    Lee gold_anomalias con solo `columnas`, desde el almacén columnar si existe o
+    desde SQLite, filtrando clientes, fechas y severidades en la lectura. Con
+    `recientes` devuelve solo las N filas más recientes, en orden descendente.
+    """
+    if almacen_gold.existe_tabla("anomalias"):
+        if recientes is not None:
+            df = almacen_gold.leer_ultimas("anomalias", recientes, clientes, desde, hasta, columnas, severidades)
+        else:
+            df = almacen_gold.leer_tabla("anomalias", clientes=clientes, desde=desde, hasta=hasta, columnas=columnas,
+                                         severidades=severidades)
+        return compactar(df[list(columnas)])
+
+    where, params = esquema_db.filtro_sql(clientes, desde, hasta, severidades)
+    query = f"SELECT {', '.join(columnas)} FROM gold_anomalias{where}"
+    if recientes is not None:
+        query += " ORDER BY timestamp DESC, cliente_id LIMIT ?"
+        params.append(recientes)
+    conn = sqlite3.connect(DB_PATH)
+    df = esquema_db.leer_sql(query, conn, params=params)
+    conn.close()
+    return compactar(df)
+
+
+def contar_filas():
+    if almacen_gold.existe_tabla("anomalias"):
+        return almacen_gold.contar_filas("anomalias")
+    conn = sqlite3.connect(DB_PATH)
+    filas = conn.execute("SELECT COUNT(*) FROM gold_anomalias").fetchone()[0]
+    conn.close()
+    return filas
+
+
+def version_datos():
+    """
+    Versión de gold_anomalias que la detección incrementa al terminar de escribir.
+    Si la base no la tiene (p. ej. cargada por una versión anterior del pipeline),
+    se usan la fecha de modificación y el tamaño de la base y de su archivo WAL,
+    donde quedan las escrituras hasta el siguiente checkpoint.
+    """
+    conn = sqlite3.connect(DB_PATH)
+    version = esquema_db.leer_version(conn, "gold_anomalias")
+    conn.close()
+    if version is not None:
+        return version
+    archivos = [DB_PATH, DB_PATH + "-wal"]
+    return tuple((s.st_mtime_ns, s.st_size) for s in (os.stat(a) for a in archivos if os.path.exists(a)))
+
+
+@st.cache_resource
+def cache_consultas():
+    return CacheLRU()
+
+
+def congelar(valor):
+    return tuple(valor) if isinstance(valor, list) else valor
+
+
+def en_cache(funcion):
+    """
+    Sirve los resultados de `funcion` desde cache_consultas, por argumentos y
+    versión de los datos. Cada llamada recibe una copia, como con st.cache_data.
+    """
+    firma = inspect.signature(funcion)
+
+    @functools.wraps(funcion)
+    def envoltura(*args, **kwargs):
+        argumentos = firma.bind(*args, **kwargs)
+        argumentos.apply_defaults()
+        clave = (funcion.__name__, *(congelar(v) for v in argumentos.arguments.values()))
+        valor = cache_consultas().obtener(version_datos(), clave, lambda: funcion(*args, **kwargs))
+        return copy.copy(valor)
+    return envoltura
+
+
+@st.cache_resource(show_spinner="Cargando datos de anomalías...", max_entries=1)
+def conjunto_compartido(version):
+    """
+    Un único DataFrame con COLUMNAS de toda la tabla, compartido por todas las
+    secciones y sesiones (cache_resource no copia el objeto en cada llamada) y
+    recargado cuando cambia la `version` de los datos. None si su tamaño estimado
+    supera PRESUPUESTO_MB.
+    """
+    mb = contar_filas() * BYTES_POR_FILA / 1024 / 1024
+    if mb > PRESUPUESTO_MB:
+        return None
+    return leer()
+
+
+@en_cache
+def lecturas(cliente="Todos", fecha=None, severidades=None, columnas=COLUMNAS, solo_alertas=False, recientes=None):
+    """
+    Filas del cliente ("Todos" = sin filtro), rango de fechas y severidades pedidos,
+    con solo `columnas`; con `solo_alertas` se excluyen las filas OK y con
+    `recientes` se devuelven solo las N más recientes (timestamp descendente). Se
+    filtran del conjunto compartido o, si no cabe en el presupuesto, los filtros se
+    resuelven en la consulta al almacén o a SQLite.
+    """
+    desde, hasta = (pd.to_datetime(fecha[0]), pd.to_datetime(fecha[1])) if fecha else (None, None)
+    clientes = None if cliente in (None, "Todos") else [cliente]
+    severidades = list(severidades) if severidades else None
+    if solo_alertas:
+        severidades = [s for s in (severidades or resumen_diario.SEVERIDADES) if s != "OK"]
+
+    df = conjunto_compartido(version_datos())
+    if df is None:
+        return leer(clientes, desde, hasta, columnas, severidades, recientes)
+
+    mascara = pd.Series(True, index=df.index)
+    if clientes is not None:
+        mascara &= df['cliente_id'] == cliente
+    if desde is not None:
+        mascara &= (df['timestamp'] >= desde) & (df['timestamp'] <= hasta)
+    if severidades is not None:
+        mascara &= df['severidad'].isin(severidades)
+    df = df.loc[mascara, list(columnas)]
+    if recientes is not None:
+        df = df.sort_values(['timestamp', 'cliente_id'], ascending=[False, True]).head(recientes)
+    return df.reset_index(drop=True)
+
+
+def resumen_guardado(clientes=None, desde=None, hasta=None):
+    """
+    Días del resumen diario (gold_resumen_diario) cuyo inicio está entre desde y
+    hasta. Si la detección aún no generó el resumen, se calcula desde las lecturas.
+    """
+    if almacen_gold.existe_tabla(resumen_diario.TABLA_ALMACEN):
+        return almacen_gold.leer_tabla(resumen_diario.TABLA_ALMACEN, clientes=clientes, desde=desde, hasta=hasta)
+
+    conn = sqlite3.connect(DB_PATH)
+    guardado = esquema_db.esquema_vigente(conn, resumen_diario.TABLA)
+    if guardado:
+        where, params = esquema_db.filtro_sql(clientes, desde, hasta)
+        df = esquema_db.leer_sql(f"SELECT * FROM {resumen_diario.TABLA}{where}", conn, params=params)
+        df['ultima_lectura'] = pd.to_datetime(df['ultima_lectura'], unit='s')
+    conn.close()
+    if not guardado:
+        df = resumen_diario.calcular(leer(clientes, desde, hasta, COLUMNAS_RESUMEN))
+    return df
+
+
+@en_cache
+def resumen_por_dia(cliente="Todos", fecha=None):
+    """
+    Resumen por cliente y día de las lecturas del rango de fechas, listo para
+    combinar con resumen_diario.combinar. Los días completos salen del resumen
+    guardado; solo los días parciales de los extremos del rango se resumen desde
+    las lecturas, así que el resultado es igual al de agregar todas las lecturas.
+    """
+    clientes = None if cliente in (None, "Todos") else [cliente]
+    if not fecha:
+        return resumen_guardado(clientes)
+
+    desde, hasta = pd.to_datetime(fecha[0]), pd.to_datetime(fecha[1])
+    primer_dia, fin_dia = desde.ceil('D'), (hasta + pd.Timedelta(1, 'ns')).floor('D')
+    if primer_dia >= fin_dia:
+        return resumen_diario.calcular(lecturas(cliente, fecha, columnas=COLUMNAS_RESUMEN))
+
+    partes = [resumen_guardado(clientes, primer_dia, fin_dia - pd.Timedelta(1, 'ns'))]
+    if desde < primer_dia:
+        partes.append(resumen_diario.calcular(
+            lecturas(cliente, (desde, primer_dia - pd.Timedelta(1, 'ns')), columnas=COLUMNAS_RESUMEN)))
+    if fin_dia <= hasta:
+        partes.append(resumen_diario.calcular(lecturas(cliente, (fin_dia, hasta), columnas=COLUMNAS_RESUMEN)))
+    return pd.concat(partes, ignore_index=True)
+
+
+@en_cache
+def clientes():
+    if almacen_gold.existe_tabla("anomalias"):
+        return almacen_gold.clientes_tabla("anomalias")
+    conn = sqlite3.connect(DB_PATH)
+    df = pd.read_sql("SELECT DISTINCT cliente_id FROM gold_anomalias", conn)
+    conn.close()
+    return sorted(df['cliente_id'])
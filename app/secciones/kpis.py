@@ -1,40 +1,28 @@
 import streamlit as st
 import pandas as pd
-import sqlite3
-import requests
-from io import BytesIO
-import tempfile
-import os
-import streamlit as st
-
-
-@st.cache_data
-def cargar_datos():
-    conn = sqlite3.connect("db/optigas.db")
-    df = pd.read_sql("SELECT * FROM gold_anomalias", conn)
-    df['timestamp'] = pd.to_datetime(df['timestamp'])
-    conn.close()
-    return df
+from secciones import datos
 
-def obtener_clientes():
-    df = cargar_datos()
-    return sorted(df['cliente_id'].unique())
 
 def mostrar_kpis(fecha=None):
-    df = cargar_datos()
-
-    if fecha:
-        fecha_inicio, fecha_fin = fecha
-        df = df[(df['timestamp'] >= pd.to_datetime(fecha_inicio)) & (df['timestamp'] <= pd.to_datetime(fecha_fin))]
+    # Resumen diario por cliente en lugar de las lecturas horarias
+    df = datos.resumen_por_dia(fecha=fecha)
+    filas = df['filas'].sum()
 
     col1, col2, col3 = st.columns(3)
-    col1.metric("📦 Volumen Total (m³)", f"{df['volumen'].sum():,.2f}")
-    col2.metric("📈 Consumo Promedio Diario", f"{df.groupby(df['timestamp'].dt.date)['volumen'].sum().mean():,.2f}")
-    col3.metric("⚠️ Porc. Lecturas Anómalas", f"{(df['severidad'] != 'OK').mean() * 100:.2f}%")
+    col1.metric("📦 Volumen Total (m³)", f"{df['volumen_suma'].sum():,.2f}")
+    col2.metric("📈 Consumo Promedio Diario", f"{df.groupby('timestamp')['volumen_suma'].sum().mean():,.2f}")
+    col3.metric("⚠️ Porc. Lecturas Anómalas", f"{(filas - df['num_OK'].sum()) / filas * 100:.2f}%")
+
+    # Lecturas de los 5 días previos a la última lectura del rango
+    ultima = df['ultima_lectura'].max()
+    ultimos_3_dias = df.iloc[0:0]
+    if pd.notna(ultima):
+        inicio = ultima - pd.Timedelta(days=5)
+        if fecha:
+            inicio = max(inicio, pd.to_datetime(fecha[0]))
+        ultimos_3_dias = datos.resumen_por_dia(fecha=(inicio, ultima))
 
-    ultimos_3_dias = df[df['timestamp'] >= df['timestamp'].max() - pd.Timedelta(days=5)]
-    
     col4, col5, col6 = st.columns(3)
     col4.metric("🧪 Clientes Monitoreados", df['cliente_id'].nunique())
-    col5.metric("🚨 Alertas (últimos 20 días)", ultimos_3_dias.shape[0])
+    col5.metric("🚨 Alertas (últimos 20 días)", ultimos_3_dias['filas'].sum())
     col6.metric("👥 Clientes con alerta (últimos 20 días)", ultimos_3_dias['cliente_id'].nunique())
@@ -1,46 +1,39 @@
 import streamlit as st
 import pandas as pd
-import sqlite3
-
-@st.cache_data
-
-
-def cargar_datos():
-    conn = sqlite3.connect("db/optigas.db")
-    df = pd.read_sql("SELECT * FROM gold_anomalias", conn)
-    df['timestamp'] = pd.to_datetime(df['timestamp'])
-    df['severidad'] = df['severidad'].astype('category')
-    conn.close()
-    return df
+import resumen_diario
+from secciones import datos
 
 
 def mostrar_tabla_resumen(fecha=None, cliente="Todos"):
     st.markdown("## 🧾 Resumen Descriptivo por Cliente")
 
-    df = cargar_datos()
-
-    if cliente != "Todos":
-        df = df[df['cliente_id'] == cliente]
-
-    if fecha:
-        fecha_inicio, fecha_fin = fecha
-        df = df[(df['timestamp'] >= pd.to_datetime(fecha_inicio)) & (df['timestamp'] <= pd.to_datetime(fecha_fin))]
-
-    fecha_max = df['timestamp'].max()
-    fecha_corte = fecha_max - pd.DateOffset(days=30)
-
-    resumen = df.groupby("cliente_id").agg(
-        consumo_promedio=('volumen', 'mean'),
-        consumo_minimo=('volumen', 'min'),
-        consumo_maximo=('volumen', 'max'),
-        desviacion=('volumen', 'std'),
-        CUM=('volumen', lambda x: x[df.loc[x.index, 'timestamp'] >= fecha_corte].sum()),
-        num_Alto=('severidad', lambda x: (x == 'Alto').sum()),
-        num_Potencial=('severidad', lambda x: (x == 'Potencial').sum()),
-        num_normales=('severidad', lambda x: (x == 'OK').sum()),
-        total_anomalias=('severidad', lambda x: (x != 'OK').sum()),
-        porcentaje_anomalias=('severidad', lambda x: (x != 'OK').mean() * 100)
-    ).reset_index()
+    # Totales por cliente a partir del resumen diario
+    diario = datos.resumen_por_dia(cliente, fecha)
+    total = resumen_diario.combinar(diario)
+
+    # Consumo de los últimos 30 días previos a la última lectura
+    fecha_max = diario['ultima_lectura'].max()
+    cum = pd.Series(0.0, index=total.index)
+    if pd.notna(fecha_max):
+        fecha_corte = fecha_max - pd.DateOffset(days=30)
+        if fecha:
+            fecha_corte = max(fecha_corte, pd.to_datetime(fecha[0]))
+        ultimos = resumen_diario.combinar(datos.resumen_por_dia(cliente, (fecha_corte, fecha_max)))
+        cum = ultimos['volumen_suma'].reindex(total.index, fill_value=0.0)
+
+    anomalias = total['filas'] - total['num_OK']
+    resumen = pd.DataFrame({
+        'consumo_promedio': total['volumen_media'],
+        'consumo_minimo': total['volumen_min'],
+        'consumo_maximo': total['volumen_max'],
+        'desviacion': total['volumen_std'],
+        'CUM': cum,
+        'num_Alto': total['num_Alto'],
+        'num_Potencial': total['num_Potencial'],
+        'num_normales': total['num_OK'],
+        'total_anomalias': anomalias,
+        'porcentaje_anomalias': anomalias / total['filas'] * 100,
+    }).reset_index()
 
     resumen['rel_CUM'] = resumen['CUM'] / resumen['consumo_promedio']
 
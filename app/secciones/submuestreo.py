@@ -0,0 +1,44 @@
+import numpy as np
+
+# Puntos máximos por serie que se envían al navegador (unos dos por píxel de un
+# gráfico ancho), sin contar las alertas
+PUNTOS_MAXIMOS = 2000
+
+# Severidades que siempre se dibujan, sin importar cuántas lecturas haya
+SEVERIDADES_ALERTA = ['Alto', 'Potencial']
+
+
+def submuestrear(df, columnas, puntos=PUNTOS_MAXIMOS, x='timestamp'):
+    """
+    Reduce las lecturas a dibujar con min/max por cubeta: divide el rango de tiempo
+    visible en cubetas de igual duración y en cada una conserva la primera, la
+    última y las lecturas con el valor mínimo y máximo de cada columna. A ese ancho
+    la línea se ve igual que con todas las lecturas. Las lecturas Alto y Potencial
+    se conservan siempre. Si hay `puntos` lecturas o menos se devuelven todas.
+    """
+    if len(df) <= puntos:
+        return df
+
+    df = df.sort_values(x)
+    t = df[x].to_numpy('datetime64[ns]').astype('int64')
+    n_cubetas = max(1, puntos // (2 + 2 * len(columnas)))
+    cubeta = np.minimum((t - t[0]) // ((t[-1] - t[0]) // n_cubetas + 1), n_cubetas - 1)
+
+    # Las lecturas están ordenadas por tiempo, así que cada cubeta es un tramo contiguo
+    inicio = np.flatnonzero(np.r_[True, cubeta[1:] != cubeta[:-1]])
+    conservar = np.zeros(len(df), dtype=bool)
+    conservar[inicio] = True
+    conservar[np.r_[inicio[1:], len(df)] - 1] = True
+
+    for columna in columnas:
+        y = df[columna].to_numpy('float64')
+        valido = ~np.isnan(y)
+        for signo in (1, -1):
+            # Ordenar por cubeta y valor: la primera lectura de cada cubeta es su mínimo (o máximo)
+            orden = np.lexsort((np.where(valido, signo * y, np.inf), cubeta))
+            primeras = orden[np.r_[True, cubeta[orden][1:] != cubeta[orden][:-1]]]
+            conservar[primeras[valido[primeras]]] = True
+
+    if 'severidad' in df.columns:
+        conservar |= df['severidad'].isin(SEVERIDADES_ALERTA).to_numpy()
+    return df[conservar]
@@ -0,0 +1,186 @@
+import argparse
+import json
+import os
+import sys
+import tempfile
+from datetime import datetime
+from pathlib import Path
+
+RAIZ = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(RAIZ / "src"))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+import anomaly_detection
+import etl_raw_to_gold
+import perfilado
+from generador import generar_lecturas, escribir_excel
+
+# Escalas relativas al volumen actual (Datos.xlsx: 20 clientes con ~5 años de
+# lecturas horarias, unas 870 mil filas): (clientes, años)
+ESCALAS = {
+    "0.1x": (20, 0.5),
+    "1x": (20, 5),
+    "10x": (200, 5),
+}
+
+# Excels sintéticos ya generados, por escala y semilla
+DATOS_DIR = RAIZ / "data" / "cache" / "benchmarks"
+LINEA_BASE = RAIZ / "benchmarks" / "linea_base.json"
+
+# Caída de filas por segundo tolerada respecto de la línea base antes de fallar
+UMBRAL_REGRESION = 0.2
+
+# Las etapas más cortas que esto se reportan pero no se comparan (demasiado ruido)
+SEGUNDOS_MINIMOS = 0.5
+
+
+def interpretar_escala(nombre):
+    """
+    Una escala de ESCALAS o una personalizada "<clientes>:<años>" (p. ej. 5:0.25).
+    """
+    if nombre in ESCALAS:
+        return ESCALAS[nombre]
+    clientes, anios = nombre.split(":")
+    return int(clientes), float(anios)
+
+
+def excel_sintetico(nombre, semilla):
+    """
+    Ruta del Excel sintético de la escala, que se genera la primera vez.
+    """
+    clientes, anios = interpretar_escala(nombre)
+    ruta = DATOS_DIR / f"sintetico-{clientes}c-{anios}a-s{semilla}.xlsx"
+    if not ruta.exists():
+        print(f"🧪 Generando datos sintéticos: {clientes} clientes x {anios} años")
+        escribir_excel(generar_lecturas(clientes, anios, semilla), ruta)
+    return ruta
+
+
+def registrar_clientes(n_clientes):
+    """
+    La detección solo procesa los clientes del diccionario Cliente; los clientes
+    sintéticos adicionales usan los parámetros de CLIENTE1.
+    """
+    for i in range(1, n_clientes + 1):
+        anomaly_detection.Cliente.setdefault(f"CLIENTE{i}", dict(anomaly_detection.Cliente["CLIENTE1"]))
+
+
+def medir_escala(nombre, semilla=42, n_workers=1):
+    """
+    Ejecuta el ETL completo (sin checkpoints) y la detección sobre el Excel de la
+    escala en un directorio de trabajo temporal. Devuelve los segundos y filas por
+    segundo de cada etapa, como "proceso/etapa".
+    """
+    excel = excel_sintetico(nombre, semilla)
+    registrar_clientes(interpretar_escala(nombre)[0])
+    perfil_etl = perfilado.Perfil("etl")
+    perfil_deteccion = perfilado.Perfil("deteccion")
+
+    directorio_original = os.getcwd()
+    with tempfile.TemporaryDirectory(prefix="optigas-benchmark-") as trabajo:
+        os.chdir(trabajo)
+        try:
+            os.makedirs("db")
+            etl_raw_to_gold.procesar_hojas_excel(excel, "db/optigas.db", export_csv=False, n_workers=n_workers,
+                                                 usar_checkpoints=False, perfil=perfil_etl)
+            anomaly_detection.entrenar_por_cliente("db/optigas.db", perfil_deteccion, n_workers=n_workers)
+        finally:
+            os.chdir(directorio_original)
+
+    etapas = {}
+    for perfil in (perfil_etl, perfil_deteccion):
+        for registro in perfil.etapas:
+            filas = registro["filas_entrada"] or registro["filas_salida"]
+            etapas[f"{perfil.proceso}/{registro['etapa']}"] = {
+                "segundos": registro["segundos"],
+                "filas": filas,
+                "filas_por_segundo": perfilado.por_segundo(filas, registro["segundos"]),
+                "rss_pico_mb": registro["rss_pico_mb"],
+            }
+    return etapas
+
+
+def comparar(resultados, linea_base, umbral=UMBRAL_REGRESION):
+    """
+    Lista de regresiones: etapas cuyas filas por segundo cayeron más que `umbral`
+    respecto de la línea base de la misma escala.
+    """
+    regresiones = []
+    for escala, etapas in resultados.items():
+        for etapa, actual in etapas.items():
+            base = linea_base.get(escala, {}).get(etapa)
+            if base is None or min(base["segundos"], actual["segundos"]) < SEGUNDOS_MINIMOS:
+                continue
+            cambio = actual["filas_por_segundo"] / base["filas_por_segundo"] - 1
+            if cambio < -umbral:
+                regresiones.append((escala, etapa, base["filas_por_segundo"], actual["filas_por_segundo"], cambio))
+    return regresiones
+
+
+def leer_linea_base(ruta=LINEA_BASE):
+    if not Path(ruta).exists():
+        return {}
+    with open(ruta, encoding="utf-8") as f:
+        return json.load(f)["escalas"]
+
+
+def guardar_json(escalas, ruta):
+    ruta = Path(ruta)
+    ruta.parent.mkdir(parents=True, exist_ok=True)
+    with open(ruta, "w", encoding="utf-8") as f:
+        json.dump({"fecha": datetime.now().isoformat(timespec="seconds"), "escalas": escalas}, f,
+                  indent=2, ensure_ascii=False)
+        f.write("\n")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark del ETL y la detección con datos sintéticos")
+    parser.add_argument("--escalas", nargs="+", default=["0.1x", "1x"],
+                        help=f"Escalas a medir: {', '.join(ESCALAS)} o <clientes>:<años>")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Procesos para la STL y la detección (0 = todos los núcleos)")
+    parser.add_argument("--semilla", type=int, default=42)
+    parser.add_argument("--umbral", type=float, default=UMBRAL_REGRESION,
+                        help="Caída de filas por segundo tolerada frente a la línea base (0.2 = 20%%)")
+    parser.add_argument("--guardar-linea-base", action="store_true",
+                        help=f"Guarda los resultados como nueva línea base en {LINEA_BASE.relative_to(RAIZ)}")
+    args = parser.parse_args()
+
+    resultados = {escala: medir_escala(escala, args.semilla, args.workers or None) for escala in args.escalas}
+
+    print("\n⏱️ Resultados (filas por segundo):")
+    for escala, etapas in resultados.items():
+        print(f"📦 {escala}")
+        for etapa, r in etapas.items():
+            print(f"   - {etapa}: {r['segundos']:.2f} s | {r['filas_por_segundo'] or 0:,.0f} filas/s | {r['rss_pico_mb']} MB")
+
+    salida = perfilado.PERFILES_DIR / f"benchmark-{datetime.now().strftime('%Y%m%d-%H%M%S')}.json"
+    guardar_json(resultados, RAIZ / salida)
+    print(f"📁 Resultados guardados en: {salida}")
+
+    if args.guardar_linea_base:
+        guardar_json({**leer_linea_base(), **resultados}, LINEA_BASE)
+        print(f"✅ Línea base actualizada: {LINEA_BASE.relative_to(RAIZ)}")
+        sys.exit(0)
+
+    # Primera ejecución (sin archivo de línea base): los resultados pasan a ser la línea base
+    if not LINEA_BASE.exists():
+        guardar_json(resultados, LINEA_BASE)
+        print(f"ℹ️ No había línea base; se guardaron estos resultados en {LINEA_BASE.relative_to(RAIZ)} "
+              "y las siguientes ejecuciones se comparan con ellos.")
+        sys.exit(0)
+
+    # Una línea base sin alguna de las escalas medidas no sirve para comparar: es un error, no un éxito
+    linea_base = leer_linea_base()
+    sin_base = [escala for escala in resultados if escala not in linea_base]
+    if sin_base:
+        print(f"❌ No hay línea base para {', '.join(sin_base)} en {LINEA_BASE.relative_to(RAIZ)}; "
+              "use --guardar-linea-base en la máquina de referencia.")
+        sys.exit(1)
+    regresiones = comparar(resultados, linea_base, args.umbral)
+    if regresiones:
+        print(f"❌ {len(regresiones)} etapa(s) más lentas que la línea base (umbral {args.umbral:.0%}):")
+        for escala, etapa, base, actual, cambio in regresiones:
+            print(f"   - {escala} {etapa}: {base:,.0f} -> {actual:,.0f} filas/s ({cambio:+.0%})")
+        sys.exit(1)
+    print("✅ Sin regresiones frente a la línea base.")
@@ -0,0 +1,100 @@
+import argparse
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+from etl_raw_to_gold import ESTRATEGIAS_DUPLICADOS
+
+# Inicio de las series, igual que en Datos.xlsx
+INICIO = "2019-01-14"
+HORAS_ANIO = 24 * 365
+
+# Proporción de horas con cada tipo de problema inyectado
+TASA_HUECOS = 0.02
+TASA_DUPLICADOS = 0.01
+TASA_ANOMALIAS = 0.005
+
+VARIABLES = ["Presion", "Temperatura", "Volumen"]
+
+
+def generar_cliente(horas, rng, duplicados=False, inicio=INICIO):
+    """
+    Hoja de un cliente con lecturas horarias de presión, temperatura y volumen en la
+    forma del Excel crudo (Fecha, Presion, Temperatura, Volumen), con ciclos diario y
+    anual, y con anomalías y huecos inyectados. Con `duplicados` se agregan lecturas
+    repetidas con valores distintos; el ETL solo las admite en los clientes de
+    ESTRATEGIAS_DUPLICADOS, como en Datos.xlsx.
+    """
+    t = np.arange(horas)
+    dia = np.sin(2 * np.pi * t / 24)
+    anio = np.sin(2 * np.pi * t / HORAS_ANIO)
+    df = pd.DataFrame({
+        "Fecha": pd.date_range(inicio, periods=horas, freq="h"),
+        "Presion": rng.uniform(15, 20) + 0.05 * dia + rng.normal(0, 0.03, horas),
+        "Temperatura": rng.uniform(22, 30) + 3 * anio + dia + rng.normal(0, 0.3, horas),
+        "Volumen": np.clip(rng.uniform(10, 30) * (1 + 0.3 * dia) + rng.normal(0, 2, horas), 0, None),
+    })
+
+    # Anomalías: picos de presión, saltos de temperatura y presión en cero
+    posiciones = rng.choice(horas, int(horas * TASA_ANOMALIAS), replace=False)
+    tipo = rng.integers(0, 3, len(posiciones))
+    picos, saltos, ceros = posiciones[tipo == 0], posiciones[tipo == 1], posiciones[tipo == 2]
+    df.loc[picos, "Presion"] *= rng.uniform(1.2, 1.5, len(picos))
+    df.loc[saltos, "Temperatura"] += rng.uniform(8, 15, len(saltos))
+    df.loc[ceros, "Presion"] = 0.0
+
+    # Huecos: horas sueltas y algunos bloques de 6 a 48 horas
+    faltantes = rng.random(horas) < TASA_HUECOS
+    for inicio_bloque in rng.choice(horas, max(1, horas // 2000)):
+        faltantes[inicio_bloque:inicio_bloque + rng.integers(6, 49)] = True
+    df = df[~faltantes]
+
+    # Lecturas repetidas de la misma Fecha junto a la original
+    if duplicados:
+        repetidas = df.sample(frac=TASA_DUPLICADOS, random_state=rng.integers(2 ** 31))
+        repetidas = repetidas.assign(**{
+            v: repetidas[v] + rng.normal(0, escala, len(repetidas))
+            for v, escala in zip(VARIABLES, [0.05, 0.3, 2.0])
+        })
+        df = pd.concat([df, repetidas]).sort_values("Fecha", kind="stable")
+    return df.reset_index(drop=True)
+
+
+def generar_lecturas(n_clientes, anios, semilla=42):
+    """
+    Genera {CLIENTEi: hoja} para n_clientes con `anios` años de lecturas horarias.
+    """
+    rng = np.random.default_rng(semilla)
+    horas = int(anios * HORAS_ANIO)
+    return {
+        f"CLIENTE{i}": generar_cliente(horas, rng, duplicados=f"CLIENTE{i}" in ESTRATEGIAS_DUPLICADOS)
+        for i in range(1, n_clientes + 1)
+    }
+
+
+def escribir_excel(hojas, ruta):
+    """
+    Escribe las hojas en un libro con una hoja por cliente, como Datos.xlsx.
+    """
+    ruta = Path(ruta)
+    ruta.parent.mkdir(parents=True, exist_ok=True)
+    with pd.ExcelWriter(ruta) as libro:
+        for nombre, df in hojas.items():
+            df.to_excel(libro, sheet_name=nombre, index=False)
+    return ruta
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Genera un Excel sintético con la forma de Datos.xlsx")
+    parser.add_argument("salida", help="Ruta del .xlsx a generar")
+    parser.add_argument("--clientes", type=int, default=20)
+    parser.add_argument("--anios", type=float, default=1.0)
+    parser.add_argument("--semilla", type=int, default=42)
+    args = parser.parse_args()
+
+    hojas = generar_lecturas(args.clientes, args.anios, args.semilla)
+    ruta = escribir_excel(hojas, args.salida)
+    print(f"✅ Excel sintético guardado en: {ruta} ({sum(len(h) for h in hojas.values())} lecturas)")
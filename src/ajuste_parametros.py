@@ -0,0 +1,193 @@
+import argparse
+import json
+import math
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+from sklearn.cluster import DBSCAN
+from sklearn.metrics import silhouette_score
+
+import anomaly_detection
+import esquema_db
+import grafo_vecinos
+import perfilado
+
+# Rejilla de candidatos por cliente
+EPS = [0.2, 0.3, 0.4, 0.5, 0.6, 0.75]
+MIN_SAMPLES = [5, 10, 20, 40]
+
+# Fracción de ruido aceptable: DBSCAN marca el ruido como anomalía, así que se
+# descartan candidatos que no marcan nada o que marcan demasiado
+RUIDO_MIN = 0.001
+RUIDO_MAX = 0.05
+
+# Silueta por etapas: cada etapa la evalúa con una submuestra mayor y conserva
+# 1/FACTOR_DESCARTE de los candidatos. Solo se poda el cálculo de la silueta; cada
+# candidato ya se ajustó con DBSCAN sobre todas las lecturas del cliente
+TAMANOS_MUESTRA = [1000, 4000]
+FACTOR_DESCARTE = 3
+SEMILLA = 42
+
+
+def silueta(features, etiquetas, tamano, semilla=SEMILLA):
+    """
+    Silueta sobre una submuestra, con el ruido (-1) como un grupo más: mide qué tan
+    separadas quedan las lecturas marcadas como anomalía del resto. NaN si la
+    submuestra tiene un solo grupo.
+    """
+    try:
+        return float(silhouette_score(features, etiquetas, sample_size=min(tamano, len(features)),
+                                      random_state=semilla))
+    except ValueError:
+        return float("nan")
+
+
+def buscar_parametros(cliente, features, eps=EPS, min_samples=MIN_SAMPLES, tamanos=TAMANOS_MUESTRA,
+                      ruido_min=RUIDO_MIN, ruido_max=RUIDO_MAX, usar_cache=True):
+    """
+    Busca eps/min_samp para un cliente por búsqueda en rejilla. Todas las
+    combinaciones se ajustan con DBSCAN sobre todas las lecturas, usando un único
+    grafo de vecinos con el mayor eps de la rejilla (los demás eps solo recortan
+    aristas), así que el costo dominante es el grafo y no cada ajuste. Se filtran por
+    fracción de ruido y las que quedan se ordenan por la silueta submuestreada por
+    etapas (TAMANOS_MUESTRA). Con usar_cache el grafo se guarda y lo reutilizan los
+    siguientes ajustes y la detección con --dbscan-grafo.
+    Devuelve (mejor, candidatos, segundos); mejor es None si ningún candidato es válido.
+    """
+    t0 = time.perf_counter()
+    radio = max(eps)
+    if usar_cache:
+        grafo_completo = grafo_vecinos.obtener_grafo(features, radio, cliente)
+    else:
+        grafo_completo = grafo_vecinos.construir_grafo(features, radio)
+
+    candidatos = []
+    for valor_eps in sorted(eps):
+        grafo = grafo_completo if valor_eps == radio else grafo_vecinos.recortar_grafo(grafo_completo, valor_eps)
+        for valor_min in sorted(min_samples):
+            etiquetas = DBSCAN(eps=valor_eps, min_samples=valor_min, metric="precomputed").fit(grafo).labels_
+            candidatos.append({
+                "eps": valor_eps,
+                "min_samp": valor_min,
+                "fraccion_ruido": float(np.mean(etiquetas == -1)),
+                "grupos": int(etiquetas.max()) + 1,
+                "silueta": None,
+                "etiquetas": etiquetas,
+            })
+
+    vivos = [c for c in candidatos if ruido_min <= c["fraccion_ruido"] <= ruido_max]
+    for etapa, tamano in enumerate(tamanos):
+        for c in vivos:
+            c["silueta"] = silueta(features, c["etiquetas"], tamano)
+        vivos = sorted((c for c in vivos if not math.isnan(c["silueta"])), key=lambda c: -c["silueta"])
+        if etapa < len(tamanos) - 1:
+            vivos = vivos[:max(1, math.ceil(len(vivos) / FACTOR_DESCARTE))]
+
+    for c in candidatos:
+        del c["etiquetas"]
+    return (vivos[0] if vivos else None), candidatos, time.perf_counter() - t0
+
+
+def ajustar_clientes(df_all, clientes, n_workers=1, perfil=None, **opciones):
+    """
+    Ejecuta buscar_parametros para cada cliente, repartidos en un pool de procesos
+    con n_workers > 1. Devuelve {cliente: (mejor, candidatos)}.
+    """
+    perfil = perfil or perfilado.Perfil("ajuste")
+    grupos = [(cliente, df) for cliente, df in df_all.groupby('cliente_id', sort=False) if cliente in clientes]
+    argumentos = [(cliente, df[anomaly_detection.COLUMNAS_MODELO].to_numpy(dtype='float64')) for cliente, df in grupos]
+
+    if n_workers == 1:
+        busquedas = [buscar_parametros(cliente, features, **opciones) for cliente, features in argumentos]
+    else:
+        with ProcessPoolExecutor(max_workers=n_workers) as executor:
+            futuros = [executor.submit(buscar_parametros, cliente, features, **opciones)
+                       for cliente, features in argumentos]
+            busquedas = [futuro.result() for futuro in futuros]
+
+    resultados = {}
+    for (cliente, df), (mejor, candidatos, segundos) in zip(grupos, busquedas):
+        perfil.registrar_cliente("ajuste", cliente, segundos, len(df))
+        resultados[cliente] = (mejor, candidatos)
+    return resultados
+
+
+def guardar_parametros(resultados, ruta=anomaly_detection.PARAMETROS_PATH):
+    """
+    Escribe el archivo que lee la detección. Las entradas de los clientes ajustados
+    reemplazan a las que ya tenía el archivo y las de los demás clientes se conservan,
+    así que ajustar un solo cliente (--cliente) no borra los otros. Los clientes sin
+    candidato válido conservan su entrada anterior o, si no la tienen, los
+    parámetros del diccionario Cliente. Solo se ajustan
+    eps/min_samp: mf/nt/cnt del Isolation Forest (--ensamble) siguen siendo los del
+    diccionario Cliente, porque sin anomalías etiquetadas no hay criterio para elegirlos.
+    """
+    ruta = Path(ruta)
+    ruta.parent.mkdir(parents=True, exist_ok=True)
+    clientes = {}
+    if ruta.exists():
+        with open(ruta, encoding="utf-8") as f:
+            clientes = json.load(f)["clientes"]
+    clientes.update({
+        cliente: {k: mejor[k] for k in ("eps", "min_samp", "silueta", "fraccion_ruido", "grupos")}
+        for cliente, (mejor, _) in resultados.items() if mejor is not None
+    })
+    contenido = {
+        "generado": datetime.now().isoformat(timespec="seconds"),
+        "criterio": {
+            "busqueda": "rejilla",
+            "silueta_submuestra": TAMANOS_MUESTRA,
+            "fraccion_ruido": [RUIDO_MIN, RUIDO_MAX],
+        },
+        "clientes": clientes,
+    }
+    with open(ruta, "w", encoding="utf-8") as f:
+        json.dump(contenido, f, indent=2, ensure_ascii=False)
+        f.write("\n")
+    return ruta
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Ajuste de eps/min_samp de DBSCAN por cliente")
+    parser.add_argument("--cliente", action="append", default=None,
+                        help="Cliente a ajustar (repetible); por defecto todos los de Cliente")
+    parser.add_argument("--eps", type=float, nargs="+", default=EPS, help="Valores de eps a probar")
+    parser.add_argument("--min-samples", type=int, nargs="+", default=MIN_SAMPLES,
+                        help="Valores de min_samples a probar")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Procesos para ajustar clientes en paralelo (0 = todos los núcleos)")
+    parser.add_argument("--sin-cache", action="store_true",
+                        help="No leer ni guardar los grafos de vecinos en data/cache/grafos")
+    parser.add_argument("--salida", default=str(anomaly_detection.PARAMETROS_PATH),
+                        help="Archivo de parámetros que lee la detección")
+    parser.add_argument("--profile", action="store_true",
+                        help="Guarda en data/perfiles/ el tiempo de ajuste por cliente")
+    args = parser.parse_args()
+
+    perfil = perfilado.Perfil("ajuste")
+    clientes = args.cliente or list(anomaly_detection.Cliente)
+    print(f"🔧 Ajustando eps/min_samp de {len(clientes)} cliente(s) "
+          f"({len(args.eps) * len(args.min_samples)} candidatos por cliente)")
+    conn = esquema_db.conectar(anomaly_detection.DB_PATH)
+    with perfil.etapa("lectura") as registro:
+        df_all = anomaly_detection.leer_lecturas(conn, clientes)
+        registro["filas_salida"] = len(df_all)
+    conn.close()
+
+    with perfil.etapa("ajuste", len(df_all)):
+        resultados = ajustar_clientes(df_all, clientes, n_workers=args.workers or None, perfil=perfil,
+                                      eps=args.eps, min_samples=args.min_samples, usar_cache=not args.sin_cache)
+
+    for cliente, (mejor, _) in resultados.items():
+        if mejor is None:
+            print(f"   - {cliente}: sin candidato con ruido entre {RUIDO_MIN:.1%} y {RUIDO_MAX:.1%}, se conservan sus parámetros")
+        else:
+            print(f"   - {cliente}: eps={mejor['eps']} min_samp={mejor['min_samp']} "
+                  f"(silueta {mejor['silueta']:.3f}, ruido {mejor['fraccion_ruido']:.2%})")
+    ruta = guardar_parametros(resultados, args.salida)
+    print(f"✅ Parámetros guardados en: {ruta}")
+    if args.profile:
+        perfil.guardar()
@@ -0,0 +1,219 @@
+import shutil
+from pathlib import Path
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+
+# Almacén columnar de la capa gold: data/gold/almacen/<tabla>/cliente_id=<id>/mes=<AAAA-MM>/
+ALMACEN_DIR = Path("data/gold/almacen")
+
+# Tipos de las columnas conocidas; las demás conservan el tipo inferido por pyarrow
+TIPOS = {
+    "timestamp": pa.timestamp("ns"),
+    "presion": pa.float64(),
+    "temperatura": pa.float64(),
+    "volumen": pa.float64(),
+    "TemperaturaSinTendencia": pa.float64(),
+    "Presion_scaled": pa.float32(),
+    "Temperatura_scaled": pa.float32(),
+    "Volumen_scaled": pa.float32(),
+    "alerta_presion": pa.bool_(),
+    "alerta_temperatura": pa.bool_(),
+    "alerta_reglas": pa.bool_(),
+    "Anomalia_modelo": pa.int8(),
+    "anomalia_iso": pa.bool_(),
+    "anomalia_svm": pa.bool_(),
+    "puntaje_ensamble": pa.float64(),
+    "anomalia_general": pa.bool_(),
+    "severidad": pa.dictionary(pa.int8(), pa.string()),
+}
+
+PARTICIONES = ds.partitioning(
+    pa.schema([("cliente_id", pa.string()), ("mes", pa.string())]), flavor="hive"
+)
+
+# Archivos abiertos a la vez al escribir. Las filas se escriben ordenadas por
+# partición, así que cada archivo se cierra antes de abrir los siguientes
+MAX_ARCHIVOS_ABIERTOS = 256
+
+
+def ruta_tabla(tabla, raiz=ALMACEN_DIR):
+    return Path(raiz) / tabla
+
+
+def existe_tabla(tabla, raiz=ALMACEN_DIR):
+    return ruta_tabla(tabla, raiz).is_dir() and any(ruta_tabla(tabla, raiz).iterdir())
+
+
+def a_arrow(df):
+    """
+    Convierte el DataFrame a una tabla Arrow con los tipos de TIPOS y la columna de
+    partición 'mes' derivada del timestamp.
+    """
+    df = df.drop(columns=["index"], errors="ignore").assign(mes=df["timestamp"].dt.strftime("%Y-%m"))
+    tabla = pa.Table.from_pandas(df, preserve_index=False)
+    campos = [
+        pa.field(campo.name, TIPOS.get(campo.name, campo.type))
+        for campo in tabla.schema
+    ]
+    return tabla.cast(pa.schema(campos, metadata=tabla.schema.metadata))
+
+
+def escribir_tabla(df, tabla, raiz=ALMACEN_DIR):
+    """
+    Reescribe por completo la tabla del almacén particionada por cliente y mes. Se
+    escribe en un directorio temporal que reemplaza al actual solo al terminar, así
+    que una escritura fallida deja la tabla anterior intacta.
+    """
+    ruta = ruta_tabla(tabla, raiz)
+    temporal = ruta.with_name(f"{tabla}__carga")
+    if temporal.exists():
+        shutil.rmtree(temporal)
+    escribir_particiones(a_arrow(df), temporal)
+    if ruta.exists():
+        shutil.rmtree(ruta)
+    temporal.rename(ruta)
+
+
+def escribir_particiones(tabla_arrow, ruta, **opciones):
+    """
+    write_dataset con el límite de particiones tomado de los datos: pyarrow rechaza
+    por defecto escrituras de más de 1024 pares cliente/mes (p. ej. 20 clientes con
+    5 años). Las filas se agrupan por partición (orden estable) y se escriben en
+    ese orden, para que cada partición quede en un solo archivo aunque se limiten
+    los archivos abiertos.
+    """
+    tabla_arrow = tabla_arrow.sort_by([("cliente_id", "ascending"), ("mes", "ascending")])
+    particiones = max(1, tabla_arrow.group_by(["cliente_id", "mes"]).aggregate([]).num_rows)
+    ds.write_dataset(tabla_arrow, ruta, format="parquet", partitioning=PARTICIONES,
+                     basename_template="parte-{i}.parquet", preserve_order=True,
+                     max_partitions=particiones, max_open_files=min(particiones, MAX_ARCHIVOS_ABIERTOS),
+                     **opciones)
+
+
+def actualizar_tabla(df, tabla, raiz=ALMACEN_DIR):
+    """
+    Inserta o reemplaza filas por (cliente_id, timestamp). Solo se leen y reescriben
+    las particiones cliente/mes que contienen filas nuevas.
+    """
+    if not existe_tabla(tabla, raiz):
+        return escribir_tabla(df, tabla, raiz)
+
+    nuevas = a_arrow(df).to_pandas()
+    partes = []
+    for (cliente, mes), df_particion in nuevas.groupby(["cliente_id", "mes"], sort=False):
+        ruta = ruta_tabla(tabla, raiz) / f"cliente_id={cliente}" / f"mes={mes}"
+        if ruta.exists():
+            existentes = leer_tabla(tabla, clientes=[cliente], meses=[mes], raiz=raiz)
+            existentes = existentes[~existentes["timestamp"].isin(df_particion["timestamp"])]
+            df_particion = pd.concat([existentes, df_particion], ignore_index=True).sort_values("timestamp")
+        partes.append(df_particion)
+
+    escribir_particiones(a_arrow(pd.concat(partes, ignore_index=True)), ruta_tabla(tabla, raiz),
+                         existing_data_behavior="delete_matching")
+
+
+def filtro(clientes=None, desde=None, hasta=None, meses=None, severidades=None):
+    """
+    Construye la expresión de filtro. Las condiciones sobre cliente_id y mes podan
+    particiones completas; las de timestamp y severidad se evalúan con las
+    estadísticas de cada archivo Parquet y al leer.
+    """
+    condiciones = []
+    if clientes is not None:
+        condiciones.append(ds.field("cliente_id").isin(list(clientes)))
+    if meses is not None:
+        condiciones.append(ds.field("mes").isin(list(meses)))
+    if desde is not None:
+        desde = pd.Timestamp(desde)
+        condiciones.append(ds.field("mes") >= desde.strftime("%Y-%m"))
+        condiciones.append(ds.field("timestamp") >= pa.scalar(desde, type=pa.timestamp("ns")))
+    if hasta is not None:
+        hasta = pd.Timestamp(hasta)
+        condiciones.append(ds.field("mes") <= hasta.strftime("%Y-%m"))
+        condiciones.append(ds.field("timestamp") <= pa.scalar(hasta, type=pa.timestamp("ns")))
+    if severidades is not None:
+        condiciones.append(ds.field("severidad").isin(list(severidades)))
+
+    expresion = None
+    for condicion in condiciones:
+        expresion = condicion if expresion is None else expresion & condicion
+    return expresion
+
+
+def leer_tabla(tabla, clientes=None, desde=None, hasta=None, columnas=None, meses=None, severidades=None,
+               raiz=ALMACEN_DIR):
+    """
+    Lee una tabla del almacén leyendo solo las particiones de los clientes y meses
+    pedidos y, si se indica, solo las columnas necesarias.
+    """
+    dataset = ds.dataset(ruta_tabla(tabla, raiz), format="parquet", partitioning=PARTICIONES)
+    if columnas is not None:
+        columnas = list(columnas)
+    df = dataset.to_table(columns=columnas, filter=filtro(clientes, desde, hasta, meses, severidades)).to_pandas()
+    if "severidad" in df.columns:
+        df["severidad"] = df["severidad"].astype("category")
+
+    # Devolver las columnas en el orden original (las de partición quedan al final al leer)
+    orden = [c["name"] for c in (dataset.schema.pandas_metadata or {}).get("columns", [])]
+    orden = [c for c in orden if c in df.columns] + [c for c in df.columns if c not in orden]
+    return df[orden].drop(columns=["mes"], errors="ignore")
+
+
+def clientes_tabla(tabla, raiz=ALMACEN_DIR):
+    """
+    Lista los clientes presentes a partir de los directorios de partición.
+    """
+    return sorted(p.name.split("=", 1)[1] for p in ruta_tabla(tabla, raiz).glob("cliente_id=*"))
+
+
+def meses_tabla(tabla, clientes=None, raiz=ALMACEN_DIR):
+    """
+    Lista los meses (AAAA-MM) con datos de los clientes indicados a partir de los
+    directorios de partición.
+    """
+    rutas = ruta_tabla(tabla, raiz).glob("cliente_id=*/mes=*")
+    return sorted({
+        p.name.split("=", 1)[1] for p in rutas
+        if clientes is None or p.parent.name.split("=", 1)[1] in clientes
+    })
+
+
+def leer_ultimas(tabla, limite, clientes=None, desde=None, hasta=None, columnas=None, severidades=None,
+                 raiz=ALMACEN_DIR):
+    """
+    Las `limite` filas más recientes del filtro, ordenadas por timestamp descendente.
+    Lee los meses del más reciente al más antiguo y se detiene en cuanto junta
+    suficientes filas, sin leer el resto de la historia.
+    """
+    if columnas is not None:
+        columnas = list(dict.fromkeys([*columnas, "timestamp", "cliente_id"]))
+    meses = meses_tabla(tabla, clientes, raiz)
+    if desde is not None:
+        meses = [m for m in meses if m >= pd.Timestamp(desde).strftime("%Y-%m")]
+    if hasta is not None:
+        meses = [m for m in meses if m <= pd.Timestamp(hasta).strftime("%Y-%m")]
+
+    partes, filas = [], 0
+    for mes in reversed(meses):
+        partes.append(leer_tabla(tabla, clientes, desde, hasta, columnas, [mes], severidades, raiz))
+        filas += len(partes[-1])
+        if filas >= limite:
+            break
+    if not partes:
+        return leer_tabla(tabla, clientes, desde, hasta, columnas, severidades=severidades, raiz=raiz)
+
+    df = pd.concat(partes, ignore_index=True)
+    if "severidad" in df.columns:
+        df["severidad"] = df["severidad"].astype("category")
+    return df.sort_values(["timestamp", "cliente_id"], ascending=[False, True]).head(limite).reset_index(drop=True)
+
+
+def contar_filas(tabla, clientes=None, desde=None, hasta=None, severidades=None, raiz=ALMACEN_DIR):
+    """
+    Número de filas de la tabla (o del filtro) a partir de los metadatos de Parquet,
+    sin leer las columnas.
+    """
+    dataset = ds.dataset(ruta_tabla(tabla, raiz), format="parquet", partitioning=PARTICIONES)
+    return dataset.count_rows(filter=filtro(clientes, desde, hasta, severidades=severidades))
@@ -1,98 +1,494 @@
-import sqlite3
 import pandas as pd
 from sklearn.cluster import DBSCAN
-from sklearn.metrics import silhouette_score
+from sklearn.ensemble import IsolationForest
+from sklearn.svm import OneClassSVM
 import numpy as np
+import argparse
+import json
+import time
+import joblib
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor
+from sklearn.neighbors import NearestNeighbors
+import almacen_gold
+import esquema_db
+import grafo_vecinos
+import iqr_movil
+import perfilado
+import resumen_diario
 
 DB_PATH = "db/optigas.db"
+
+# Parámetros ajustados en la última detección completa (límites IQR y muestras núcleo
+# de DBSCAN por cliente), que usa el modo incremental para puntuar lecturas nuevas
+TABLA_MODELOS = "deteccion_modelos"
+MODELOS_DETECCION_DIR = Path("data/modelos_deteccion")
+
+# eps/min_samp elegidos por src/ajuste_parametros.py; reemplazan los del diccionario
+# Cliente para los clientes que aparecen en el archivo
+PARAMETROS_PATH = Path("config/parametros_deteccion.json")
+# Columnas escaladas con las que se ajustan y puntúan DBSCAN y el ensamble
+COLUMNAS_MODELO = ['Presion_scaled', 'Temperatura_scaled', 'Volumen_scaled']
+# Ensamble (--ensamble): peso de cada modelo (Isolation Forest, One-Class SVM,
+# DBSCAN) en el puntaje y puntaje mínimo para marcar anomalia_general. Con pesos
+# iguales y umbral 1/3 basta un modelo, como Anomalia_general del notebook de evaluación
+PESOS_ENSAMBLE = np.array([1, 1, 1]) / 3
+UMBRAL_ENSAMBLE = 1 / 3
+
 Cliente ={
-    "CLIENTE1":{'eps':0.5,'min_samp':5},
-    "CLIENTE2":{'eps':0.5,'min_samp':5},
-    "CLIENTE3":{'eps':0.5,'min_samp':5},
-    "CLIENTE4":{'eps':0.5,'min_samp':5},
-    "CLIENTE5":{'eps':0.5,'min_samp':5},
-    "CLIENTE6":{'eps':0.5,'min_samp':5},
-    "CLIENTE7":{'eps':0.5,'min_samp':5},
-    "CLIENTE8":{'eps':0.5,'min_samp':5},
-    "CLIENTE9":{'eps':0.5,'min_samp':5},
-    "CLIENTE10":{'eps':0.5,'min_samp':5},
-    "CLIENTE11":{'eps':0.5,'min_samp':5},
-    "CLIENTE12":{'eps':0.5,'min_samp':5},
-    "CLIENTE13":{'eps':0.5,'min_samp':5},
-    "CLIENTE14":{'eps':0.5,'min_samp':5},
-    "CLIENTE15":{'eps':0.5,'min_samp':5},
-    "CLIENTE16":{'eps':0.5,'min_samp':5},
-    "CLIENTE17":{'eps':0.5,'min_samp':5},
-    "CLIENTE18":{'eps':0.5,'min_samp':5},
-    "CLIENTE19":{'eps':0.5,'min_samp':5},
-    "CLIENTE20":{'eps':0.5,'min_samp':5},
+    "CLIENTE1":{'eps':0.5,'min_samp':5,'mf':0.8,'nt':200,'cnt':0.01},
+    "CLIENTE2":{'eps':0.5,'min_samp':5,'mf':0.8,'nt':50,'cnt':0.01},
+    "CLIENTE3":{'eps':0.5,'min_samp':5,'mf':0.8,'nt':100,'cnt':0.01},
+    "CLIENTE4":{'eps':0.5,'min_samp':5,'mf':0.8,'nt':200,'cnt':0.01},
+    "CLIENTE5":{'eps':0.5,'min_samp':5,'mf':0.8,'nt':500,'cnt':0.01},
+    "CLIENTE6":{'eps':0.5,'min_samp':5,'mf':0.8,'nt':100,'cnt':0.01},
+    "CLIENTE7":{'eps':0.5,'min_samp':5,'mf':0.8,'nt':100,'cnt':0.01},
+    "CLIENTE8":{'eps':0.5,'min_samp':5,'mf':0.5,'nt':100,'cnt':0.1},
+    "CLIENTE9":{'eps':0.5,'min_samp':5,'mf':0.8,'nt':500,'cnt':0.05},
+    "CLIENTE10":{'eps':0.5,'min_samp':5,'mf':0.8,'nt':200,'cnt':0.01},
+    "CLIENTE11":{'eps':0.5,'min_samp':5,'mf':0.5,'nt':500,'cnt':0.01},
+    "CLIENTE12":{'eps':0.5,'min_samp':5,'mf':0.8,'nt':50,'cnt':0.01},
+    "CLIENTE13":{'eps':0.5,'min_samp':5,'mf':0.8,'nt':100,'cnt':0.05},
+    "CLIENTE14":{'eps':0.5,'min_samp':5,'mf':0.5,'nt':500,'cnt':0.01},
+    "CLIENTE15":{'eps':0.5,'min_samp':5,'mf':0.8,'nt':100,'cnt':0.05},
+    "CLIENTE16":{'eps':0.5,'min_samp':5,'mf':0.5,'nt':500,'cnt':0.1},
+    "CLIENTE17":{'eps':0.5,'min_samp':5,'mf':0.8,'nt':200,'cnt':0.01},
+    "CLIENTE18":{'eps':0.5,'min_samp':5,'mf':0.8,'nt':100,'cnt':0.01},
+    "CLIENTE19":{'eps':0.5,'min_samp':5,'mf':0.8,'nt':50,'cnt':0.1},
+    "CLIENTE20":{'eps':0.5,'min_samp':5,'mf':0.8,'nt':200,'cnt':0.01},
 }
 
-def detectar_anomalias_IQR(serie):
+def limites_IQR(serie):
     Q1 = serie.quantile(0.25)
     Q3 = serie.quantile(0.75)
     IQR = Q3 - Q1
     lim_inf = Q1 - 1.5 * IQR
     lim_sup = Q3 + 1.5 * IQR
+    return lim_inf, lim_sup
+
+def detectar_anomalias_IQR(serie):
+    lim_inf, lim_sup = limites_IQR(serie)
     return ~serie.between(lim_inf, lim_sup)
 
-def entrenar_por_cliente(db_path):
-    # Realizar conexión a la BD
-    conn = sqlite3.connect(db_path)
-    df_all = pd.read_sql("SELECT * FROM gold_lecturas_completas", conn)
-    df_all['timestamp'] = pd.to_datetime(df_all['timestamp'])
+def ajustar_cliente(reglas, features, eps, min_samples, aplicar_iqr, grafo=None, tiempos=None, ventana_iqr=None,
+                    ensamble=None):
+    """
+    Ajusta las reglas IQR y DBSCAN de un cliente a partir de sus arreglos: `reglas`
+    (presion, temperatura) en unidades originales y `features` escaladas. Devuelve
+    (alerta_presion, alerta_temperatura, Anomalia_modelo, banderas_ensamble, modelo),
+    donde modelo son los límites IQR y las muestras núcleo de DBSCAN (y los modelos
+    del ensamble) para el modo incremental. Vive a nivel de módulo y solo recibe
+    arreglos para poder enviarse a los procesos del pool.
 
-    resultados = []
-    clientes_excluidos = {19, 4, 20, 6, 1, 17, 5, 14, 18, 2}
+    Si `grafo` es la clave de un cliente, DBSCAN se ejecuta sobre su grafo de
+    vecinos guardado (grafo_vecinos), que se reutiliza entre ejecuciones. Con
+    `ventana_iqr` los cuartiles se calculan sobre la ventana móvil de cada lectura
+    (iqr_movil) usando sus `tiempos`, en lugar de sobre toda la historia. Con
+    `ensamble` ({mf, nt, cnt}) se ajustan además Isolation Forest y One-Class SVM
+    sobre la misma matriz de features (ajustar_ensamble).
+    """
+    # ---- 1. Detección por Reglas de Negocio (IQR) en datos originales ---- #
+    modelo = {"aplicar_iqr": aplicar_iqr, "eps": eps, "min_samples": min_samples, "ventana_iqr": ventana_iqr}
+    if aplicar_iqr:
+        presion, temperatura = pd.Series(reglas[:, 0]), pd.Series(reglas[:, 1])
+        modelo["lim_inf_presion"], modelo["lim_sup_presion"] = limites_IQR(presion)
+        modelo["lim_inf_temperatura"], modelo["lim_sup_temperatura"] = limites_IQR(temperatura)
+        if ventana_iqr:
+            alertas = iqr_movil.alertas_iqr_movil(tiempos, reglas, ventana_iqr)
+            alerta_presion, alerta_temperatura = alertas[:, 0], alertas[:, 1]
+        else:
+            alerta_presion = detectar_anomalias_IQR(presion).to_numpy()
+            alerta_temperatura = detectar_anomalias_IQR(temperatura).to_numpy()
+    else:
+        alerta_presion = np.zeros(len(reglas), dtype=bool)
+        alerta_temperatura = np.zeros(len(reglas), dtype=bool)
+
+    # ---- 2. Detección por Modelos de ML ---- #
+    if grafo is not None:
+        model = grafo_vecinos.ajustar_dbscan_grafo(features, eps, min_samples, grafo)
+    else:
+        model = DBSCAN(min_samples=min_samples, eps=eps).fit(features)
+    dbscan_pred = model.labels_
+    modelo["nucleos"] = np.asarray(features)[model.core_sample_indices_]
 
-    for cliente in Cliente.keys():
-        df = df_all[df_all['cliente_id'] == cliente].copy()
-        df.set_index('timestamp', inplace=True)
+    banderas_ensamble = None
+    if ensamble is not None:
+        modelo["ensamble"] = ajustar_ensamble(features, **ensamble)
+        banderas_ensamble = predecir_ensamble(modelo["ensamble"], features)
+    return alerta_presion, alerta_temperatura, np.where(dbscan_pred == -1, 1, 0), banderas_ensamble, modelo
 
-        # Inicializar las columnas de alerta en False por defecto
-        df['alerta_presion'] = False
-        df['alerta_temperatura'] = False
+def ajustar_ensamble(features, mf, nt, cnt):
+    """
+    Isolation Forest y One-Class SVM del cliente, con los parámetros del notebook de
+    evaluación de modelos.
+    """
+    iso = IsolationForest(n_estimators=nt, contamination=cnt, max_features=mf, random_state=42).fit(features)
+    one_class_svm = OneClassSVM(nu=0.01, kernel="rbf", gamma="scale").fit(features)
+    return {"isolation_forest": iso, "oneclass_svm": one_class_svm}
 
-        # ---- 1. Detección por Reglas de Negocio (IQR) en datos originales ---- #
-        if cliente not in clientes_excluidos:
-            df['alerta_presion'] = detectar_anomalias_IQR(df['presion'])
-            df['alerta_temperatura'] = detectar_anomalias_IQR(df['temperatura'])
+def predecir_ensamble(modelos, features):
+    return {
+        "anomalia_iso": modelos["isolation_forest"].predict(features) == -1,
+        "anomalia_svm": modelos["oneclass_svm"].predict(features) == -1,
+    }
 
-        # Anomalía sospechosa por ceros inconsistentes
-        condicion_cero = (
-            ((df['presion'] == 0) & (df['temperatura'] > 0) & (df['volumen'] > 0)) |
-            ((df['temperatura'] == 0) & (df['presion'] > 0) & (df['volumen'] > 0))
-        )
+def ajustar_cliente_cronometrado(reglas, features, eps, min_samples, aplicar_iqr, grafo=None, tiempos=None,
+                                 ventana_iqr=None, ensamble=None):
+    """
+    ajustar_cliente que además devuelve los segundos del ajuste (medidos en el worker).
+    """
+    t0 = time.perf_counter()
+    resultado = ajustar_cliente(reglas, features, eps, min_samples, aplicar_iqr, grafo, tiempos, ventana_iqr,
+                                ensamble)
+    return resultado, time.perf_counter() - t0
 
-        # Combinar todas las alertas
-        df['alerta_reglas'] = df['alerta_presion'] | df['alerta_temperatura']
-        #| condicion_cero
+def parametros_clientes(ruta=PARAMETROS_PATH):
+    """
+    eps/min_samp por cliente: los del diccionario Cliente, reemplazados por los del
+    archivo de ajuste de parámetros si existe.
+    """
+    parametros = {cliente: dict(valores) for cliente, valores in Cliente.items()}
+    ruta = Path(ruta)
+    if ruta.exists():
+        with open(ruta, encoding="utf-8") as f:
+            ajustados = json.load(f)["clientes"]
+        for cliente, valores in ajustados.items():
+            if cliente in parametros:
+                parametros[cliente].update(eps=valores['eps'], min_samp=valores['min_samp'])
+        print(f"⚙️ Parámetros de DBSCAN ajustados leídos de {ruta} ({len(ajustados)} clientes)")
+    return parametros
 
+def argumentos_cliente(df, cliente, clientes_excluidos, usar_grafo=False, parametros=None, ventana_iqr=None,
+                       ensamble=False):
+    """
+    Arreglos y parámetros que necesita ajustar_cliente para un cliente. Las columnas
+    escaladas llegan como float32 del almacén o float64 de SQLite; se convierten aquí
+    una sola vez por cliente, y np.asarray no vuelve a copiar lo que ya es float64.
+    """
+    parametros = parametros or Cliente
+    return (
+        np.asarray(df[['presion', 'temperatura']], dtype=np.float64),
+        np.asarray(df[COLUMNAS_MODELO], dtype=np.float64),
+        parametros[cliente]['eps'],
+        parametros[cliente]['min_samp'],
+        cliente not in clientes_excluidos,
+        cliente if usar_grafo else None,
+        df['timestamp'].to_numpy() if ventana_iqr else None,
+        ventana_iqr,
+        {k: parametros[cliente][k] for k in ('mf', 'nt', 'cnt')} if ensamble else None,
+    )
 
-        # ---- 2. Detección por Modelos de ML ---- #
-        features = ['Presion_scaled', 'Temperatura_scaled', 'Volumen_scaled']
-        model = DBSCAN(min_samples=Cliente[cliente]['min_samp'], eps=Cliente[cliente]['eps'])
-        dbscan_pred = model.fit_predict(df[features])
-        df['Anomalia_modelo'] = np.where(dbscan_pred == -1, 1, 0)
+def completar_cliente(df, resultado):
+    """
+    Agrega al DataFrame del cliente las alertas y la predicción de ajustar_cliente
+    (o de puntuar_cliente) y calcula la severidad. Si hay banderas del ensamble se
+    agregan con su puntaje ponderado, y la severidad Potencial sale de anomalia_general.
+    """
+    alerta_presion, alerta_temperatura, anomalia_modelo, banderas_ensamble = resultado[:4]
+    df.set_index('timestamp', inplace=True)
+    df['alerta_presion'] = alerta_presion
+    df['alerta_temperatura'] = alerta_temperatura
 
-        # ---- 3. Severidad Combinada (Reglas + ML) ---- #
-        df['severidad'] = df.apply(lambda row: 
-            'Alto' if row['alerta_reglas'] == 1
-            else 'Potencial' if row['Anomalia_modelo'] == 1  
-            else 'OK', axis=1)
+    # Combinar todas las alertas
+    df['alerta_reglas'] = df['alerta_presion'] | df['alerta_temperatura']
+
+    df['Anomalia_modelo'] = anomalia_modelo
+    anomalia_ml = df['Anomalia_modelo'] == 1
+
+    if banderas_ensamble is not None:
+        df['anomalia_iso'] = banderas_ensamble['anomalia_iso']
+        df['anomalia_svm'] = banderas_ensamble['anomalia_svm']
+        votos = np.column_stack([banderas_ensamble['anomalia_iso'], banderas_ensamble['anomalia_svm'], anomalia_ml])
+        df['puntaje_ensamble'] = votos @ PESOS_ENSAMBLE
+        df['anomalia_general'] = df['puntaje_ensamble'] >= UMBRAL_ENSAMBLE
+        anomalia_ml = df['anomalia_general']
+
+    # ---- 3. Severidad Combinada (Reglas + ML) ---- #
+    df['severidad'] = np.select(
+        [df['alerta_reglas'] == 1, anomalia_ml],
+        ['Alto', 'Potencial'],
+        default='OK',
+    ).astype(object)
+
+    return df
+
+def detectar_clientes(df_all, perfil, n_workers=1, usar_grafo=False, ventana_iqr=None, ensamble=False):
+    """
+    Aplica IQR + DBSCAN a cada cliente configurado en Cliente.
+
+    Con n_workers > 1 los ajustes se reparten en un pool de procesos (None usa todos
+    los núcleos); a cada proceso solo se envían los arreglos del cliente. Los
+    resultados se recogen y se unen en el orden de configuración de los clientes.
+    Con usar_grafo, DBSCAN usa el grafo de vecinos guardado de cada cliente y con
+    ventana_iqr (p. ej. "30D") las reglas IQR usan cuartiles móviles. Con ensamble,
+    cada worker ajusta también Isolation Forest y One-Class SVM sobre los mismos
+    features. Devuelve (df_resultado, {cliente: modelo}).
+    """
+    clientes_excluidos = {19, 4, 20, 6, 1, 17, 5, 14, 18, 2}
+    parametros = parametros_clientes()
+
+    # Una sola pasada de agrupación; cada grupo ya es un DataFrame independiente
+    orden = {cliente: i for i, cliente in enumerate(Cliente)}
+    grupos = [(cliente, df) for cliente, df in df_all.groupby('cliente_id', sort=False) if cliente in orden]
+    grupos.sort(key=lambda grupo: orden[grupo[0]])
+    argumentos = [argumentos_cliente(df, cliente, clientes_excluidos, usar_grafo, parametros, ventana_iqr, ensamble)
+                  for cliente, df in grupos]
+
+    if n_workers == 1:
+        ajustes = [ajustar_cliente_cronometrado(*args) for args in argumentos]
+    else:
+        with ProcessPoolExecutor(max_workers=n_workers) as executor:
+            ajustes = list(executor.map(ajustar_cliente_cronometrado, *zip(*argumentos)))
+
+    resultados = []
+    modelos = {}
+    for (cliente, df), (resultado, segundos) in zip(grupos, ajustes):
+        perfil.registrar_cliente("deteccion", cliente, segundos, len(df))
+        resultados.append(completar_cliente(df, resultado))
+        modelos[cliente] = resultado[4]
 
-        # Guardar resultados
-        resultados.append(df)
+    return unir_resultados(resultados), modelos
 
+def unir_resultados(resultados):
     # Unir resultados
     df_resultado = pd.concat(resultados)
     df_resultado.drop(columns=['index'], errors='ignore', inplace=True)
     df_resultado.reset_index(inplace=True)
-    
+    return df_resultado
+
+def guardar_modelos(conn, modelos, directorio=MODELOS_DETECCION_DIR):
+    """
+    Guarda por cliente los límites IQR y parámetros de DBSCAN en TABLA_MODELOS,
+    las muestras núcleo de DBSCAN en un .npy por cliente y, si se ajustaron, los
+    modelos del ensamble en un .joblib por cliente.
+    """
+    directorio = Path(directorio)
+    directorio.mkdir(parents=True, exist_ok=True)
+    filas = []
+    for cliente, modelo in modelos.items():
+        archivo = f"nucleos_{cliente}.npy"
+        np.save(directorio / archivo, modelo["nucleos"])
+        archivo_ensamble = None
+        if "ensamble" in modelo:
+            archivo_ensamble = f"ensamble_{cliente}.joblib"
+            joblib.dump(modelo["ensamble"], directorio / archivo_ensamble)
+        filas.append({
+            "cliente_id": cliente,
+            "aplicar_iqr": int(modelo["aplicar_iqr"]),
+            "ventana_iqr": modelo["ventana_iqr"],
+            "lim_inf_presion": modelo.get("lim_inf_presion"),
+            "lim_sup_presion": modelo.get("lim_sup_presion"),
+            "lim_inf_temperatura": modelo.get("lim_inf_temperatura"),
+            "lim_sup_temperatura": modelo.get("lim_sup_temperatura"),
+            "eps": modelo["eps"],
+            "min_samples": modelo["min_samples"],
+            "n_nucleos": len(modelo["nucleos"]),
+            "archivo_nucleos": archivo,
+            "archivo_ensamble": archivo_ensamble,
+        })
+    pd.DataFrame(filas).to_sql(TABLA_MODELOS, conn, if_exists="replace", index=False)
+
+def cargar_modelos(conn):
+    """
+    Parámetros de la última detección completa por cliente, o None si no existen.
+    """
+    if conn.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name=?", (TABLA_MODELOS,)).fetchone() is None:
+        return None
+    return pd.read_sql(f"SELECT * FROM {TABLA_MODELOS}", conn).set_index("cliente_id")
+
+def puntuar_cliente(df, modelo, marca, directorio=MODELOS_DETECCION_DIR):
+    """
+    Aplica a las lecturas posteriores a `marca` los límites IQR y el DBSCAN
+    guardados del cliente. Si el modelo usa IQR móvil, las lecturas anteriores de
+    `df` solo sirven para llenar la ventana. Una lectura es ruido de DBSCAN si no
+    tiene ninguna muestra núcleo a distancia <= eps (las lecturas del ajuste reciben
+    así la misma etiqueta que en el ajuste). Si el ajuste incluyó el ensamble, las
+    lecturas se puntúan también con sus modelos. Devuelve (df_nuevas, resultado).
+    """
+    nuevas = (df['timestamp'] > marca).to_numpy()
+    ventana = modelo["ventana_iqr"] if isinstance(modelo["ventana_iqr"], str) else None
+    if modelo["aplicar_iqr"] and ventana:
+        alertas = iqr_movil.alertas_iqr_movil(df['timestamp'], df[['presion', 'temperatura']], ventana)
+    elif modelo["aplicar_iqr"]:
+        alertas = np.column_stack([
+            ~df['presion'].between(modelo["lim_inf_presion"], modelo["lim_sup_presion"]),
+            ~df['temperatura'].between(modelo["lim_inf_temperatura"], modelo["lim_sup_temperatura"]),
+        ])
+    else:
+        alertas = np.zeros((len(df), 2), dtype=bool)
+    df = df[nuevas].copy()
+    alerta_presion, alerta_temperatura = alertas[nuevas, 0], alertas[nuevas, 1]
+
+    features = np.asarray(df[COLUMNAS_MODELO], dtype=np.float64)
+    nucleos = np.load(Path(directorio) / modelo["archivo_nucleos"], mmap_mode="r")
+    if len(nucleos) == 0:
+        anomalia = np.ones(len(df), dtype=int)
+    else:
+        distancia, _ = NearestNeighbors(n_neighbors=1).fit(nucleos).kneighbors(features)
+        anomalia = np.where(distancia[:, 0] <= modelo["eps"], 0, 1)
+
+    banderas_ensamble = None
+    if isinstance(modelo["archivo_ensamble"], str):
+        banderas_ensamble = predecir_ensamble(joblib.load(Path(directorio) / modelo["archivo_ensamble"]), features)
+    return df, (alerta_presion, alerta_temperatura, anomalia, banderas_ensamble)
+
+def leer_lecturas(conn, clientes=None):
+    """
+    Lecturas gold de los clientes (por defecto los configurados en Cliente), desde
+    el almacén columnar si existe o desde SQLite.
+    """
+    clientes = list(Cliente) if clientes is None else list(clientes)
+    if almacen_gold.existe_tabla("lecturas_completas"):
+        # Leer solo las particiones de los clientes configurados
+        df_all = almacen_gold.leer_tabla("lecturas_completas", clientes=clientes)
+    else:
+        df_all = esquema_db.leer_sql("SELECT * FROM gold_lecturas_completas", conn)
+    df_all['timestamp'] = pd.to_datetime(df_all['timestamp'])
+    return df_all
+
+def entrenar_por_cliente(db_path, perfil=None, n_workers=1, usar_grafo=False, ventana_iqr=None, ensamble=False):
+    perfil = perfil or perfilado.Perfil("deteccion")
+    # Realizar conexión a la BD
+    conn = esquema_db.conectar(db_path)
+    with perfil.etapa("lectura") as registro:
+        df_all = leer_lecturas(conn)
+        registro["filas_salida"] = len(df_all)
+
+    with perfil.etapa("deteccion", len(df_all)) as registro:
+        df_resultado, modelos = detectar_clientes(df_all, perfil, n_workers=n_workers, usar_grafo=usar_grafo,
+                                                  ventana_iqr=ventana_iqr, ensamble=ensamble)
+        registro["filas_salida"] = len(df_resultado)
+
+    # Primero el almacén columnar: si falla, la tabla anterior queda intacta y
+    # SQLite y los modelos siguen siendo los de la detección anterior
+    with perfil.etapa("almacen", len(df_resultado)) as registro:
+        almacen_gold.escribir_tabla(df_resultado, "anomalias")
+        registro["filas_salida"] = len(df_resultado)
+
     # Guardar en base de datos
-    df_resultado.to_sql("gold_anomalias", conn, if_exists="replace", index=False)
+    with perfil.etapa("carga_sqlite", len(df_resultado)) as registro:
+        esquema_db.cargar_tabla(conn, df_resultado, "gold_anomalias")
+        registro["filas_salida"] = len(df_resultado)
+    with perfil.etapa("resumen_diario", len(df_resultado)) as registro:
+        registro["filas_salida"] = len(resumen_diario.guardar(conn, df_resultado))
+    with conn:
+        guardar_modelos(conn, modelos)
+    # Solo con todas las salidas escritas, el dashboard descarta sus cachés en la siguiente consulta
+    esquema_db.incrementar_version(conn, "gold_anomalias")
     conn.close()
     print("✅ Datos procesados con IQR + ML (DBSCAN)")
 
+def leer_pendientes(conn, cliente, marca):
+    """
+    Lecturas de la tabla gold del cliente posteriores a `marca`.
+    """
+    desde = marca + pd.Timedelta(seconds=1)
+    if almacen_gold.existe_tabla("lecturas_completas"):
+        return almacen_gold.leer_tabla("lecturas_completas", clientes=[cliente], desde=desde)
+    clausula, params = esquema_db.filtro_sql([cliente], desde=desde)
+    return esquema_db.leer_sql(f"SELECT * FROM gold_lecturas_completas{clausula} ORDER BY timestamp", conn, params)
+
+def hay_pendientes(conn, cliente, marca=None):
+    """
+    Indica si la tabla gold tiene lecturas del cliente posteriores a `marca` (o
+    alguna lectura, si el cliente aún no está en gold_anomalias).
+    """
+    desde = marca + pd.Timedelta(seconds=1) if marca is not None else None
+    if almacen_gold.existe_tabla("lecturas_completas"):
+        return len(almacen_gold.leer_tabla("lecturas_completas", clientes=[cliente], desde=desde,
+                                           columnas=["timestamp"])) > 0
+    clausula, params = esquema_db.filtro_sql([cliente], desde=desde)
+    return conn.execute(f"SELECT 1 FROM gold_lecturas_completas{clausula} LIMIT 1", params).fetchone() is not None
+
+def puntuar_incremental(db_path, perfil=None, n_workers=1, usar_grafo=False, ventana_iqr=None, ensamble=False):
+    """
+    Puntúa solo las lecturas posteriores a la última lectura de cada cliente en
+    gold_anomalias, con los límites IQR y el DBSCAN guardados en la última detección
+    completa, y las inserta/actualiza sin reescribir la historia. Los clientes sin
+    modelo guardado se omiten hasta el siguiente reajuste completo. Si el ajuste
+    usó IQR móvil, también se lee la última ventana de historia de cada cliente
+    para reconstruir sus cuartiles. Si no hay modelos guardados se ejecuta la
+    detección completa con las mismas opciones (workers, grafo, IQR móvil, ensamble).
+    """
+    perfil = perfil or perfilado.Perfil("deteccion")
+    conn = esquema_db.conectar(db_path)
+    modelos = cargar_modelos(conn)
+    if modelos is None or not esquema_db.esquema_vigente(conn, "gold_anomalias"):
+        conn.close()
+        print("ℹ️ No hay modelos guardados o gold_anomalias usa el esquema antiguo, se ejecuta la detección completa.")
+        return entrenar_por_cliente(db_path, perfil, n_workers=n_workers, usar_grafo=usar_grafo,
+                                    ventana_iqr=ventana_iqr, ensamble=ensamble)
+
+    marcas = dict(conn.execute("SELECT cliente_id, MAX(timestamp) FROM gold_anomalias GROUP BY cliente_id").fetchall())
+
+    resultados = []
+    omitidos = []
+    with perfil.etapa("deteccion") as registro:
+        for cliente in Cliente.keys():
+            if cliente not in modelos.index or cliente not in marcas:
+                # Solo se avisa de los clientes que tienen lecturas por puntuar
+                marca = pd.to_datetime(marcas[cliente], unit="s") if cliente in marcas else None
+                if hay_pendientes(conn, cliente, marca):
+                    omitidos.append(cliente)
+                continue
+            modelo = modelos.loc[cliente]
+            marca = pd.to_datetime(marcas[cliente], unit="s")
+            ventana = modelo["ventana_iqr"] if isinstance(modelo["ventana_iqr"], str) else None
+            df = leer_pendientes(conn, cliente, marca - pd.Timedelta(ventana) if ventana else marca)
+            df['timestamp'] = pd.to_datetime(df['timestamp'])
+            if not (df['timestamp'] > marca).any():
+                continue
+            with perfil.cliente("deteccion", cliente, len(df)):
+                resultados.append(completar_cliente(*puntuar_cliente(df, modelo, marca)))
+        registro["filas_salida"] = sum(len(df) for df in resultados)
+
+    if omitidos:
+        print(f"⚠️ {len(omitidos)} cliente(s) con lecturas nuevas sin modelo guardado, se incluirán en el próximo reajuste completo: {', '.join(omitidos)}")
+    if not resultados:
+        conn.close()
+        print("✅ No hay lecturas nuevas por puntuar.")
+        return
+
+    df_resultado = unir_resultados(resultados)
+    # Mismo orden que la detección completa. La marca de la siguiente ejecución sale
+    # de gold_anomalias en SQLite: si falla el almacén, SQLite no avanza y las
+    # lecturas se vuelven a puntuar; el resumen diario se recalcula desde SQLite
+    with perfil.etapa("almacen", len(df_resultado)) as registro:
+        almacen_gold.actualizar_tabla(df_resultado, "anomalias")
+        registro["filas_salida"] = len(df_resultado)
+    with perfil.etapa("carga_sqlite", len(df_resultado)) as registro:
+        esquema_db.upsert_tabla(conn, df_resultado, "gold_anomalias")
+        registro["filas_salida"] = len(df_resultado)
+    with perfil.etapa("resumen_diario", len(df_resultado)) as registro:
+        registro["filas_salida"] = len(resumen_diario.actualizar(conn, df_resultado))
+    esquema_db.incrementar_version(conn, "gold_anomalias")
+    conn.close()
+    print(f"✅ {len(df_resultado)} lecturas nuevas puntuadas con los modelos guardados (IQR + DBSCAN)")
+
 if __name__ == "__main__":
-    entrenar_por_cliente(DB_PATH)
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Detección de anomalías de OptiGas: reglas IQR + DBSCAN por cliente")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Procesos para los ajustes por cliente (0 = todos los núcleos)")
+    parser.add_argument("--incremental", action="store_true",
+                        help="Puntúa solo las lecturas nuevas con los modelos de la última detección completa")
+    parser.add_argument("--iqr-ventana", default=None, metavar="VENTANA",
+                        help="Calcula los cuartiles IQR sobre una ventana móvil (p. ej. 30D) en lugar de toda la historia")
+    parser.add_argument("--ensamble", action="store_true",
+                        help="Agrega Isolation Forest y One-Class SVM a DBSCAN y un puntaje combinado")
+    parser.add_argument("--dbscan-grafo", action="store_true",
+                        help=f"Ejecuta DBSCAN sobre un grafo de vecinos por cliente guardado en {grafo_vecinos.GRAFOS_DIR}")
+    parser.add_argument("--profile", action="store_true",
+                        help=f"Guarda un reporte JSON de tiempos, memoria y filas por etapa y cliente en {perfilado.PERFILES_DIR}")
+    parser.add_argument("--profile-etapa", default=None,
+                        help="Etapa a ejecutar bajo cProfile (p. ej. deteccion); guarda un archivo .prof junto al reporte")
+    args = parser.parse_args()
+
+    perfil = perfilado.Perfil("deteccion", etapa_cprofile=args.profile_etapa)
+    if args.incremental:
+        puntuar_incremental(DB_PATH, perfil, n_workers=args.workers or None, usar_grafo=args.dbscan_grafo,
+                            ventana_iqr=args.iqr_ventana, ensamble=args.ensamble)
+    else:
+        entrenar_por_cliente(DB_PATH, perfil, n_workers=args.workers or None, usar_grafo=args.dbscan_grafo,
+                             ventana_iqr=args.iqr_ventana, ensamble=args.ensamble)
+    if args.profile or args.profile_etapa:
+        perfil.guardar()
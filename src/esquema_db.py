@@ -0,0 +1,283 @@
+import sqlite3
+
+import pandas as pd
+
+# Filas por lote en las cargas masivas con executemany
+TAMANO_LOTE = 50_000
+
+# Número de versión por tabla, que el pipeline incrementa al escribir y el
+# dashboard usa para invalidar sus cachés
+TABLA_VERSIONES = "gold_versiones"
+
+EPOCA = pd.Timestamp(0)
+
+# Esquema explícito de las tablas gold. Los timestamps se guardan como segundos
+# epoch (INTEGER) para que los rangos de fechas usen los índices.
+COLUMNAS_LECTURAS = {
+    "cliente_id": "TEXT NOT NULL",
+    "timestamp": "INTEGER NOT NULL",
+    "presion": "REAL",
+    "temperatura": "REAL",
+    "volumen": "REAL",
+    "TemperaturaSinTendencia": "REAL",
+    "Presion_scaled": "REAL",
+    "Temperatura_scaled": "REAL",
+    "Volumen_scaled": "REAL",
+}
+
+ESQUEMAS = {
+    "gold_lecturas_completas": {
+        "columnas": COLUMNAS_LECTURAS,
+        "llave": ("cliente_id", "timestamp"),
+        "indices": {
+            "timestamp": ("timestamp",),
+        },
+    },
+    "gold_anomalias": {
+        "columnas": {
+            **COLUMNAS_LECTURAS,
+            "alerta_presion": "INTEGER",
+            "alerta_temperatura": "INTEGER",
+            "alerta_reglas": "INTEGER",
+            "Anomalia_modelo": "INTEGER",
+            "anomalia_iso": "INTEGER",
+            "anomalia_svm": "INTEGER",
+            "puntaje_ensamble": "REAL",
+            "anomalia_general": "INTEGER",
+            "severidad": "TEXT",
+        },
+        "llave": ("cliente_id", "timestamp"),
+        "indices": {
+            "timestamp": ("timestamp",),
+            "severidad_timestamp": ("severidad", "timestamp"),
+        },
+    },
+    # Un registro por cliente y día (timestamp = inicio del día) con los agregados
+    # de volumen y severidad que usan los KPIs y el resumen del dashboard
+    "gold_resumen_diario": {
+        "columnas": {
+            "cliente_id": "TEXT NOT NULL",
+            "timestamp": "INTEGER NOT NULL",
+            "filas": "INTEGER",
+            "ultima_lectura": "INTEGER",
+            "volumen_n": "INTEGER",
+            "volumen_suma": "REAL",
+            "volumen_min": "REAL",
+            "volumen_max": "REAL",
+            "volumen_media": "REAL",
+            "volumen_std": "REAL",
+            "num_Alto": "INTEGER",
+            "num_Potencial": "INTEGER",
+            "num_OK": "INTEGER",
+        },
+        "llave": ("cliente_id", "timestamp"),
+        "indices": {
+            "timestamp": ("timestamp",),
+        },
+    },
+}
+
+
+def conectar(db_path):
+    """
+    Abre la conexión a SQLite con WAL (lectores del dashboard y escrituras del
+    pipeline no se bloquean entre sí) y escrituras con sincronización normal, y
+    crea la tabla de versiones si la base aún no la tiene.
+    """
+    conn = sqlite3.connect(db_path)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    crear_tabla_versiones(conn)
+    return conn
+
+
+def crear_tabla_versiones(conn):
+    conn.execute(
+        f'CREATE TABLE IF NOT EXISTS "{TABLA_VERSIONES}" '
+        "(tabla TEXT PRIMARY KEY, version INTEGER NOT NULL, actualizado INTEGER NOT NULL)"
+    )
+    conn.commit()
+
+
+def a_epoch(fecha):
+    """
+    Convierte una fecha (o Series de fechas) a segundos epoch para consultas y cargas.
+    Se resta la época en lugar de leer los enteros internos, que dependen de la
+    resolución (s, ms, us o ns) del datetime.
+    """
+    if isinstance(fecha, pd.Series):
+        return (pd.to_datetime(fecha) - EPOCA) // pd.Timedelta(seconds=1)
+    return int((pd.Timestamp(fecha) - EPOCA) // pd.Timedelta(seconds=1))
+
+
+def desde_epoch(df, columna="timestamp"):
+    """
+    Restaura la columna de segundos epoch como datetime tras leer de SQLite. Las
+    tablas escritas fuera del pipeline (p. ej. gold_validacion_fisica) pueden
+    guardar el timestamp como texto; en ese caso se interpreta como fecha.
+    """
+    if columna in df.columns:
+        if pd.api.types.is_numeric_dtype(df[columna]):
+            df[columna] = pd.to_datetime(df[columna], unit="s")
+        else:
+            df[columna] = pd.to_datetime(df[columna])
+    return df
+
+
+def leer_sql(query, conn, params=None):
+    """
+    pd.read_sql que devuelve el timestamp ya convertido a datetime.
+    """
+    return desde_epoch(pd.read_sql(query, conn, params=params))
+
+
+def filtro_sql(clientes=None, desde=None, hasta=None, severidades=None):
+    """
+    Cláusula WHERE parametrizada sobre (cliente_id, timestamp) y, si se indica,
+    severidad, que SQLite resuelve con la llave primaria o los índices de timestamp
+    y (severidad, timestamp). Devuelve (cláusula, parámetros).
+    """
+    condiciones, params = [], []
+    if clientes is not None:
+        clientes = list(clientes)
+        condiciones.append(f"cliente_id IN ({', '.join('?' for _ in clientes)})")
+        params.extend(clientes)
+    if desde is not None:
+        condiciones.append("timestamp >= ?")
+        params.append(a_epoch(desde))
+    if hasta is not None:
+        condiciones.append("timestamp <= ?")
+        params.append(a_epoch(hasta))
+    if severidades is not None:
+        severidades = list(severidades)
+        condiciones.append(f"severidad IN ({', '.join('?' for _ in severidades)})")
+        params.extend(severidades)
+    clausula = f" WHERE {' AND '.join(condiciones)}" if condiciones else ""
+    return clausula, params
+
+
+def tipo_sql(serie):
+    if pd.api.types.is_bool_dtype(serie) or pd.api.types.is_integer_dtype(serie):
+        return "INTEGER"
+    if pd.api.types.is_float_dtype(serie):
+        return "REAL"
+    return "TEXT"
+
+
+def columnas_tabla(df, tabla):
+    """
+    Columnas declaradas para la tabla más las columnas adicionales del DataFrame,
+    con el tipo inferido de su dtype. La columna 'index' heredada no se guarda.
+    """
+    columnas = {c: t for c, t in ESQUEMAS[tabla]["columnas"].items() if c in df.columns}
+    for c in df.columns:
+        if c not in columnas and c != "index":
+            columnas[c] = tipo_sql(df[c])
+    return columnas
+
+
+def crear_tabla(conn, tabla, columnas, nombre=None):
+    nombre = nombre or tabla
+    llave = ", ".join(ESQUEMAS[tabla]["llave"])
+    definicion = ",\n    ".join(f'"{c}" {t}' for c, t in columnas.items())
+    conn.execute(f'CREATE TABLE IF NOT EXISTS "{nombre}" (\n    {definicion},\n    PRIMARY KEY ({llave})\n)')
+
+
+def crear_indices(conn, tabla):
+    for nombre, columnas in ESQUEMAS[tabla]["indices"].items():
+        conn.execute(f'CREATE INDEX IF NOT EXISTS "idx_{tabla}_{nombre}" ON "{tabla}" ({", ".join(columnas)})')
+
+
+def lotes(df, columnas, tamano=TAMANO_LOTE):
+    """
+    Genera lotes de tuplas nativas de Python listos para executemany.
+    """
+    for inicio in range(0, len(df), tamano):
+        parte = df.iloc[inicio:inicio + tamano]
+        valores = []
+        for c in columnas:
+            # SQLite guarda los NaN como NULL, así que los flotantes pasan sin convertir
+            serie = a_epoch(parte[c]) if pd.api.types.is_datetime64_any_dtype(parte[c]) else parte[c]
+            valores.append(serie.tolist())
+        yield list(zip(*valores))
+
+
+def insertar(conn, nombre, df, columnas, reemplazar_filas=False):
+    verbo = "INSERT OR REPLACE" if reemplazar_filas else "INSERT"
+    nombres = ", ".join(f'"{c}"' for c in columnas)
+    marcadores = ", ".join("?" for _ in columnas)
+    sql = f'{verbo} INTO "{nombre}" ({nombres}) VALUES ({marcadores})'
+    for lote in lotes(df, list(columnas)):
+        conn.executemany(sql, lote)
+        conn.commit()
+
+
+def cargar_tabla(conn, df, tabla):
+    """
+    Reemplaza la tabla completa: carga por lotes en una tabla temporal, crea la
+    llave primaria e índices, la intercambia con la actual en una sola transacción
+    y actualiza las estadísticas del planificador (ANALYZE).
+    """
+    columnas = columnas_tabla(df, tabla)
+    temporal = f"{tabla}__carga"
+
+    conn.execute(f'DROP TABLE IF EXISTS "{temporal}"')
+    crear_tabla(conn, tabla, columnas, nombre=temporal)
+    conn.commit()
+    insertar(conn, temporal, df, columnas)
+
+    # sqlite3 no abre transacciones implícitas para DDL, por eso el BEGIN explícito
+    conn.execute("BEGIN")
+    conn.execute(f'DROP TABLE IF EXISTS "{tabla}"')
+    conn.execute(f'ALTER TABLE "{temporal}" RENAME TO "{tabla}"')
+    crear_indices(conn, tabla)
+    conn.commit()
+    conn.execute(f'ANALYZE "{tabla}"')
+
+
+def upsert_tabla(conn, df, tabla):
+    """
+    Inserta o reemplaza filas por llave primaria (cliente_id, timestamp), creando
+    la tabla si no existe.
+    """
+    columnas = columnas_tabla(df, tabla)
+    crear_tabla(conn, tabla, columnas)
+    crear_indices(conn, tabla)
+    conn.commit()
+    insertar(conn, tabla, df, columnas, reemplazar_filas=True)
+    conn.execute(f'ANALYZE "{tabla}"')
+
+
+def esquema_vigente(conn, tabla):
+    """
+    Indica si la tabla existe y fue creada con este esquema (timestamp INTEGER y
+    llave primaria), y no por el antiguo DataFrame.to_sql.
+    """
+    info = conn.execute(f'PRAGMA table_info("{tabla}")').fetchall()
+    tipos = {fila[1]: fila[2] for fila in info}
+    llave = [fila[1] for fila in sorted(info, key=lambda f: f[5]) if fila[5] > 0]
+    return tipos.get("timestamp") == "INTEGER" and tuple(llave) == ESQUEMAS[tabla]["llave"]
+
+
+def incrementar_version(conn, tabla):
+    """
+    Registra que `tabla` cambió incrementando su versión en TABLA_VERSIONES.
+    """
+    crear_tabla_versiones(conn)
+    conn.execute(
+        f'INSERT INTO "{TABLA_VERSIONES}" (tabla, version, actualizado) VALUES (?, 1, ?) '
+        "ON CONFLICT(tabla) DO UPDATE SET version = version + 1, actualizado = excluded.actualizado",
+        (tabla, a_epoch(pd.Timestamp.now())),
+    )
+    conn.commit()
+
+
+def leer_version(conn, tabla):
+    """
+    Versión actual de `tabla`, o None si el pipeline nunca la registró.
+    """
+    try:
+        fila = conn.execute(f'SELECT version FROM "{TABLA_VERSIONES}" WHERE tabla = ?', (tabla,)).fetchone()
+    except sqlite3.OperationalError:
+        return None
+    return fila[0] if fila else None
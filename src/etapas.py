@@ -0,0 +1,154 @@
+import hashlib
+import inspect
+import json
+import os
+from functools import partial
+from pathlib import Path
+
+import pandas as pd
+
+import perfilado
+
+# Carpeta donde se guarda la salida de cada etapa del ETL
+CHECKPOINT_DIR = Path("data/cache/etapas")
+
+
+def nombres_codigo(codigo):
+    """
+    Nombres globales que usa un objeto de código, incluidos los de sus funciones
+    anidadas, lambdas y comprensiones.
+    """
+    nombres = set(codigo.co_names)
+    for constante in codigo.co_consts:
+        if inspect.iscode(constante):
+            nombres |= nombres_codigo(constante)
+    return nombres
+
+
+def version_codigo(funcion):
+    """
+    Hash del código de la función de una etapa (sin los partial que la envuelven):
+    su fuente, la de las funciones de su mismo módulo que llama (recursivamente,
+    p. ej. ajustar_stl en la etapa stl) y el valor de las constantes simples que lee
+    (p. ej. VARIABLES_ESCALADAS). Cambiar otra función del módulo no altera la
+    versión, así que no invalida los checkpoints de las etapas que no la usan.
+    """
+    while isinstance(funcion, partial):
+        funcion = funcion.func
+    modulo = funcion.__module__
+    partes = set()
+    vistas = set()
+    pendientes = [funcion]
+    while pendientes:
+        actual = pendientes.pop()
+        if actual in vistas:
+            continue
+        vistas.add(actual)
+        try:
+            partes.add(inspect.getsource(actual))
+        except (OSError, TypeError):
+            partes.add(f"{actual.__module__}.{actual.__qualname__}")
+        for nombre in nombres_codigo(actual.__code__):
+            valor = actual.__globals__.get(nombre)
+            if inspect.isfunction(valor) and valor.__module__ == modulo:
+                pendientes.append(valor)
+            elif isinstance(valor, (str, int, float, tuple, list, dict)):
+                partes.add(f"{nombre} = {valor!r}")
+    return hashlib.sha256("\n".join(sorted(partes)).encode()).hexdigest()
+
+
+def clave_etapa(clave_entrada, nombre, parametros=None, version=""):
+    """
+    Clave de una etapa: hash de la clave de su entrada, su nombre, sus parámetros y
+    la versión de su código (version_codigo). Como cada etapa es determinista, la
+    clave de la etapa anterior identifica el contenido de la entrada sin tener que
+    hashear el DataFrame, y un cambio de código invalida el checkpoint de la etapa
+    y de las siguientes.
+    """
+    h = hashlib.sha256()
+    h.update(clave_entrada.encode())
+    h.update(nombre.encode())
+    h.update(json.dumps(parametros or {}, sort_keys=True, default=str).encode())
+    h.update(version.encode())
+    return h.hexdigest()
+
+
+def ruta_checkpoint(nombre, clave, directorio=CHECKPOINT_DIR, parte="datos"):
+    return Path(directorio) / f"{nombre}-{clave[:16]}.{parte}.pkl"
+
+
+def guardar_checkpoint(df, info, nombre, clave, directorio=CHECKPOINT_DIR):
+    """
+    Guarda la salida de la etapa: el DataFrame y, aparte, su info (pequeña, para no
+    leer el DataFrame al reanudar). La escritura es atómica, de modo que un fallo a
+    mitad de camino no deja un checkpoint corrupto, y se eliminan las versiones
+    anteriores de la etapa.
+    """
+    directorio = Path(directorio)
+    directorio.mkdir(parents=True, exist_ok=True)
+    for parte, objeto in (("info", info), ("datos", df)):
+        ruta = ruta_checkpoint(nombre, clave, directorio, parte)
+        temporal = ruta.with_suffix(".tmp")
+        pd.to_pickle(objeto, temporal)
+        os.replace(temporal, ruta)
+
+    vigentes = {ruta_checkpoint(nombre, clave, directorio, parte) for parte in ("info", "datos")}
+    for viejo in directorio.glob(f"{nombre}-{'?' * 16}.*.pkl"):
+        if viejo not in vigentes:
+            viejo.unlink()
+
+
+def leer_info(nombre, clave, directorio=CHECKPOINT_DIR):
+    ruta = ruta_checkpoint(nombre, clave, directorio, "info")
+    return pd.read_pickle(ruta) if ruta.exists() else None
+
+
+def ejecutar_etapas(etapas, clave_inicial, cargar_entrada, directorio=CHECKPOINT_DIR, usar_checkpoints=True,
+                    perfil=None):
+    """
+    Ejecuta en orden las etapas [(nombre, funcion, parametros), ...], donde
+    funcion(df, **parametros) devuelve un DataFrame o una tupla (DataFrame, info).
+
+    Se reanuda desde el último checkpoint válido: las etapas cuya entrada,
+    parámetros y código no cambiaron no se ejecutan, y si todas están guardadas no se llama
+    a cargar_entrada(). Devuelve (df, infos) con la info de cada etapa por nombre.
+    Cada etapa (ejecutada o recuperada) se mide en `perfil`.
+    """
+    perfil = perfil or perfilado.Perfil("etapas")
+    claves = []
+    clave = clave_inicial
+    for nombre, funcion, parametros in etapas:
+        clave = clave_etapa(clave, nombre, parametros, version_codigo(funcion))
+        claves.append(clave)
+
+    # Última etapa con checkpoint; las anteriores solo se necesitan por su info
+    inicio = 0
+    if usar_checkpoints:
+        for i in range(len(etapas) - 1, -1, -1):
+            if ruta_checkpoint(etapas[i][0], claves[i], directorio).exists():
+                inicio = i + 1
+                break
+
+    infos = {}
+    df = None
+    for i, (nombre, funcion, parametros) in enumerate(etapas):
+        if i < inicio:
+            with perfil.etapa(nombre) as registro:
+                registro["checkpoint"] = True
+                if i == inicio - 1:
+                    df = pd.read_pickle(ruta_checkpoint(nombre, claves[i], directorio))
+                    registro["filas_salida"] = len(df)
+                infos[nombre] = leer_info(nombre, claves[i], directorio)
+            print(f"⏭️ Etapa '{nombre}' recuperada del checkpoint.")
+            continue
+
+        if df is None:
+            df = cargar_entrada()
+        with perfil.etapa(nombre, len(df)) as registro:
+            resultado = funcion(df, **(parametros or {}))
+            df, infos[nombre] = resultado if isinstance(resultado, tuple) else (resultado, None)
+            registro["filas_salida"] = len(df)
+        if usar_checkpoints:
+            guardar_checkpoint(df, infos[nombre], nombre, claves[i], directorio)
+
+    return df, infos
@@ -1,205 +1,628 @@
 import pandas as pd
-import sqlite3
 import numpy as np
 from statsmodels.tsa.seasonal import STL
 from pathlib import Path
-from sklearn.preprocessing import StandardScaler, RobustScaler
 import os
+import argparse
+import time
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from ingesta_excel import leer_hojas_excel, hash_libro
+import etapas
+import perfilado
+import almacen_gold
+import esquema_db
 
 # Rutas de entrada/salida
 EXCEL_PATH = Path("data/raw/Datos.xlsx")
 DB_PATH = "db/optigas.db"
 CSV_OUTPUT = "data/gold/lecturas_completas.csv"
 
-def tratar_duplicados(df):
+# Tablas de la capa gold y de control del ETL
+TABLA_GOLD = "gold_lecturas_completas"
+TABLA_MARCAS_AGUA = "etl_marcas_agua"
+TABLA_ESCALADORES = "etl_escaladores"
+
+# Horas de historia previa que se reprocesan en modo incremental para que la
+# interpolación y la STL (suavizado estacional de 7 ciclos diarios) tengan continuidad
+VENTANA_CONTEXTO_HORAS = 24 * 14
+
+# Nombres de columnas en la tabla gold
+COLUMNAS_GOLD = {"Fecha": "timestamp", 'Presion': 'presion', 'Volumen': 'volumen', 'Temperatura': 'temperatura', 'Cliente': 'cliente_id'}
+
+# Variables de entrada de los escaladores, en el orden de las columnas *_scaled
+VARIABLES_ESCALADAS = ['Presion', 'TemperaturaSinTendencia', 'Volumen']
+
+# Estrategia recomendada por cliente para resolver lecturas duplicadas. Puede ser
+# una sola estrategia para todas las variables o un diccionario por variable.
+ESTRATEGIAS_DUPLICADOS = {
+    "CLIENTE2": "mediana",
+    "CLIENTE3": "promedio",
+    "CLIENTE8": "mediana",
+    "CLIENTE11": "promedio",
+    "CLIENTE16": "mediana",
+    "CLIENTE18": {
+        "Presion": "promedio",
+        "Temperatura": "promedio",
+        "Volumen": "mediana"
+    }
+}
+
+# Traducción de las estrategias a las agregaciones de pandas
+AGREGACIONES = {"promedio": "mean", "mediana": "median"}
+
+def tabla_estrategias(estrategias, variables):
+    """
+    Expande el diccionario de estrategias a una tabla cliente x variable con la
+    agregación de pandas ('mean'/'median') que corresponde a cada celda.
+    """
+    filas = {}
+    for cliente, estrategia in estrategias.items():
+        if isinstance(estrategia, dict):
+            filas[cliente] = {var: AGREGACIONES.get(estrategia.get(var)) for var in variables}
+        else:
+            filas[cliente] = {var: AGREGACIONES[estrategia] for var in variables}
+    return pd.DataFrame.from_dict(filas, orient="index", columns=list(variables))
+
+def media_por_grupo(valores, inicios, tamanos):
+    """
+    Promedio de grupos contiguos de un arreglo ordenado, ignorando NaN. Suma de
+    izquierda a derecha como Series.mean() para que los resultados sean idénticos
+    bit a bit; los grupos de 8 o más lecturas (poco comunes) se delegan a numpy.
+    """
+    validos = ~np.isnan(valores)
+    valores = np.where(validos, valores, 0.0)
+    sumas = np.zeros(len(inicios))
+    for k in range(min(int(tamanos.max(initial=0)), 7)):
+        activo = tamanos > k
+        sumas[activo] += valores[inicios[activo] + k]
+    for i in np.flatnonzero(tamanos >= 8):
+        sumas[i] = valores[inicios[i]:inicios[i] + tamanos[i]].sum()
+    conteos = np.add.reduceat(validos, inicios) if len(inicios) else np.zeros(0)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.where(conteos > 0, sumas / conteos, np.nan)
+
+def tratar_duplicados(df, estrategias=ESTRATEGIAS_DUPLICADOS):
     """
     Trata registros duplicados por cliente y fecha aplicando estrategias específicas
     (promedio o mediana) por cliente y variable.
+
+    Todos los grupos (Cliente, Fecha) repetidos se resuelven en una sola pasada
+    agrupada; las filas sin duplicados se conservan tal cual.
     """
-    # Lista de clientes con su estrategia recomendada
-    estrategias = {
-        "CLIENTE2": "mediana",
-        "CLIENTE3": "promedio",
-        "CLIENTE8": "mediana",
-        "CLIENTE11": "promedio",
-        "CLIENTE16": "mediana",
-        "CLIENTE18": {
-            "Presion": "promedio", 
-            "Temperatura": "promedio", 
-            "Volumen": "mediana"
-        }
-    }
+    clave = ["Cliente", "Fecha"]
 
     # Filtrar solo los clientes con duplicados conocidos
-    clientes_duplicados = estrategias.keys()
-    df_filtrado = df[df['Cliente'].isin(clientes_duplicados)]
+    en_estrategia = df['Cliente'].isin(estrategias.keys()) & df['Fecha'].notna()
+    df_filtrado = df[en_estrategia]
 
-    # Agrupar y aplicar estrategia
-    grupos = df_filtrado.groupby(['Cliente', 'Fecha'])
+    # Separar las filas con (Cliente, Fecha) repetido de las únicas
+    repetido = df_filtrado.duplicated(clave, keep=False)
+    df_unicos = df_filtrado[~repetido]
+    df_repetidos = df_filtrado[repetido]
 
-    filas_limpias = []
+    variables = [c for c in df.select_dtypes(include="number").columns if c not in clave]
+    tabla = tabla_estrategias(estrategias, variables)
 
-    for (cliente, fecha), grupo in grupos:
-        if len(grupo) == 1:
-            filas_limpias.append(grupo.iloc[0])
-        else:
-            estrategia = estrategias[cliente]
-            if isinstance(estrategia, dict):
-                fila = {
-                    "Fecha": fecha,
-                    "Cliente": cliente,
-                    "Presion": grupo["Presion"].mean() if estrategia["Presion"] == "promedio" else grupo["Presion"].median(),
-                    "Temperatura": grupo["Temperatura"].mean() if estrategia["Temperatura"] == "promedio" else grupo["Temperatura"].median(),
-                    "Volumen": grupo["Volumen"].mean() if estrategia["Volumen"] == "promedio" else grupo["Volumen"].median()
-                }
-            else:
-                func = grupo.median if estrategia == "mediana" else grupo.mean
-                fila = func(numeric_only=True)
-                fila["Fecha"] = fecha
-                fila["Cliente"] = cliente
-            filas_limpias.append(pd.Series(fila))
-
-    # Crear dataFrame limpio solo con registros duplicados tratados
-    df_sin_duplicados = pd.DataFrame(filas_limpias)
+    # Ordenar los repetidos para que cada grupo quede contiguo
+    df_repetidos = df_repetidos.sort_values(clave, kind="stable")
+    inicio_grupo = ~df_repetidos.duplicated(clave).to_numpy()
+    inicios = np.flatnonzero(inicio_grupo)
+    tamanos = np.diff(np.append(inicios, len(df_repetidos)))
+
+    df_agregado = df_repetidos.loc[inicio_grupo, clave].reset_index(drop=True)
+    funciones = tabla.reindex(df_agregado["Cliente"])
+
+    # Calcular las medianas de todas las variables en una sola pasada agrupada
+    medianas = df_repetidos.groupby(clave, sort=True)[variables].median()
+
+    # Elegir por celda el promedio o la mediana según la estrategia del cliente
+    for var in variables:
+        columna = np.full(len(df_agregado), np.nan)
+        usa_media = (funciones[var] == "mean").to_numpy()
+        usa_mediana = (funciones[var] == "median").to_numpy()
+        if usa_media.any():
+            valores = df_repetidos[var].to_numpy(dtype="float64")
+            columna[usa_media] = media_por_grupo(valores, inicios, tamanos)[usa_media]
+        columna[usa_mediana] = medianas[var].to_numpy()[usa_mediana]
+        df_agregado[var] = columna
+
+    # Unir las filas únicas con los grupos resueltos, en el orden de groupby
+    df_sin_duplicados = pd.concat([df_unicos, df_agregado], ignore_index=True)
+    df_sin_duplicados = df_sin_duplicados.sort_values(clave, ignore_index=True)
 
     # Eliminar duplicados del original y unir con la versión limpia
-    df_final = pd.concat([
-        df[~df.set_index(["Cliente", "Fecha"]).index.isin(df_sin_duplicados.set_index(["Cliente", "Fecha"]).index)],
-        df_sin_duplicados
-    ], ignore_index=True)
+    df_final = pd.concat([df[~en_estrategia], df_sin_duplicados], ignore_index=True)
 
     return df_final
 
-def tratar_inexistentes(df):
+def interpolar_por_grupo(valores, inicio_grupo):
     """
-    Rellena registros faltantes por cliente a un índice horario completo y aplica
-    interpolación lineal a las variables numéricas.
+    Interpolación lineal por posición de las columnas de `valores` (n x k) dentro de
+    bloques contiguos, sin cruzar de un grupo a otro. Reproduce Series.interpolate():
+    los NaN iniciales se mantienen y los finales toman el último valor válido.
     """
-    # Diccionario para guardar los nuevos DataFrames reindexados por cliente
-    clientes_reindexados = {}
-
-    # Obtener la lista única de clientes del df_final
-    clientes = df['Cliente'].unique()
+    n = len(valores)
+    posiciones = np.arange(n)
+    grupo = np.cumsum(inicio_grupo) - 1
+    inicio = np.flatnonzero(inicio_grupo)[grupo]
+    fin = np.append(np.flatnonzero(inicio_grupo)[1:], n)[grupo] - 1
+
+    resultado = valores.copy()
+    for j in range(valores.shape[1]):
+        columna = valores[:, j]
+        valido = ~np.isnan(columna)
+        if valido.all():
+            continue
 
-    # Procesar cliente por cliente
-    for cliente in clientes:
-        df_cliente = df[df['Cliente'] == cliente].copy()
+        # Último válido hacia atrás y siguiente válido hacia adelante dentro del grupo
+        previo = np.maximum.accumulate(np.where(valido, posiciones, -1))
+        siguiente = np.minimum.accumulate(np.where(valido, posiciones, n)[::-1])[::-1]
+        hay_previo = previo >= inicio
+        hay_siguiente = siguiente <= fin
+
+        x0 = np.where(hay_previo, previo, 0)
+        x1 = np.where(hay_siguiente, siguiente, 0)
+        y0 = columna[x0]
+        y1 = columna[x1]
+        with np.errstate(invalid="ignore", divide="ignore"):
+            pendiente = (y1 - y0) / (x1 - x0)
+            interpolado = pendiente * (posiciones - x0) + y0
+
+        relleno = np.where(hay_siguiente, interpolado, y0)
+        relleno = np.where(hay_previo, relleno, np.nan)
+        resultado[:, j] = np.where(valido, columna, relleno)
+    return resultado
+
+def regularizar_horario(df):
+    """
+    Lleva todas las series a un índice horario completo por cliente en una sola
+    pasada y devuelve el DataFrame junto con una tabla de calidad por cliente
+    (horas de la grilla, horas imputadas y su porcentaje).
 
-        # Poner 'Fecha' en formato correcto y como índice
-        df_cliente = df_cliente.set_index('Fecha')
+    La grilla (cliente, hora) se construye una vez a partir del mínimo y máximo de
+    cada cliente, se reindexa con una sola operación y las tres variables se
+    interpolan juntas sin cruzar de un cliente a otro.
+    """
+    # Rango de fechas de cada cliente, en el orden en que aparecen
+    rangos = df.groupby('Cliente', sort=False)['Fecha'].agg(['min', 'max'])
+    horas = ((rangos['max'] - rangos['min']) // pd.Timedelta(hours=1)).to_numpy() + 1
+
+    # Construir la grilla horaria completa de todos los clientes a la vez
+    desplazamiento = np.arange(horas.sum()) - np.repeat(np.cumsum(horas) - horas, horas)
+    fechas = np.repeat(rangos['min'].to_numpy(), horas) + desplazamiento * np.timedelta64(1, 'h')
+    grilla = pd.MultiIndex.from_arrays([np.repeat(rangos.index.to_numpy(), horas), fechas], names=['Cliente', 'Fecha'])
+
+    # Reindexar al nuevo índice en una sola operación; las horas que no existían
+    # quedan marcadas con NaN en la columna auxiliar
+    df_completo = df.assign(_existe=True).set_index(['Cliente', 'Fecha']).reindex(grilla)
+    imputada = df_completo.pop('_existe').isna().to_numpy()
+    calidad = pd.DataFrame({
+        'horas': horas,
+        'horas_imputadas': np.add.reduceat(imputada, np.cumsum(horas) - horas),
+    }, index=rangos.index)
+    calidad['pct_imputadas'] = 100 * calidad['horas_imputadas'] / calidad['horas']
+
+    # Restaurar el orden de columnas original: Fecha primero y Cliente en su posición
+    df_completo = df_completo.reset_index()
+    columnas = ['Fecha'] + [c for c in df.columns if c != 'Fecha']
+    df_completo = df_completo[columnas]
 
-        # Obtener el rango de fechas del cliente
-        fecha_min = df_cliente.index.min()
-        fecha_max = df_cliente.index.max()
+    # Interpolación por cliente para las variables numéricas
+    variables = ['Volumen', 'Presion', 'Temperatura']
+    inicio_grupo = np.zeros(len(df_completo), dtype=bool)
+    inicio_grupo[np.cumsum(horas) - horas] = True
+    df_completo[variables] = interpolar_por_grupo(df_completo[variables].to_numpy(dtype='float64'), inicio_grupo)
 
-        # Crear indice horario
-        nuevo_index = pd.date_range(start=fecha_min, end=fecha_max, freq="h")
+    return df_completo, calidad
 
-        # Reindexar al nuevo índice
-        df_cliente = df_cliente.reindex(nuevo_index)
+def tratar_inexistentes(df):
+    """
+    Rellena registros faltantes por cliente a un índice horario completo y aplica
+    interpolación lineal a las variables numéricas.
+    """
+    df_completo, _ = regularizar_horario(df)
+    return df_completo
 
-        # Restaurar columna de cliente (porque puede perderse al reindexar)
-        df_cliente['Cliente'] = cliente
+def ajustar_stl_cronometrado(valores):
+    """
+    ajustar_stl que además devuelve los segundos del ajuste (medidos en el worker).
+    """
+    t0 = time.perf_counter()
+    tendencia, motivo = ajustar_stl(valores)
+    return tendencia, motivo, time.perf_counter() - t0
 
-        # Guardar en diccionario
-        clientes_reindexados[cliente] = df_cliente
+def ajustar_stl(valores):
+    """
+    Ajusta STL sobre la serie horaria de un cliente y devuelve (tendencia, motivo).
+    Si el cliente no se puede procesar la tendencia es None y el motivo lo explica.
+    Vive a nivel de módulo para poder enviarse a los procesos del pool.
+    """
+    if np.isnan(valores).sum() > 0:
+        return None, "contiene NaN"
+    if len(valores) < 48:
+        return None, f"solo {len(valores)} registros (mínimo 48)"
+
+    try:
+        # Descomposición STL: eliminamos la tendencia (trend) y mantenemos la estacionalidad
+        resultado = STL(valores, period=24).fit()  # Periodo diario para datos horarios
+    except Exception as e:
+        return None, f"error en STL: {e}"
+    return resultado.trend, None
+
+def descomponer_stl_clientes(df, columna, n_workers=1, perfil=None):
+    """
+    Elimina la tendencia STL de `columna` para cada cliente y devuelve el DataFrame
+    resultante junto con un diccionario {cliente: motivo} de los clientes omitidos.
 
-    # Concatenar todos los clientes
-    df_completo = pd.concat(clientes_reindexados.values())
-    df_completo.reset_index(inplace=True)
-    df_completo.rename(columns={'index': 'Fecha'}, inplace=True)
+    Con n_workers > 1 los ajustes se reparten en un pool de procesos (None usa todos
+    los núcleos); a cada proceso solo se envía la serie del cliente. Los resultados
+    se recogen en el orden original y se concatenan una única vez. Si se pasa un
+    `perfil`, se registra el tiempo de ajuste de cada cliente.
+    """
+    grupos = [(cliente, df_cliente) for cliente, df_cliente in df.groupby('Cliente', sort=False)]
+    series = [df_cliente[columna].to_numpy(dtype="float64") for _, df_cliente in grupos]
+
+    if n_workers == 1:
+        ajustes = [ajustar_stl_cronometrado(valores) for valores in series]
+    else:
+        with ProcessPoolExecutor(max_workers=n_workers) as executor:
+            ajustes = list(executor.map(ajustar_stl_cronometrado, series))
+
+    partes = []
+    omitidos = {}
+    for (cliente, df_cliente), (tendencia, motivo, segundos) in zip(grupos, ajustes):
+        if perfil is not None:
+            perfil.registrar_cliente('stl', cliente, segundos, len(df_cliente))
+        if tendencia is None:
+            omitidos[cliente] = motivo
+            continue
 
-    # Interpolación por cliente para las variables numéricas
-    variables = ['Volumen', 'Presion', 'Temperatura']
-    for var in variables:
-        df_completo[var] = df_completo.groupby('Cliente')[var].transform(lambda x: x.interpolate())
+        # Eliminar la tendencia (restar la tendencia)
+        df_cliente = df_cliente.copy()
+        df_cliente[f'{columna}SinTendencia'] = df_cliente[columna] - tendencia
+        partes.append(df_cliente.reset_index())
 
-    return df_completo
+    df_stl = pd.concat(partes, ignore_index=True) if partes else pd.DataFrame()
+    return df_stl, omitidos
 
-def eliminar_tendencia(df, columna):
+def eliminar_tendencia(df, columna, n_workers=1):
     """
     Aplica la descomposición STL para eliminar la tendencia de una serie temporal por cliente.
     """
-    df_stl = pd.DataFrame()
+    df_stl, omitidos = descomponer_stl_clientes(df, columna, n_workers=n_workers)
 
-    for cliente in df['Cliente'].unique():
-        df_cliente = df[df['Cliente'] == cliente].copy()
+    for cliente, motivo in omitidos.items():
+        print(f"⚠️ Cliente {cliente} omitido en STL: {motivo}")
 
-        if df_cliente[columna].isna().sum() > 0 or len(df_cliente) < 48:
-            continue  # Evita clientes con demasiados NaN o pocos datos
+    return df_stl
 
-        try:
-            # Descomposición STL: eliminamos la tendencia (trend) y mantenemos la estacionalidad
-            stl = STL(df_cliente[columna], period=24)  # Periodo diario para datos horarios
-            resultado = stl.fit()
+def ajustar_escaladores(df):
+    """
+    Calcula en una sola pasada agrupada la media y la escala (desviación estándar
+    poblacional, como StandardScaler) de cada variable por cliente. Devuelve la tabla
+    de parámetros en formato largo: cliente_id, variable, media, escala, varianza, n_muestras.
+    """
+    # Se ajusta sobre los valores en float32 (los que se transforman) acumulando en float64
+    valores = df[VARIABLES_ESCALADAS].astype('float32').astype('float64')
+    grupos = valores.groupby(df['Cliente'], sort=False)
+    medias = grupos.mean()
+    varianzas = grupos.var(ddof=0)
+    conteos = grupos.count()
+
+    parametros = pd.concat({
+        'media': medias.stack(),
+        'varianza': varianzas.stack(),
+        'n_muestras': conteos.stack(),
+    }, axis=1).rename_axis(['cliente_id', 'variable']).reset_index()
+
+    # Igual que StandardScaler: las escalas nulas (series constantes) se dejan en 1
+    escala = np.sqrt(parametros['varianza'].to_numpy())
+    parametros['escala'] = np.where(escala < 10 * np.finfo(np.float64).eps, 1.0, escala)
+    return parametros[['cliente_id', 'variable', 'media', 'escala', 'varianza', 'n_muestras']]
+
+def aplicar_escaladores(df, parametros):
+    """
+    Escala las variables de cada fila con los parámetros guardados de su cliente,
+    en float32 y sin reajustar sobre la historia. Devuelve un arreglo (n x 3) en el
+    orden de VARIABLES_ESCALADAS; los clientes sin parámetros quedan en NaN.
+    """
+    medias = parametros.pivot(index='cliente_id', columns='variable', values='media')[VARIABLES_ESCALADAS]
+    escalas = parametros.pivot(index='cliente_id', columns='variable', values='escala')[VARIABLES_ESCALADAS]
 
-            # Eliminar la tendencia (restar la tendencia)
-            df_cliente[f'{columna}SinTendencia'] = df_cliente[columna] - resultado.trend
-        except Exception as e:
-            print(f"Error procesando cliente {cliente}: {e}")
-            continue
+    codigos = medias.index.get_indexer(df['Cliente'])
+    conocido = (codigos >= 0)[:, None]
+    media = medias.to_numpy(dtype='float32')[codigos]
+    escala = escalas.to_numpy(dtype='float32')[codigos]
 
-        df_cliente = df_cliente.reset_index()
-        df_stl = pd.concat([df_stl, df_cliente], ignore_index=True)
+    features = df[VARIABLES_ESCALADAS].to_numpy(dtype='float32')
+    return np.where(conocido, (features - media) / escala, np.float32(np.nan))
 
-    return df_stl
+def escalar_por_cliente(df, parametros=None):
+    """
+    Escala las variables por cliente y devuelve (DataFrame, parámetros). Los clientes
+    que ya tienen parámetros se transforman con ellos; los demás se ajustan en una
+    sola pasada y se agregan a la tabla de parámetros.
+    """
+    if parametros is None:
+        parametros = ajustar_escaladores(df.iloc[:0])
+
+    nuevos = ~df['Cliente'].isin(parametros['cliente_id'])
+    if nuevos.any():
+        parametros = pd.concat([parametros, ajustar_escaladores(df[nuevos])], ignore_index=True)
+
+    escalado = aplicar_escaladores(df, parametros)
+    df_resultado = df.copy(deep=False)
+    df_resultado['Presion_scaled'] = escalado[:, 0]
+    df_resultado['Temperatura_scaled'] = escalado[:, 1]
+    df_resultado['Volumen_scaled'] = escalado[:, 2]
+    return df_resultado, parametros
 
 def escalar_datos(df):
     """
-    Escala las variables numéricas usando escaladores robustos.
+    Estandariza las variables numéricas por cliente (media 0, desviación 1).
     """
-    df_resultado = df.copy()
+    df_resultado, _ = escalar_por_cliente(df)
+    return df_resultado
 
-    for cliente_id, cliente_data in df.groupby('Cliente'):
-        # Extraer variables numéricas
-        features = cliente_data[['Presion', 'TemperaturaSinTendencia', 'Volumen']].astype('float32')
+def guardar_escaladores(conn, parametros):
+    """
+    Persiste los parámetros de escalado por cliente en la tabla de control.
+    """
+    parametros.to_sql(TABLA_ESCALADORES, conn, if_exists="replace", index=False)
 
-        # Escalar
-        scaler = StandardScaler()
-        features_scaled = scaler.fit_transform(features)
+def cargar_escaladores(conn):
+    """
+    Lee los parámetros de escalado por cliente guardados en la última carga.
+    """
+    if not tabla_existe(conn, TABLA_ESCALADORES):
+        return None
+    return pd.read_sql(f"SELECT * FROM {TABLA_ESCALADORES}", conn)
 
-        # Asignar columnas escaladas
-        df_resultado.loc[cliente_data.index, 'Presion_scaled'] = features_scaled[:, 0]
-        df_resultado.loc[cliente_data.index, 'Temperatura_scaled'] = features_scaled[:, 1]
-        df_resultado.loc[cliente_data.index, 'Volumen_scaled'] = features_scaled[:, 2]
+def tabla_existe(conn, tabla):
+    return conn.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name=?", (tabla,)).fetchone() is not None
 
-    return df_resultado
+def leer_marcas_agua(conn):
+    """
+    Devuelve {cliente: último timestamp crudo procesado}.
+    """
+    if not tabla_existe(conn, TABLA_MARCAS_AGUA):
+        return {}
+    df = pd.read_sql(f"SELECT cliente_id, ultimo_timestamp FROM {TABLA_MARCAS_AGUA}", conn)
+    return dict(zip(df["cliente_id"], pd.to_datetime(df["ultimo_timestamp"])))
 
+def guardar_marcas_agua(conn, marcas):
+    """
+    Inserta o actualiza la marca de agua de cada cliente.
+    """
+    conn.execute(f"""
+        CREATE TABLE IF NOT EXISTS {TABLA_MARCAS_AGUA} (
+            cliente_id TEXT PRIMARY KEY,
+            ultimo_timestamp TEXT NOT NULL,
+            actualizado_en TEXT NOT NULL
+        )""")
+    ahora = str(pd.Timestamp.now().floor("s"))
+    conn.executemany(
+        f"INSERT OR REPLACE INTO {TABLA_MARCAS_AGUA} (cliente_id, ultimo_timestamp, actualizado_en) VALUES (?, ?, ?)",
+        [(cliente, str(ultimo), ahora) for cliente, ultimo in marcas.items()]
+    )
+
+def leer_excel(excel_path):
+    """
+    Lee todas las hojas del Excel crudo (una por cliente) en un solo DataFrame,
+    reutilizando la caché columnar de las hojas que no cambiaron.
+    """
+    df_all = leer_hojas_excel(excel_path)
+    df_all['Fecha'] = pd.to_datetime(df_all['Fecha'])
+    return df_all
 
-def procesar_hojas_excel(excel_path, db_path, export_csv=True):
+def etapas_etl(n_workers=1, perfil=None):
+    """
+    Etapas del ETL completo como (nombre, funcion, parametros) para etapas.ejecutar_etapas.
+    Los parámetros forman parte de la clave del checkpoint; n_workers y perfil no,
+    porque no cambian el resultado.
+    """
+    return [
+        ("duplicados", tratar_duplicados, {"estrategias": ESTRATEGIAS_DUPLICADOS}),
+        ("regularizacion", regularizar_horario, {}),
+        ("stl", partial(descomponer_stl_clientes, n_workers=n_workers, perfil=perfil), {"columna": "Temperatura"}),
+        ("escalado", escalar_por_cliente, {}),
+    ]
+
+def procesar_hojas_excel(excel_path, db_path, export_csv=True, n_workers=1, usar_checkpoints=True, perfil=None):
+    perfil = perfil or perfilado.Perfil("etl")
     # Leer todas las hojas del archivo Excel
     print("👋 Hola, gracias por utilizar OptiGas. A continuación, realizaremos el proceso de Extracción, Transformación y Cargue de datos (ETL)")
     print("🔍 Iniciando proceso ETL con OptiGas.")
-    print("📄 Cargando hojas de Excel...")
-    df_all = pd.concat([pd.read_excel(excel_path, sheet_name=name).assign(Cliente=name) 
-        for name in pd.ExcelFile(excel_path).sheet_names], ignore_index=True)
-    df_all['Fecha'] = pd.to_datetime(df_all['Fecha'])
-    
-    df=tratar_duplicados(df_all)
+
+    def cargar_entrada():
+        print("📄 Cargando hojas de Excel...")
+        with perfil.etapa("lectura_excel") as registro:
+            df_all = leer_excel(excel_path)
+            registro["filas_salida"] = len(df_all)
+        return df_all
+
+    # Cada etapa guarda su salida; si una falla, la siguiente ejecución se reanuda
+    # desde la última etapa completada con la misma entrada y parámetros
+    df, infos = etapas.ejecutar_etapas(etapas_etl(n_workers, perfil), hash_libro(excel_path), cargar_entrada,
+                                       usar_checkpoints=usar_checkpoints, perfil=perfil)
     print('✅ Duplicados tratados.')
-    df=tratar_inexistentes(df)
     print('✅ Imputación de datos faltantes completada.')
-    df=eliminar_tendencia(df,'Temperatura')
+    reportar_calidad(infos["regularizacion"])
     print('✅ Aplicación de la descomposición STL a las series de tiempo 📉')
-    df=escalar_datos(df)
+    reportar_omitidos(infos["stl"])
+    escaladores = infos["escalado"]
 
     print('✅ Datos escalados correctamente. 📏')
     #df=df[(df['Fecha'] >= '2022-01-01')]
-    df=df.rename(columns={"Fecha": "timestamp",'Presion':'presion','Volumen':'volumen','Temperatura':'temperatura','Cliente':'cliente_id'})
+    df=df.rename(columns=COLUMNAS_GOLD)
+
+    # Primero el almacén columnar, que la detección y el modo incremental leen antes
+    # que SQLite; si falla, la tabla anterior queda intacta
+    with perfil.etapa("almacen", len(df)) as registro:
+        almacen_gold.escribir_tabla(df, "lecturas_completas")
+        registro["filas_salida"] = len(df)
+    print(f"🗂️ Almacén columnar actualizado en: {almacen_gold.ruta_tabla('lecturas_completas')}")
 
     # Conexión a la base de datos SQLite
-    conn = sqlite3.connect(db_path)
-    # Guardar como tabla "silver" en SQLite
-    df.to_sql('gold_lecturas_completas', conn, if_exists="replace", index=False)
-    print(f"✅ Tabla 'gold_lecturas_completas' creada con {df.shape[0]} registros.")
+    conn = esquema_db.conectar(db_path)
+    # Guardar como tabla gold en SQLite con su esquema e índices
+    with perfil.etapa("carga_sqlite", len(df)) as registro:
+        esquema_db.cargar_tabla(conn, df, TABLA_GOLD)
+        registro["filas_salida"] = len(df)
+    print(f"✅ Tabla '{TABLA_GOLD}' creada con {df.shape[0]} registros.")
+
+    # Guardar el estado para futuras ejecuciones incrementales, solo con las dos tablas escritas
+    with conn:
+        guardar_escaladores(conn, escaladores)
+        conn.execute(f"DROP TABLE IF EXISTS {TABLA_MARCAS_AGUA}")
+        guardar_marcas_agua(conn, df.groupby('cliente_id')['timestamp'].max().to_dict())
 
     if export_csv:
         os.makedirs("data/gold", exist_ok=True)
-        df.to_csv(CSV_OUTPUT, index=False)
+        with perfil.etapa("csv", len(df)) as registro:
+            df.to_csv(CSV_OUTPUT, index=False)
+            registro["filas_salida"] = len(df)
         print(f"📁 También guardado en: {CSV_OUTPUT}")
 
     conn.close()
     print("\n🏁 Proceso ETL completado exitosamente. Base de datos actualizada.")
 
+def reportar_omitidos(omitidos_stl):
+    if omitidos_stl:
+        print(f"⚠️ {len(omitidos_stl)} cliente(s) omitidos en STL:")
+        for cliente, motivo in omitidos_stl.items():
+            print(f"   - {cliente}: {motivo}")
+
+def reportar_calidad(calidad, n_peores=5):
+    total = calidad['horas_imputadas'].sum()
+    print(f"📊 Horas imputadas: {total} de {calidad['horas'].sum()} ({100 * total / max(calidad['horas'].sum(), 1):.2f}%)")
+    for cliente, fila in calidad.sort_values('pct_imputadas', ascending=False).head(n_peores).iterrows():
+        if fila['horas_imputadas'] > 0:
+            print(f"   - {cliente}: {int(fila['horas_imputadas'])} horas ({fila['pct_imputadas']:.2f}%)")
+
+def leer_contexto(conn, marcas, clientes):
+    """
+    Lee de la tabla gold las últimas VENTANA_CONTEXTO_HORAS de cada cliente, con los
+    nombres de columnas crudos, para dar continuidad a la interpolación y a la STL.
+    Si existe el almacén columnar solo se leen las particiones de esa ventana.
+    """
+    columnas = ['timestamp', 'cliente_id', 'presion', 'temperatura', 'volumen']
+    partes = []
+    for cliente in clientes:
+        desde = marcas[cliente] - pd.Timedelta(hours=VENTANA_CONTEXTO_HORAS)
+        if almacen_gold.existe_tabla("lecturas_completas"):
+            partes.append(almacen_gold.leer_tabla("lecturas_completas", clientes=[cliente], desde=desde, columnas=columnas))
+            continue
+        partes.append(esquema_db.leer_sql(
+            f"SELECT {', '.join(columnas)} FROM {TABLA_GOLD} WHERE cliente_id = ? AND timestamp >= ?",
+            conn, params=(cliente, esquema_db.a_epoch(desde))
+        ))
+    if not partes:
+        return pd.DataFrame(columns=list(COLUMNAS_GOLD))
+    contexto = pd.concat(partes, ignore_index=True).rename(columns={v: k for k, v in COLUMNAS_GOLD.items()})
+    contexto['Fecha'] = pd.to_datetime(contexto['Fecha'])
+    return contexto
+
+def procesar_incremental(excel_path, db_path, n_workers=1, perfil=None):
+    """
+    ETL incremental: procesa solo las lecturas posteriores a la marca de agua de cada
+    cliente, más VENTANA_CONTEXTO_HORAS de historia ya cargada para mantener la
+    continuidad, y las inserta/actualiza en la tabla gold sin reescribirla.
+
+    Las lecturas nuevas se escalan con los parámetros guardados en la última carga
+    completa; los clientes nuevos se procesan completos. Las lecturas que llegan con
+    fecha anterior a la marca de agua se ignoran hasta la siguiente carga completa.
+    """
+    perfil = perfil or perfilado.Perfil("etl")
+    conn = esquema_db.conectar(db_path)
+    marcas = leer_marcas_agua(conn)
+    if not marcas or not esquema_db.esquema_vigente(conn, TABLA_GOLD):
+        conn.close()
+        print("ℹ️ No hay marcas de agua previas o la tabla gold usa el esquema antiguo, se ejecuta la carga completa.")
+        return procesar_hojas_excel(excel_path, db_path, n_workers=n_workers, perfil=perfil)
+
+    print("🔁 Iniciando ETL incremental con OptiGas.")
+    print("📄 Cargando hojas de Excel...")
+    with perfil.etapa("lectura_excel") as registro:
+        df_all = leer_excel(excel_path)
+        registro["filas_salida"] = len(df_all)
+
+    # Quedarse solo con lecturas posteriores a la marca de agua de cada cliente
+    marca = df_all['Cliente'].map(marcas)
+    df_nuevo = df_all[marca.isna() | (df_all['Fecha'] > marca)]
+    if df_nuevo.empty:
+        conn.close()
+        print("✅ No hay lecturas nuevas. La tabla gold ya está al día.")
+        return
+
+    with perfil.etapa("duplicados", len(df_nuevo)) as registro:
+        df_nuevo = tratar_duplicados(df_nuevo)
+        registro["filas_salida"] = len(df_nuevo)
+    clientes_nuevos = df_nuevo['Cliente'].unique()
+    print(f"✅ {len(df_nuevo)} lecturas nuevas de {len(clientes_nuevos)} cliente(s).")
+
+    # Agregar el contexto previo de cada cliente y repetir las transformaciones
+    with perfil.etapa("contexto") as registro:
+        contexto = leer_contexto(conn, marcas, [c for c in clientes_nuevos if c in marcas])
+        registro["filas_salida"] = len(contexto)
+    df = pd.concat([contexto, df_nuevo], ignore_index=True)
+    with perfil.etapa("regularizacion", len(df)) as registro:
+        df, calidad = regularizar_horario(df)
+        registro["filas_salida"] = len(df)
+    reportar_calidad(calidad)
+    with perfil.etapa("stl", len(df)) as registro:
+        df, omitidos_stl = descomponer_stl_clientes(df, 'Temperatura', n_workers=n_workers, perfil=perfil)
+        registro["filas_salida"] = len(df)
+    reportar_omitidos(omitidos_stl)
+    if df.empty:
+        conn.close()
+        print("⚠️ Ningún cliente con lecturas nuevas pudo procesarse.")
+        return
+
+    with perfil.etapa("escalado", len(df)) as registro:
+        df, escaladores = escalar_por_cliente(df, cargar_escaladores(conn))
+        registro["filas_salida"] = len(df)
+
+    # Descartar el contexto: solo se escriben las filas posteriores a la marca de agua
+    marca = df['Cliente'].map(marcas)
+    df = df[marca.isna() | (df['Fecha'] > marca)]
+    df = df.drop(columns=['index']).rename(columns=COLUMNAS_GOLD)
+
+    # Almacén, luego SQLite y al final las marcas de agua: si una escritura falla,
+    # las marcas no avanzan y la siguiente ejecución vuelve a procesar las lecturas
+    with perfil.etapa("almacen", len(df)) as registro:
+        almacen_gold.actualizar_tabla(df, "lecturas_completas")
+        registro["filas_salida"] = len(df)
+    with perfil.etapa("carga_sqlite", len(df)) as registro:
+        esquema_db.upsert_tabla(conn, df, TABLA_GOLD)
+        registro["filas_salida"] = len(df)
+    with conn:
+        guardar_escaladores(conn, escaladores)
+        guardar_marcas_agua(conn, df.groupby('cliente_id')['timestamp'].max().to_dict())
+    conn.close()
+    print(f"✅ Tabla '{TABLA_GOLD}' actualizada con {df.shape[0]} registros nuevos.")
+    print("\n🏁 ETL incremental completado exitosamente.")
+
 if __name__ == "__main__":
-    procesar_hojas_excel(EXCEL_PATH, DB_PATH)
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="ETL de OptiGas: Excel crudo -> tabla gold en SQLite")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Procesos para la descomposición STL por cliente (0 = todos los núcleos)")
+    parser.add_argument("--incremental", action="store_true",
+                        help="Procesa solo las lecturas posteriores a la marca de agua de cada cliente")
+    parser.add_argument("--sin-checkpoints", action="store_true",
+                        help="Ejecuta todas las etapas sin leer ni guardar checkpoints")
+    parser.add_argument("--profile", action="store_true",
+                        help=f"Guarda un reporte JSON de tiempos, memoria y filas por etapa y cliente en {perfilado.PERFILES_DIR}")
+    parser.add_argument("--profile-etapa", default=None,
+                        help="Etapa a ejecutar bajo cProfile (p. ej. stl); guarda un archivo .prof junto al reporte")
+    args = parser.parse_args()
+
+    perfil = perfilado.Perfil("etl", etapa_cprofile=args.profile_etapa)
+    if args.incremental:
+        procesar_incremental(EXCEL_PATH, DB_PATH, n_workers=args.workers or None, perfil=perfil)
+    else:
+        procesar_hojas_excel(EXCEL_PATH, DB_PATH, n_workers=args.workers or None,
+                             usar_checkpoints=not args.sin_checkpoints, perfil=perfil)
+    if args.profile or args.profile_etapa:
+        perfil.guardar()
\ No newline at end of file
@@ -0,0 +1,111 @@
+import hashlib
+from pathlib import Path
+
+import numpy as np
+from scipy import sparse
+from sklearn.cluster import DBSCAN
+from sklearn.neighbors import NearestNeighbors
+
+# Carpeta donde se guarda el grafo de vecinos por radio de cada cliente
+GRAFOS_DIR = Path("data/cache/grafos")
+
+# Puntos consultados por lote al construir el grafo; acota la memoria temporal de
+# las consultas de vecinos a la de un lote
+TAMANO_LOTE = 20_000
+
+
+def huella_features(features):
+    """
+    Hash del contenido de la matriz de features (cambia si cambian los datos del cliente).
+    """
+    features = np.ascontiguousarray(features, dtype="float64")
+    h = hashlib.sha256(features.tobytes())
+    h.update(str(features.shape).encode())
+    return h.hexdigest()
+
+
+def construir_grafo(features, radio, tamano_lote=TAMANO_LOTE):
+    """
+    Grafo disperso (CSR) con la distancia euclidiana entre cada par de puntos a
+    distancia <= radio, incluido cada punto consigo mismo (distancia 0 explícita).
+    Se construye por lotes de filas para no materializar todas las vecindades a la vez.
+    """
+    features = np.asarray(features, dtype="float64")
+    vecinos = NearestNeighbors(radius=radio).fit(features)
+
+    datos, indices, conteos = [], [], []
+    for inicio in range(0, len(features), tamano_lote):
+        distancias, vecindades = vecinos.radius_neighbors(features[inicio:inicio + tamano_lote], sort_results=True)
+        conteos.append(np.fromiter((len(v) for v in vecindades), dtype=np.int64, count=len(vecindades)))
+        datos.append(np.concatenate(distancias))
+        indices.append(np.concatenate(vecindades))
+
+    if not conteos:
+        return sparse.csr_matrix((0, 0))
+    indptr = np.concatenate([[0], np.cumsum(np.concatenate(conteos))])
+    return sparse.csr_matrix((np.concatenate(datos), np.concatenate(indices), indptr),
+                             shape=(len(features), len(features)))
+
+
+def recortar_grafo(grafo, eps):
+    """
+    Subgrafo con las aristas de distancia <= eps. Se arma a mano para conservar los
+    ceros explícitos (puntos repetidos), que las operaciones de scipy eliminarían.
+    """
+    mascara = grafo.data <= eps
+    indptr = np.concatenate([[0], np.cumsum(mascara)])[grafo.indptr]
+    return sparse.csr_matrix((grafo.data[mascara], grafo.indices[mascara], indptr), shape=grafo.shape)
+
+
+def ruta_grafo(clave, digest, directorio=GRAFOS_DIR):
+    return Path(directorio) / f"{clave}-{digest[:16]}.npz"
+
+
+def guardar_grafo(grafo, radio, clave, digest, directorio=GRAFOS_DIR):
+    directorio = Path(directorio)
+    directorio.mkdir(parents=True, exist_ok=True)
+    ruta = ruta_grafo(clave, digest, directorio)
+    np.savez(ruta, data=grafo.data, indices=grafo.indices, indptr=grafo.indptr,
+             shape=np.array(grafo.shape), radio=np.array(radio))
+
+    # Eliminar grafos de versiones anteriores de los datos del cliente
+    for viejo in directorio.glob(f"{clave}-{'?' * 16}.npz"):
+        if viejo != ruta:
+            viejo.unlink()
+
+
+def leer_grafo(clave, digest, directorio=GRAFOS_DIR):
+    """
+    Devuelve (grafo, radio) guardado para esos datos, o (None, 0) si no existe.
+    """
+    ruta = ruta_grafo(clave, digest, directorio)
+    if not ruta.exists():
+        return None, 0.0
+    with np.load(ruta) as z:
+        grafo = sparse.csr_matrix((z["data"], z["indices"], z["indptr"]), shape=tuple(z["shape"]))
+        return grafo, float(z["radio"])
+
+
+def obtener_grafo(features, eps, clave, radio=None, directorio=GRAFOS_DIR):
+    """
+    Grafo de vecinos a distancia <= eps de los features de un cliente. Se reutiliza
+    el grafo guardado mientras los datos no cambien y su radio cubra eps (un eps
+    menor solo recorta aristas); si no, se construye con radio max(radio, eps) y se
+    guarda. Pasar un radio mayor permite explorar varios eps con una sola construcción.
+    """
+    digest = huella_features(features)
+    grafo, radio_guardado = leer_grafo(clave, digest, directorio)
+    if grafo is None or radio_guardado < eps:
+        radio_guardado = max(radio or eps, eps)
+        grafo = construir_grafo(features, radio_guardado)
+        guardar_grafo(grafo, radio_guardado, clave, digest, directorio)
+    return grafo if radio_guardado == eps else recortar_grafo(grafo, eps)
+
+
+def ajustar_dbscan_grafo(features, eps, min_samples, clave, radio=None, directorio=GRAFOS_DIR):
+    """
+    DBSCAN ajustado sobre el grafo de vecinos precalculado (metric='precomputed').
+    Cambiar min_samples o reducir eps no recalcula las distancias.
+    """
+    grafo = obtener_grafo(features, eps, clave, radio=radio, directorio=directorio)
+    return DBSCAN(eps=eps, min_samples=min_samples, metric="precomputed").fit(grafo)
@@ -0,0 +1,91 @@
+import hashlib
+import json
+import zipfile
+import posixpath
+import xml.etree.ElementTree as ET
+from pathlib import Path
+
+import pandas as pd
+
+# Carpeta donde se guarda la copia columnar (Parquet) de cada hoja del Excel crudo
+CACHE_DIR = Path("data/cache/hojas")
+
+# Partes del libro que afectan la lectura de cualquier hoja (textos compartidos y
+# formatos, de los que depende reconocer las fechas)
+PARTES_COMPARTIDAS = ["xl/sharedStrings.xml", "xl/styles.xml"]
+
+NS_MAIN = "{http://schemas.openxmlformats.org/spreadsheetml/2006/main}"
+NS_REL_DOC = "{http://schemas.openxmlformats.org/officeDocument/2006/relationships}"
+NS_REL_PKG = "{http://schemas.openxmlformats.org/package/2006/relationships}"
+
+
+def hash_hojas(excel_path):
+    """
+    Calcula un hash de contenido por hoja del .xlsx sin parsear las celdas: se leen
+    los bytes del XML de cada hoja dentro del zip junto con las partes compartidas.
+    Si el archivo no es un .xlsx se usa el hash del archivo completo para todas.
+    """
+    try:
+        with zipfile.ZipFile(excel_path) as z:
+            libro = ET.fromstring(z.read("xl/workbook.xml"))
+            rels = ET.fromstring(z.read("xl/_rels/workbook.xml.rels"))
+            destinos = {r.get("Id"): r.get("Target") for r in rels.iter(f"{NS_REL_PKG}Relationship")}
+
+            base = hashlib.sha256()
+            for parte in PARTES_COMPARTIDAS:
+                if parte in z.namelist():
+                    base.update(z.read(parte))
+
+            hashes = {}
+            for hoja in libro.iter(f"{NS_MAIN}sheet"):
+                destino = destinos[hoja.get(f"{NS_REL_DOC}id")]
+                miembro = destino.lstrip("/") if destino.startswith("/") else posixpath.join("xl", destino)
+                h = base.copy()
+                h.update(z.read(miembro))
+                hashes[hoja.get("name")] = h.hexdigest()
+            return hashes
+    except zipfile.BadZipFile:
+        digest = hashlib.sha256(Path(excel_path).read_bytes()).hexdigest()
+        return {nombre: digest for nombre in pd.ExcelFile(excel_path).sheet_names}
+
+
+def hash_libro(excel_path):
+    """
+    Hash de contenido del libro completo, combinando los hashes de sus hojas.
+    """
+    return hashlib.sha256(json.dumps(hash_hojas(excel_path), sort_keys=True).encode()).hexdigest()
+
+
+def ruta_cache(nombre, digest, cache_dir=CACHE_DIR):
+    return Path(cache_dir) / f"{nombre}-{digest[:16]}.parquet"
+
+
+def leer_hojas_excel(excel_path, cache_dir=CACHE_DIR):
+    """
+    Lee todas las hojas del Excel crudo (una por cliente) en un solo DataFrame con la
+    columna Cliente, reutilizando la caché Parquet de las hojas que no cambiaron.
+
+    Solo las hojas nuevas o modificadas se parsean, una a la vez y en modo de solo
+    lectura (openpyxl read_only), y se guardan en la caché antes de pasar a la
+    siguiente, de modo que nunca se mantiene el libro completo en memoria.
+    """
+    cache_dir = Path(cache_dir)
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    hashes = hash_hojas(excel_path)
+
+    pendientes = [nombre for nombre, digest in hashes.items() if not ruta_cache(nombre, digest, cache_dir).exists()]
+    if pendientes:
+        with pd.ExcelFile(excel_path, engine="openpyxl") as libro:
+            for nombre in pendientes:
+                df_hoja = libro.parse(sheet_name=nombre)
+                df_hoja.to_parquet(ruta_cache(nombre, hashes[nombre], cache_dir), index=False)
+
+                # Eliminar versiones anteriores de la misma hoja
+                for viejo in cache_dir.glob(f"{nombre}-{'?' * 16}.parquet"):
+                    if viejo != ruta_cache(nombre, hashes[nombre], cache_dir):
+                        viejo.unlink()
+
+    print(f"♻️ Hojas leídas desde caché: {len(hashes) - len(pendientes)} | parseadas del Excel: {len(pendientes)}")
+
+    return pd.concat([pd.read_parquet(ruta_cache(nombre, digest, cache_dir)).assign(Cliente=nombre)
+        for nombre, digest in hashes.items()], ignore_index=True)
@@ -0,0 +1,81 @@
+from collections import deque
+
+import numpy as np
+import pandas as pd
+from sortedcontainers import SortedList
+
+# Ventana por defecto de los cuartiles móviles
+VENTANA = "30D"
+
+
+def cuantil(valores, q):
+    """
+    Cuantil con interpolación lineal sobre una lista ordenada, con la misma fórmula
+    que pandas en rolling().quantile(). Cada acceso por posición es O(log n).
+    """
+    posicion = q * (len(valores) - 1)
+    i = int(posicion)
+    if posicion == i:
+        return valores[i]
+    bajo, alto = valores[i], valores[i + 1]
+    return bajo + (alto - bajo) * (posicion - i)
+
+
+class IQRMovil:
+    """
+    Límites IQR (Q1 - 1.5*IQR, Q3 + 1.5*IQR) sobre las lecturas de la ventana de
+    tiempo (t - ventana, t] de una variable. Las lecturas deben llegar en orden de
+    tiempo; agregar una lectura y descartar las que salen de la ventana cuesta
+    O(log n). Los valores NaN no entran a la ventana y siempre son alerta, como en
+    detectar_anomalias_IQR.
+    """
+
+    def __init__(self, ventana=VENTANA):
+        self.ventana = pd.Timedelta(ventana)
+        self.valores = SortedList()
+        self.lecturas = deque()
+        self.ultimo = None
+
+    def limites(self):
+        if not self.valores:
+            return np.nan, np.nan
+        Q1 = cuantil(self.valores, 0.25)
+        Q3 = cuantil(self.valores, 0.75)
+        IQR = Q3 - Q1
+        return Q1 - 1.5 * IQR, Q3 + 1.5 * IQR
+
+    def actualizar(self, timestamp, valor):
+        """
+        Agrega la lectura a la ventana y devuelve (lim_inf, lim_sup, alerta).
+        """
+        timestamp = pd.Timestamp(timestamp)
+        if self.ultimo is not None and timestamp < self.ultimo:
+            raise ValueError(f"Lectura fuera de orden: {timestamp} es anterior a {self.ultimo}")
+        self.ultimo = timestamp
+
+        if not np.isnan(valor):
+            self.valores.add(valor)
+            self.lecturas.append((timestamp, valor))
+        corte = timestamp - self.ventana
+        while self.lecturas and self.lecturas[0][0] <= corte:
+            self.valores.remove(self.lecturas.popleft()[1])
+
+        lim_inf, lim_sup = self.limites()
+        return lim_inf, lim_sup, not (lim_inf <= valor <= lim_sup)
+
+
+def alertas_iqr_movil(tiempos, valores, ventana=VENTANA):
+    """
+    Modo por lotes para un cliente: recorre las lecturas en orden de tiempo con un
+    IQRMovil por columna de `valores` (n x k) y devuelve las alertas (n x k) en el
+    orden original. Da las mismas alertas que recalcular los cuartiles sobre la
+    ventana de cada lectura.
+    """
+    tiempos = pd.DatetimeIndex(tiempos)
+    valores = np.asarray(valores, dtype="float64")
+    ventanas = [IQRMovil(ventana) for _ in range(valores.shape[1])]
+    alertas = np.empty(valores.shape, dtype=bool)
+    for i in np.argsort(tiempos.asi8, kind="stable"):
+        for j, movil in enumerate(ventanas):
+            alertas[i, j] = movil.actualizar(tiempos[i], valores[i, j])[2]
+    return alertas
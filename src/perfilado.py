@@ -0,0 +1,135 @@
+import cProfile
+import json
+import sys
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+
+try:
+    import resource
+except ImportError:
+    # Windows no tiene el módulo resource; ver rss_pico_mb()
+    resource = None
+
+# Carpeta de los reportes de --profile (JSON) y de los volcados de cProfile (.prof)
+PERFILES_DIR = Path("data/perfiles")
+
+
+def rss_pico_mb():
+    """
+    Pico de memoria residente (MB) del proceso y el mayor de sus procesos hijos ya
+    terminados (workers del pool). ru_maxrss está en KB en Linux y en bytes en macOS.
+    Sin el módulo resource (Windows) se usa psutil si está instalado, que da el pico
+    del proceso pero no el de los hijos; si tampoco está, la memoria se reporta None.
+    """
+    if resource is None:
+        try:
+            import psutil
+        except ImportError:
+            return None, None
+        memoria = psutil.Process().memory_info()
+        return round(getattr(memoria, "peak_wset", memoria.rss) / (1024 * 1024), 1), None
+
+    unidad = 1024 * 1024 if sys.platform == "darwin" else 1024
+    propio = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / unidad
+    hijos = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / unidad
+    return round(propio, 1), round(hijos, 1)
+
+
+def por_segundo(filas, segundos):
+    if filas is None or segundos <= 0:
+        return None
+    return round(filas / segundos, 1)
+
+
+class Perfil:
+    """
+    Registro de tiempos, memoria y filas de un proceso (ETL o detección) por etapa
+    y por cliente. La medición siempre está activa porque es barata; el reporte solo
+    se escribe con guardar(). Si se indica etapa_cprofile, esa etapa se ejecuta bajo
+    cProfile y sus estadísticas se vuelcan a un archivo .prof.
+    """
+
+    def __init__(self, proceso, etapa_cprofile=None, directorio=PERFILES_DIR):
+        self.proceso = proceso
+        self.etapa_cprofile = etapa_cprofile
+        self.directorio = Path(directorio)
+        self.fecha = datetime.now().strftime("%Y%m%d-%H%M%S")
+        self.inicio = time.perf_counter()
+        self.etapas = []
+        self.clientes = []
+        self.ruta_cprofile = None
+
+    @contextmanager
+    def etapa(self, nombre, filas_entrada=None):
+        """
+        Mide el bloque como una etapa. Devuelve el registro para que el llamador
+        complete registro["filas_salida"] (u otros datos) antes de salir.
+        """
+        registro = {"etapa": nombre, "filas_entrada": filas_entrada, "filas_salida": None}
+        rss_antes, _ = rss_pico_mb()
+        perfilador = cProfile.Profile() if nombre == self.etapa_cprofile else None
+        t0 = time.perf_counter()
+        if perfilador is not None:
+            perfilador.enable()
+        try:
+            yield registro
+        finally:
+            segundos = time.perf_counter() - t0
+            if perfilador is not None:
+                perfilador.disable()
+                self.directorio.mkdir(parents=True, exist_ok=True)
+                self.ruta_cprofile = self.directorio / f"{self.proceso}-{nombre}-{self.fecha}.prof"
+                perfilador.dump_stats(self.ruta_cprofile)
+
+            rss, rss_hijos = rss_pico_mb()
+            registro.update({
+                "segundos": round(segundos, 4),
+                "filas_por_segundo": por_segundo(registro["filas_entrada"], segundos),
+                "rss_pico_mb": rss,
+                "rss_pico_incremento_mb": round(rss - rss_antes, 1) if rss is not None else None,
+                "rss_pico_hijos_mb": rss_hijos,
+            })
+            self.etapas.append(registro)
+
+    def registrar_cliente(self, etapa, cliente, segundos, filas=None):
+        self.clientes.append({
+            "etapa": etapa,
+            "cliente": cliente,
+            "segundos": round(segundos, 4),
+            "filas": filas,
+            "filas_por_segundo": por_segundo(filas, segundos),
+        })
+
+    @contextmanager
+    def cliente(self, etapa, cliente, filas=None):
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.registrar_cliente(etapa, cliente, time.perf_counter() - t0, filas)
+
+    def reporte(self):
+        rss, rss_hijos = rss_pico_mb()
+        return {
+            "proceso": self.proceso,
+            "fecha": self.fecha,
+            "segundos_totales": round(time.perf_counter() - self.inicio, 4),
+            "rss_pico_mb": rss,
+            "rss_pico_hijos_mb": rss_hijos,
+            "etapas": self.etapas,
+            "clientes": self.clientes,
+            "cprofile": str(self.ruta_cprofile) if self.ruta_cprofile else None,
+        }
+
+    def guardar(self, ruta=None):
+        """
+        Escribe el reporte JSON y devuelve su ruta.
+        """
+        ruta = Path(ruta) if ruta else self.directorio / f"{self.proceso}-{self.fecha}.json"
+        ruta.parent.mkdir(parents=True, exist_ok=True)
+        with open(ruta, "w", encoding="utf-8") as f:
+            json.dump(self.reporte(), f, indent=2, ensure_ascii=False)
+        print(f"⏱️ Reporte de perfilado guardado en: {ruta}")
+        return ruta
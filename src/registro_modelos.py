@@ -0,0 +1,248 @@
+import argparse
+import hashlib
+import json
+import sqlite3
+import threading
+from collections import OrderedDict
+from pathlib import Path
+
+import joblib
+import numpy as np
+import pandas as pd
+
+# Carpeta de artefactos entrenados y su manifiesto
+MODELOS_DIR = Path("src/modelos")
+MANIFIESTO = "manifiesto.json"
+
+# Memoria máxima (MB) de artefactos cargados antes de descargar los menos usados
+PRESUPUESTO_MB = 64
+
+# Prefijo de archivo de cada tipo de modelo; el escalador define el grupo
+TIPOS_MODELO = {
+    "isolation_forest": "isolation_forest_",
+    "oneclass_svm": "oneclass_svm_",
+    "dbscan": "dbscan_",
+}
+PREFIJO_ESCALADOR = "scaler_dbscan_"
+
+
+def sha256_archivo(ruta):
+    h = hashlib.sha256()
+    with open(ruta, "rb") as f:
+        for bloque in iter(lambda: f.read(1 << 20), b""):
+            h.update(bloque)
+    return h.hexdigest()
+
+
+def generar_manifiesto(modelos_dir=MODELOS_DIR, anterior=None):
+    """
+    Describe los artefactos de la carpeta: por grupo, su escalador, modelos, orden de
+    variables y, si se registró, ventana de entrenamiento; además el tamaño y hash
+    de cada archivo. La asignación de clientes y las ventanas del manifiesto
+    anterior se conservan. Un grupo sin ventana conocida no lleva el campo
+    ventana_entrenamiento, en lugar de una ventana vacía.
+    """
+    modelos_dir = Path(modelos_dir)
+    anterior = anterior or {}
+    grupos = {}
+    for ruta in sorted(modelos_dir.glob(f"{PREFIJO_ESCALADOR}*.joblib")):
+        grupo = ruta.stem[len(PREFIJO_ESCALADOR):]
+        escalador = joblib.load(ruta)
+        ventana = anterior.get("grupos", {}).get(grupo, {}).get("ventana_entrenamiento")
+        grupos[grupo] = {
+            "escalador": ruta.name,
+            "modelos": {
+                tipo: f"{prefijo}{grupo}.joblib"
+                for tipo, prefijo in TIPOS_MODELO.items()
+                if (modelos_dir / f"{prefijo}{grupo}.joblib").exists()
+            },
+            "variables": [str(v) for v in escalador.feature_names_in_],
+        }
+        if ventana and any(ventana.values()):
+            grupos[grupo]["ventana_entrenamiento"] = ventana
+
+    artefactos = {
+        ruta.name: {"bytes": ruta.stat().st_size, "sha256": sha256_archivo(ruta)}
+        for ruta in sorted(modelos_dir.glob("*.joblib"))
+    }
+    return {"grupos": grupos, "clientes": anterior.get("clientes", {}), "artefactos": artefactos}
+
+
+def leer_manifiesto(modelos_dir=MODELOS_DIR):
+    ruta = Path(modelos_dir) / MANIFIESTO
+    if not ruta.exists():
+        return None
+    with open(ruta, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def guardar_manifiesto(manifiesto, modelos_dir=MODELOS_DIR):
+    with open(Path(modelos_dir) / MANIFIESTO, "w", encoding="utf-8") as f:
+        json.dump(manifiesto, f, indent=2, ensure_ascii=False)
+        f.write("\n")
+
+
+def bytes_privados(objeto, bytes_archivo):
+    """
+    Estimación de la memoria propia de un artefacto: el tamaño del archivo menos los
+    arreglos mapeados en memoria (compartidos entre procesos vía la caché de páginas).
+    Solo se comparten los arreglos que son atributos directos del modelo (vectores
+    soporte del One-Class SVM, núcleos de DBSCAN). Los árboles del Isolation Forest
+    se reconstruyen al cargar y quedan copiados en cada proceso, así que cuentan
+    completos como memoria propia.
+    """
+    mapeados = sum(v.nbytes for v in vars(objeto).values() if isinstance(v, np.memmap))
+    return max(bytes_archivo - mapeados, 0)
+
+
+def grupo_mas_cercano(escaladores, lecturas):
+    """
+    Grupo cuyo escalador (StandardScaler) describe mejor las lecturas de un cliente:
+    el de menor log-verosimilitud negativa media de una normal con la media y la
+    desviación del escalador en cada variable. `escaladores` es {grupo: (escalador,
+    variables)}.
+    """
+    costos = {}
+    for grupo, (escalador, variables) in escaladores.items():
+        X = lecturas[variables].to_numpy("float64")
+        costos[grupo] = np.nanmean(((X - escalador.mean_) / escalador.scale_) ** 2 + 2 * np.log(escalador.scale_))
+    return min(costos, key=costos.get)
+
+
+def asignar_clientes(escaladores, lecturas):
+    """
+    Asigna a cada cliente de `lecturas` (con cliente_id y las variables de los
+    escaladores) el grupo más cercano a su historia.
+    """
+    return {
+        str(cliente): grupo_mas_cercano(escaladores, df_cliente)
+        for cliente, df_cliente in lecturas.groupby("cliente_id", observed=True)
+    }
+
+
+class RegistroModelos:
+    """
+    Acceso a los artefactos de src/modelos a través del manifiesto. Cada artefacto
+    se carga solo cuando se pide, con los arreglos numpy mapeados en memoria
+    (joblib mmap_mode='r'), y los menos usados se descargan cuando la memoria
+    estimada supera el presupuesto.
+    """
+
+    def __init__(self, modelos_dir=MODELOS_DIR, presupuesto_mb=PRESUPUESTO_MB):
+        self.modelos_dir = Path(modelos_dir)
+        self.manifiesto = leer_manifiesto(self.modelos_dir) or generar_manifiesto(self.modelos_dir)
+        self.presupuesto = presupuesto_mb * 1024 * 1024
+        self.cargados = OrderedDict()
+        self.bytes_en_uso = 0
+        self.candado = threading.Lock()
+
+    def grupos(self):
+        return list(self.manifiesto["grupos"])
+
+    def grupo(self, grupo):
+        if grupo not in self.manifiesto["grupos"]:
+            raise KeyError(f"No hay modelos para el grupo '{grupo}'. Disponibles: {self.grupos()}")
+        return self.manifiesto["grupos"][grupo]
+
+    def asignacion(self):
+        return dict(self.manifiesto["clientes"])
+
+    def obtener(self, clave, fabrica, estimar_bytes):
+        """
+        Devuelve el objeto de la clave, creándolo con fabrica() si no está cargado.
+        Al agregar uno nuevo se descargan los de uso más antiguo hasta volver al
+        presupuesto (nunca el recién cargado).
+        """
+        with self.candado:
+            if clave in self.cargados:
+                self.cargados.move_to_end(clave)
+                return self.cargados[clave][0]
+
+        objeto = fabrica()
+        tamano = estimar_bytes(objeto)
+        with self.candado:
+            if clave not in self.cargados:
+                self.cargados[clave] = (objeto, tamano)
+                self.bytes_en_uso += tamano
+            while self.bytes_en_uso > self.presupuesto and len(self.cargados) > 1:
+                _, (_, liberado) = self.cargados.popitem(last=False)
+                self.bytes_en_uso -= liberado
+            return objeto
+
+    def artefacto(self, archivo):
+        ruta = self.modelos_dir / archivo
+        return self.obtener(
+            archivo,
+            lambda: joblib.load(ruta, mmap_mode="r"),
+            lambda objeto: bytes_privados(objeto, ruta.stat().st_size),
+        )
+
+    def escalador(self, grupo):
+        return self.artefacto(self.grupo(grupo)["escalador"])
+
+    def modelo(self, grupo, tipo):
+        """
+        Modelo del tipo pedido (isolation_forest, oneclass_svm, dbscan) o None si el
+        grupo no lo tiene.
+        """
+        archivo = self.grupo(grupo)["modelos"].get(tipo)
+        return self.artefacto(archivo) if archivo else None
+
+    def estado(self):
+        return {
+            "cargados": list(self.cargados),
+            "mb_en_uso": round(self.bytes_en_uso / 1024 / 1024, 2),
+            "presupuesto_mb": round(self.presupuesto / 1024 / 1024, 2),
+        }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Manifiesto de los modelos entrenados de src/modelos")
+    subparsers = parser.add_subparsers(dest="comando", required=True)
+
+    p_generar = subparsers.add_parser("generar", help="Genera o actualiza src/modelos/manifiesto.json")
+    p_generar.add_argument("--cliente", action="append", default=[], metavar="CLIENTE=GRUPO",
+                           help="Asigna un cliente a un grupo de modelos (repetible)")
+    p_generar.add_argument("--grupo", default=None, help="Grupo al que se asigna la ventana de entrenamiento")
+    p_generar.add_argument("--desde", default=None, help="Inicio de la ventana de entrenamiento del grupo")
+    p_generar.add_argument("--hasta", default=None, help="Fin de la ventana de entrenamiento del grupo")
+    p_generar.add_argument("--asignar-desde", default=None, metavar="DB",
+                           help="Asigna los clientes sin grupo al más cercano según su historia en gold_lecturas_completas")
+
+    subparsers.add_parser("listar", help="Muestra los grupos, sus modelos y los clientes asignados")
+    args = parser.parse_args()
+
+    if args.comando == "generar":
+        manifiesto = generar_manifiesto(anterior=leer_manifiesto())
+        if args.asignar_desde:
+            escaladores = {
+                grupo: (joblib.load(MODELOS_DIR / info["escalador"]), info["variables"])
+                for grupo, info in manifiesto["grupos"].items()
+            }
+            variables = sorted({v for _, vs in escaladores.values() for v in vs})
+            with sqlite3.connect(args.asignar_desde) as conn:
+                lecturas = pd.read_sql(f"SELECT cliente_id, {', '.join(variables)} FROM gold_lecturas_completas", conn)
+            for cliente, grupo in asignar_clientes(escaladores, lecturas).items():
+                if cliente not in manifiesto["clientes"]:
+                    manifiesto["clientes"][cliente] = grupo
+                    print(f"🔗 {cliente} -> {grupo} (grupo más cercano a su historia)")
+        for asignacion in args.cliente:
+            cliente, grupo = asignacion.split("=", 1)
+            if grupo not in manifiesto["grupos"]:
+                parser.error(f"El grupo '{grupo}' no existe. Disponibles: {list(manifiesto['grupos'])}")
+            manifiesto["clientes"][cliente] = grupo
+        if args.grupo:
+            if not (args.desde or args.hasta):
+                parser.error("--grupo requiere --desde y/o --hasta")
+            manifiesto["grupos"][args.grupo]["ventana_entrenamiento"] = {"desde": args.desde, "hasta": args.hasta}
+        guardar_manifiesto(manifiesto)
+        print(f"✅ Manifiesto guardado en: {MODELOS_DIR / MANIFIESTO} ({len(manifiesto['grupos'])} grupos)")
+    else:
+        registro = RegistroModelos()
+        for grupo in registro.grupos():
+            info = registro.grupo(grupo)
+            clientes = [c for c, g in registro.asignacion().items() if g == grupo]
+            ventana = info.get("ventana_entrenamiento")
+            ventana = f"{ventana['desde'] or '...'} a {ventana['hasta'] or '...'}" if ventana else "sin registrar"
+            print(f"📦 {grupo}: {', '.join(info['modelos'])} | variables {info['variables']} | "
+                  f"ventana {ventana} | clientes {clientes or '-'}")
@@ -0,0 +1,99 @@
+import numpy as np
+import pandas as pd
+
+import almacen_gold
+import esquema_db
+
+# Resumen diario por cliente de gold_anomalias, en SQLite y en el almacén columnar.
+# La columna timestamp es el inicio del día, así que los filtros por cliente y fecha
+# (y las particiones cliente/mes) son los mismos que los de las lecturas.
+TABLA = "gold_resumen_diario"
+TABLA_ALMACEN = "resumen_diario"
+
+SEVERIDADES = ["Alto", "Potencial", "OK"]
+
+
+def calcular(df):
+    """
+    Resume las lecturas (timestamp, cliente_id, volumen, severidad) por cliente y día:
+    filas, última lectura, suma, mínimo, máximo, media y desviación estándar del
+    volumen y número de lecturas de cada severidad.
+    """
+    df = df.assign(
+        ultima_lectura=df["timestamp"],
+        timestamp=df["timestamp"].dt.floor("D"),
+        volumen=df["volumen"].astype("float64"),
+        **{f"num_{s}": df["severidad"] == s for s in SEVERIDADES},
+    )
+    diario = df.groupby(["cliente_id", "timestamp"], observed=True).agg(
+        filas=("volumen", "size"),
+        ultima_lectura=("ultima_lectura", "max"),
+        volumen_n=("volumen", "count"),
+        volumen_suma=("volumen", "sum"),
+        volumen_min=("volumen", "min"),
+        volumen_max=("volumen", "max"),
+        volumen_media=("volumen", "mean"),
+        volumen_std=("volumen", "std"),
+        **{f"num_{s}": (f"num_{s}", "sum") for s in SEVERIDADES},
+    ).reset_index()
+    diario["cliente_id"] = diario["cliente_id"].astype(str)
+    return diario
+
+
+def combinar(diario, por="cliente_id"):
+    """
+    Combina días de resumen en totales por `por`. La desviación estándar se obtiene
+    de las medias y desviaciones diarias (suma de cuadrados dentro de cada día más
+    la dispersión entre días), igual a la de las lecturas horarias sin recorrerlas.
+    """
+    grupos = diario.groupby(por, observed=True)
+    total = grupos.agg(
+        filas=("filas", "sum"),
+        ultima_lectura=("ultima_lectura", "max"),
+        volumen_n=("volumen_n", "sum"),
+        volumen_suma=("volumen_suma", "sum"),
+        volumen_min=("volumen_min", "min"),
+        volumen_max=("volumen_max", "max"),
+        **{f"num_{s}": (f"num_{s}", "sum") for s in SEVERIDADES},
+    )
+    total["volumen_media"] = total["volumen_suma"] / total["volumen_n"]
+
+    media = grupos["volumen_suma"].transform("sum") / grupos["volumen_n"].transform("sum")
+    dentro = diario["volumen_std"].fillna(0) ** 2 * (diario["volumen_n"] - 1).clip(lower=0)
+    entre = (diario["volumen_n"] * (diario["volumen_media"] - media) ** 2).fillna(0)
+    cuadrados = diario.assign(cuadrados=dentro + entre).groupby(por, observed=True)["cuadrados"].sum()
+    total["volumen_std"] = np.sqrt(cuadrados / (total["volumen_n"] - 1)).where(total["volumen_n"] > 1)
+    return total
+
+
+def guardar(conn, df):
+    """
+    Reemplaza el resumen diario completo a partir de todas las lecturas puntuadas.
+    """
+    diario = calcular(df)
+    almacen_gold.escribir_tabla(diario, TABLA_ALMACEN)
+    esquema_db.cargar_tabla(conn, diario, TABLA)
+    return diario
+
+
+def actualizar(conn, df):
+    """
+    Recalcula solo los días de cada cliente que tienen lecturas en `df` (recién
+    puntuadas), releyendo de gold_anomalias las lecturas de esos días.
+    """
+    if not esquema_db.esquema_vigente(conn, TABLA):
+        return guardar(conn, esquema_db.leer_sql(
+            "SELECT timestamp, cliente_id, volumen, severidad FROM gold_anomalias", conn))
+
+    partes = []
+    for cliente, df_cliente in df.groupby("cliente_id", observed=True):
+        dias = df_cliente["timestamp"].dt.floor("D")
+        clausula, params = esquema_db.filtro_sql([cliente], desde=dias.min())
+        lecturas = esquema_db.leer_sql(
+            f"SELECT timestamp, cliente_id, volumen, severidad FROM gold_anomalias{clausula}", conn, params)
+        partes.append(lecturas[lecturas["timestamp"].dt.floor("D").isin(dias)])
+    diario = calcular(pd.concat(partes, ignore_index=True))
+    # Mismo orden que guardar: primero el almacén y después SQLite
+    almacen_gold.actualizar_tabla(diario, TABLA_ALMACEN)
+    esquema_db.upsert_tabla(conn, diario, TABLA)
+    return diario
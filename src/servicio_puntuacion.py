@@ -0,0 +1,231 @@
+import argparse
+import json
+import sys
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+import pandas as pd
+from sklearn.neighbors import NearestNeighbors
+
+from registro_modelos import RegistroModelos
+
+# Latencias que se conservan para calcular p50/p99
+VENTANA_LATENCIAS = 10_000
+
+COLUMNAS_SALIDA = ["anomalia_iso", "anomalia_svm", "anomalia_dbscan", "anomalia_general"]
+
+# Variables que deben venir en cada lectura, en unidades originales
+VARIABLES_ENTRADA = ["volumen", "presion", "temperatura"]
+
+
+class LecturaInvalida(ValueError):
+    """
+    Lecturas sin alguna de las variables de VARIABLES_ENTRADA o con un valor no numérico.
+    """
+
+
+def validar_lecturas(lecturas):
+    """
+    Comprueba que cada lectura tenga volumen, presión y temperatura numéricos antes de
+    puntuar, para responder con la fila que falla en lugar del error de sklearn.
+    """
+    faltantes = [v for v in VARIABLES_ENTRADA if v not in lecturas.columns]
+    if faltantes:
+        raise LecturaInvalida(f"Faltan las columnas: {', '.join(faltantes)}")
+    valores = lecturas[VARIABLES_ENTRADA].apply(pd.to_numeric, errors="coerce")
+    invalidas = valores.isna().any(axis=1).to_numpy()
+    if invalidas.any():
+        # El índice es la posición en el cuerpo HTTP o la fila del CSV
+        posicion = int(np.flatnonzero(invalidas)[0])
+        variables = [v for v in VARIABLES_ENTRADA if valores[v].isna().iloc[posicion]]
+        raise LecturaInvalida(
+            f"Lectura {lecturas.index[posicion]} sin valor numérico en: {', '.join(variables)} "
+            f"({int(invalidas.sum())} lectura(s) inválida(s) en el lote)"
+        )
+
+
+class ClienteSinGrupo(KeyError):
+    """
+    Lecturas de clientes sin grupo en el manifiesto y sin grupo indicado en la llamada.
+    """
+
+
+def indice_nucleos(registro, grupo):
+    """
+    DBSCAN no predice puntos nuevos, así que se usa un índice de vecinos sobre sus
+    muestras núcleo: una lectura es ruido si no tiene ninguna a distancia <= eps.
+    El índice se guarda en el registro como un artefacto derivado más.
+    """
+    dbscan = registro.modelo(grupo, "dbscan")
+    if dbscan is None:
+        return None, None
+    indice = registro.obtener(
+        (grupo, "nucleos_dbscan"),
+        lambda: NearestNeighbors(n_neighbors=1).fit(dbscan.components_),
+        lambda _: 2 * dbscan.components_.nbytes,
+    )
+    return indice, dbscan.eps
+
+
+def puntuar_grupo(registro, grupo, lecturas):
+    """
+    Devuelve un arreglo booleano (n x 4) en el orden de COLUMNAS_SALIDA con los
+    modelos del grupo. Los modelos que el grupo no tiene marcan False.
+    """
+    variables = registro.grupo(grupo)["variables"]
+    X = registro.escalador(grupo).transform(lecturas[variables])
+    banderas = np.zeros((len(X), len(COLUMNAS_SALIDA)), dtype=bool)
+
+    isolation_forest = registro.modelo(grupo, "isolation_forest")
+    if isolation_forest is not None:
+        banderas[:, 0] = isolation_forest.predict(X) == -1
+    oneclass_svm = registro.modelo(grupo, "oneclass_svm")
+    if oneclass_svm is not None:
+        banderas[:, 1] = oneclass_svm.predict(X) == -1
+    nucleos, eps = indice_nucleos(registro, grupo)
+    if nucleos is not None:
+        distancia, _ = nucleos.kneighbors(X)
+        banderas[:, 2] = distancia[:, 0] > eps
+    banderas[:, 3] = banderas[:, :3].any(axis=1)
+    return banderas
+
+
+class ServicioPuntuacion:
+    """
+    Puntúa micro-lotes de lecturas nuevas con los modelos del registro, que quedan
+    cargados entre llamadas (precargar=True los carga todos al iniciar, dentro del
+    presupuesto de memoria del registro). Registra la latencia de cada llamada para
+    reportar p50/p99.
+    """
+
+    def __init__(self, registro=None, asignacion=None, precargar=True):
+        self.registro = registro or RegistroModelos()
+        self.asignacion = self.registro.asignacion() if asignacion is None else asignacion
+        self.latencias = deque(maxlen=VENTANA_LATENCIAS)
+        if precargar:
+            for grupo in self.registro.grupos():
+                self.registro.escalador(grupo)
+                for tipo in self.registro.grupo(grupo)["modelos"]:
+                    self.registro.modelo(grupo, tipo)
+                indice_nucleos(self.registro, grupo)
+
+    def puntuar(self, lecturas, grupo=None):
+        """
+        Puntúa un lote de lecturas (DataFrame con volumen, presion y temperatura en
+        unidades originales). Si no se indica `grupo`, se usa el de cada fila según la
+        asignación de clientes del manifiesto; un cliente sin asignación es un error
+        (ClienteSinGrupo), para no puntuarlo con los modelos de otro grupo. Devuelve
+        las lecturas con la columna grupo y las de COLUMNAS_SALIDA. Una lectura sin
+        volumen, presión o temperatura numéricos es un error (LecturaInvalida).
+        """
+        t0 = time.perf_counter()
+        validar_lecturas(lecturas)
+        if grupo is not None:
+            grupos = pd.Series(grupo, index=lecturas.index)
+        else:
+            grupos = lecturas["cliente_id"].map(self.asignacion)
+            sin_grupo = sorted(lecturas.loc[grupos.isna(), "cliente_id"].astype(str).unique())
+            if sin_grupo:
+                raise ClienteSinGrupo(
+                    f"Clientes sin grupo en el manifiesto: {', '.join(sin_grupo)}. Indique el grupo o asígnelo con "
+                    "registro_modelos.py generar --cliente CLIENTE=GRUPO (o --asignar-desde DB)"
+                )
+
+        banderas = np.zeros((len(lecturas), len(COLUMNAS_SALIDA)), dtype=bool)
+        for nombre, posiciones in grupos.groupby(grupos, sort=False).indices.items():
+            banderas[posiciones] = puntuar_grupo(self.registro, nombre, lecturas.iloc[posiciones])
+
+        resultado = lecturas.copy()
+        resultado["grupo"] = grupos
+        resultado[COLUMNAS_SALIDA] = banderas
+        self.latencias.append(time.perf_counter() - t0)
+        return resultado
+
+    def resumen_latencias(self):
+        if not self.latencias:
+            return {"llamadas": 0, "p50_ms": None, "p99_ms": None}
+        ms = np.array(self.latencias) * 1000
+        return {
+            "llamadas": len(ms),
+            "p50_ms": round(float(np.percentile(ms, 50)), 3),
+            "p99_ms": round(float(np.percentile(ms, 99)), 3),
+        }
+
+
+def crear_manejador(servicio):
+    class Manejador(BaseHTTPRequestHandler):
+        """
+        POST /puntuar con {"grupo": opcional, "lecturas": [{...}, ...]} devuelve las
+        lecturas con sus banderas; GET /latencias devuelve p50/p99.
+        """
+
+        def responder(self, codigo, cuerpo):
+            datos = json.dumps(cuerpo, default=str).encode()
+            self.send_response(codigo)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(datos)))
+            self.end_headers()
+            self.wfile.write(datos)
+
+        def do_GET(self):
+            if self.path == "/latencias":
+                self.responder(200, servicio.resumen_latencias())
+            else:
+                self.responder(404, {"error": "ruta no encontrada"})
+
+        def do_POST(self):
+            if self.path != "/puntuar":
+                return self.responder(404, {"error": "ruta no encontrada"})
+            try:
+                cuerpo = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+                resultado = servicio.puntuar(pd.DataFrame(cuerpo["lecturas"]), grupo=cuerpo.get("grupo"))
+            except (KeyError, ValueError) as e:
+                return self.responder(400, {"error": str(e.args[0]) if e.args else repr(e)})
+            self.responder(200, {"lecturas": resultado.to_dict(orient="records")})
+
+        def log_message(self, formato, *args):
+            pass
+
+    return Manejador
+
+
+def servir(servicio, host="127.0.0.1", puerto=8765):
+    servidor = ThreadingHTTPServer((host, puerto), crear_manejador(servicio))
+    print(f"🚀 Servicio de puntuación escuchando en http://{host}:{puerto} (POST /puntuar, GET /latencias)")
+    try:
+        servidor.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        servidor.server_close()
+        print(f"⏱️ Latencias: {servicio.resumen_latencias()}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Puntuación de lecturas con los modelos entrenados de src/modelos")
+    subparsers = parser.add_subparsers(dest="comando", required=True)
+
+    p_servir = subparsers.add_parser("servir", help="Expone el servicio por HTTP local")
+    p_servir.add_argument("--host", default="127.0.0.1")
+    p_servir.add_argument("--puerto", type=int, default=8765)
+
+    p_puntuar = subparsers.add_parser("puntuar", help="Puntúa un CSV de lecturas (o stdin) y escribe CSV a stdout")
+    p_puntuar.add_argument("archivo", nargs="?", default="-")
+    p_puntuar.add_argument("--grupo", default=None, help="Grupo de modelos; por defecto el asignado a cada cliente_id")
+    p_puntuar.add_argument("--lote", type=int, default=500, help="Lecturas por micro-lote")
+    parser.add_argument("--presupuesto-mb", type=float, default=None,
+                        help="Memoria máxima de modelos cargados (por defecto la del registro)")
+    args = parser.parse_args()
+
+    registro = RegistroModelos() if args.presupuesto_mb is None else RegistroModelos(presupuesto_mb=args.presupuesto_mb)
+    servicio = ServicioPuntuacion(registro)
+    if args.comando == "servir":
+        servir(servicio, args.host, args.puerto)
+    else:
+        lecturas = pd.read_csv(sys.stdin if args.archivo == "-" else args.archivo)
+        for inicio in range(0, len(lecturas), args.lote):
+            lote = servicio.puntuar(lecturas.iloc[inicio:inicio + args.lote], grupo=args.grupo)
+            lote.to_csv(sys.stdout, index=False, header=inicio == 0)
+        print(f"⏱️ Latencias: {servicio.resumen_latencias()}", file=sys.stderr)
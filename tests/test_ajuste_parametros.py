@@ -0,0 +1,27 @@
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+import ajuste_parametros
+import anomaly_detection
+
+
+def candidato(eps, min_samp):
+    return {"eps": eps, "min_samp": min_samp, "silueta": 0.5, "fraccion_ruido": 0.01, "grupos": 2}
+
+
+def test_ajustar_un_cliente_conserva_los_demas(tmp_path):
+    ruta = tmp_path / "parametros_deteccion.json"
+    ajuste_parametros.guardar_parametros({
+        "CLIENTE1": (candidato(0.3, 10), []),
+        "CLIENTE2": (candidato(0.75, 40), []),
+    }, ruta)
+
+    # Como python src/ajuste_parametros.py --cliente CLIENTE1; un cliente sin candidato
+    # válido tampoco pierde su entrada anterior
+    ajuste_parametros.guardar_parametros({"CLIENTE1": (candidato(0.4, 20), []), "CLIENTE2": (None, [])}, ruta)
+
+    parametros = anomaly_detection.parametros_clientes(ruta)
+    assert (parametros["CLIENTE1"]["eps"], parametros["CLIENTE1"]["min_samp"]) == (0.4, 20)
+    assert (parametros["CLIENTE2"]["eps"], parametros["CLIENTE2"]["min_samp"]) == (0.75, 40)
+    assert parametros["CLIENTE3"]["eps"] == anomaly_detection.Cliente["CLIENTE3"]["eps"]
@@ -0,0 +1,49 @@
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+import almacen_gold
+
+
+def lecturas(clientes, meses, inicio="2019-01-01"):
+    """
+    Una lectura por día para cada cliente durante `meses` meses, con los clientes
+    intercalados (sin ordenar por partición), como llegan de la detección.
+    """
+    fechas = pd.date_range(inicio, periods=meses, freq="MS")
+    fechas = fechas.repeat(28) + pd.to_timedelta(np.tile(np.arange(28), meses), unit="D")
+    df = pd.DataFrame({
+        "timestamp": np.tile(fechas, clientes),
+        "cliente_id": np.repeat([f"CLIENTE{i}" for i in range(clientes)], len(fechas)),
+    })
+    df["volumen"] = np.arange(len(df), dtype="float64")
+    return df.sample(frac=1, random_state=0).reset_index(drop=True)
+
+
+def test_escribir_mas_de_1024_particiones(tmp_path):
+    # 25 clientes x 45 meses = 1125 pares cliente/mes
+    df = lecturas(clientes=25, meses=45)
+    almacen_gold.escribir_tabla(df, "anomalias", raiz=tmp_path)
+
+    leidas = almacen_gold.leer_tabla("anomalias", raiz=tmp_path)
+    assert len(leidas) == len(df)
+    assert len(list((tmp_path / "anomalias").glob("cliente_id=*/mes=*"))) == 25 * 45
+    assert all(len(list(p.iterdir())) == 1 for p in (tmp_path / "anomalias").glob("cliente_id=*/mes=*"))
+    assert leidas["volumen"].sum() == df["volumen"].sum()
+
+
+def test_actualizar_mas_de_1024_particiones(tmp_path):
+    almacen_gold.escribir_tabla(lecturas(clientes=25, meses=2), "anomalias", raiz=tmp_path)
+
+    # Las filas nuevas tocan 1125 particiones, de las cuales 50 ya existen
+    nuevas = lecturas(clientes=25, meses=45)
+    nuevas["volumen"] = -1.0
+    almacen_gold.actualizar_tabla(nuevas, "anomalias", raiz=tmp_path)
+
+    leidas = almacen_gold.leer_tabla("anomalias", raiz=tmp_path)
+    assert len(leidas) == len(nuevas)
+    assert (leidas["volumen"] == -1.0).all()
+    assert leidas.duplicated(["cliente_id", "timestamp"]).sum() == 0
@@ -0,0 +1,47 @@
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+import anomaly_detection
+
+
+def lecturas_cliente(n):
+    return pd.DataFrame({
+        "timestamp": pd.date_range("2019-01-01", periods=n, freq="h"),
+        "cliente_id": "CLIENTE1",
+        "presion": np.ones(n),
+        "temperatura": np.ones(n),
+        "volumen": np.ones(n),
+    })
+
+
+def test_severidad_reglas_antes_que_modelo():
+    alerta_presion = np.array([True, False, False, False, True])
+    alerta_temperatura = np.array([False, False, False, True, False])
+    anomalia_modelo = np.array([1, 1, 0, 0, 0])
+    df = anomaly_detection.completar_cliente(
+        lecturas_cliente(5), (alerta_presion, alerta_temperatura, anomalia_modelo, None))
+
+    # Igual que el apply fila a fila original: Alto si hay alerta de reglas,
+    # Potencial si solo DBSCAN la marca, OK en otro caso
+    assert df["severidad"].tolist() == ["Alto", "Potencial", "OK", "Alto", "Alto"]
+    assert df["severidad"].dtype == object
+    assert df["alerta_reglas"].tolist() == [True, False, False, True, True]
+
+
+def test_severidad_con_ensamble():
+    sin_alertas = np.zeros(4, dtype=bool)
+    banderas = {
+        "anomalia_iso": np.array([True, False, False, False]),
+        "anomalia_svm": np.array([False, True, False, False]),
+    }
+    anomalia_modelo = np.array([0, 0, 1, 0])
+    df = anomaly_detection.completar_cliente(
+        lecturas_cliente(4), (sin_alertas, sin_alertas, anomalia_modelo, banderas))
+
+    # Con pesos iguales y umbral 1/3 basta que un modelo marque la lectura
+    assert df["severidad"].tolist() == ["Potencial", "Potencial", "Potencial", "OK"]
+    np.testing.assert_allclose(df["puntaje_ensamble"], [1 / 3, 1 / 3, 1 / 3, 0])
@@ -0,0 +1,64 @@
+import sys
+from pathlib import Path
+
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "benchmarks"))
+import benchmark
+import generador
+
+
+def etapa(segundos, filas_por_segundo):
+    return {"segundos": segundos, "filas": 1000, "filas_por_segundo": filas_por_segundo, "rss_pico_mb": 100}
+
+
+def test_comparar():
+    linea_base = {"1x": {
+        "etl/stl": etapa(10, 1000),
+        "etl/escalado": etapa(2, 1000),
+        "etl/duplicados": etapa(0.1, 1000),
+    }}
+    resultados = {
+        "1x": {
+            "etl/stl": etapa(15, 700),
+            "etl/escalado": etapa(2.2, 850),
+            "etl/duplicados": etapa(0.4, 250),
+            "deteccion/deteccion": etapa(30, 10),
+        },
+        "10x": {"etl/stl": etapa(100, 10)},
+    }
+
+    # Solo stl cae más del 20 %; duplicados es demasiado corta para comparar y las
+    # etapas o escalas sin línea base no se comparan
+    regresiones = benchmark.comparar(resultados, linea_base, umbral=0.2)
+    assert [(escala, nombre) for escala, nombre, *_ in regresiones] == [("1x", "etl/stl")]
+    assert round(regresiones[0][-1], 2) == -0.3
+    assert benchmark.comparar(resultados, linea_base, umbral=0.5) == []
+
+
+def test_generar_lecturas():
+    hojas = generador.generar_lecturas(3, 0.5, semilla=1)
+    horas = int(0.5 * generador.HORAS_ANIO)
+
+    assert list(hojas) == ["CLIENTE1", "CLIENTE2", "CLIENTE3"]
+    for cliente, hoja in hojas.items():
+        assert list(hoja.columns) == ["Fecha", "Presion", "Temperatura", "Volumen"]
+        assert hoja["Fecha"].is_monotonic_increasing
+        assert hoja["Fecha"].min() >= pd.Timestamp(generador.INICIO)
+        # Huecos inyectados en todos los clientes; duplicados solo en los que tienen estrategia
+        assert hoja["Fecha"].nunique() < horas
+        assert hoja["Fecha"].duplicated().any() == (cliente in generador.ESTRATEGIAS_DUPLICADOS)
+        # Anomalías inyectadas, entre ellas presión en cero
+        assert (hoja["Presion"] == 0).any()
+
+    # Misma semilla, mismos datos
+    pd.testing.assert_frame_equal(generador.generar_lecturas(3, 0.5, semilla=1)["CLIENTE2"], hojas["CLIENTE2"])
+
+
+def test_escribir_excel(tmp_path):
+    hojas = generador.generar_lecturas(2, 0.01, semilla=1)
+    ruta = generador.escribir_excel(hojas, tmp_path / "sintetico.xlsx")
+
+    leidas = pd.read_excel(ruta, sheet_name=None)
+    assert list(leidas) == list(hojas)
+    pd.testing.assert_frame_equal(leidas["CLIENTE1"], hojas["CLIENTE1"], check_dtype=False)
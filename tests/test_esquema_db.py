@@ -0,0 +1,32 @@
+import sqlite3
+import sys
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+import esquema_db
+
+
+@pytest.mark.parametrize("unidad", ["s", "ms", "us", "ns"])
+def test_a_epoch_no_depende_de_la_resolucion(unidad):
+    # pandas 3 devuelve datetime64[s] al leer con unit="s"; los segundos deben ser los mismos
+    fechas = pd.Series(pd.to_datetime(["2019-02-17 23:00:00", "2019-02-18 00:00:00", "1969-12-31 23:59:59"]))
+    esperado = [1550444400, 1550448000, -1]
+    assert esquema_db.a_epoch(fechas.astype(f"datetime64[{unidad}]")).tolist() == esperado
+    assert esquema_db.a_epoch(fechas.astype(f"datetime64[{unidad}]")[1]) == esperado[1]
+
+
+def test_upsert_de_timestamps_en_segundos():
+    conn = sqlite3.connect(":memory:")
+    df = pd.DataFrame({
+        "cliente_id": ["CLIENTE1", "CLIENTE1"],
+        "timestamp": pd.to_datetime(["2019-02-18 00:00", "2019-02-18 01:00"]).astype("datetime64[s]"),
+        "volumen": [1.0, 2.0],
+        "severidad": ["OK", "Alto"],
+    })
+    esquema_db.upsert_tabla(conn, df, "gold_anomalias")
+
+    leidas = esquema_db.leer_sql("SELECT cliente_id, timestamp, volumen FROM gold_anomalias ORDER BY timestamp", conn)
+    assert leidas["timestamp"].tolist() == df["timestamp"].tolist()
@@ -0,0 +1,69 @@
+import importlib
+import sys
+from functools import partial
+from pathlib import Path
+
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+import etapas
+
+
+def duplicar(df, columna):
+    return df.assign(**{columna: df[columna] * 2})
+
+
+def test_reanuda_sin_cambios_y_reejecuta_si_cambia_el_codigo(tmp_path, monkeypatch):
+    llamadas = []
+
+    def cargar_entrada():
+        llamadas.append("entrada")
+        return pd.DataFrame({"x": [1, 2, 3]})
+
+    lista = [("duplicar", partial(duplicar), {"columna": "x"})]
+    df, _ = etapas.ejecutar_etapas(lista, "libro", cargar_entrada, directorio=tmp_path)
+    assert df["x"].tolist() == [2, 4, 6]
+
+    # Mismo código: se recupera del checkpoint sin leer la entrada
+    etapas.ejecutar_etapas(lista, "libro", cargar_entrada, directorio=tmp_path)
+    assert llamadas == ["entrada"]
+
+    # Código distinto: el checkpoint anterior no sirve
+    monkeypatch.setattr(etapas, "version_codigo", lambda funcion: "otra version")
+    etapas.ejecutar_etapas(lista, "libro", cargar_entrada, directorio=tmp_path)
+    assert llamadas == ["entrada", "entrada"]
+
+
+MODULO_ETAPAS = """
+FACTOR = {factor}
+
+
+def auxiliar(df):
+    return df * FACTOR + {suma}
+
+
+def etapa(df):
+    return auxiliar(df) + 1
+
+
+def otra_etapa(df):
+    return df - {resta}
+"""
+
+
+def version_etapa(tmp_path, monkeypatch, nombre, funcion="etapa", factor=2, resta=1, suma=0):
+    ruta = tmp_path / f"{nombre}.py"
+    ruta.write_text(MODULO_ETAPAS.format(factor=factor, resta=resta, suma=suma))
+    monkeypatch.syspath_prepend(str(tmp_path))
+    modulo = importlib.import_module(nombre)
+    return etapas.version_codigo(partial(getattr(modulo, funcion)))
+
+
+def test_version_codigo_es_la_de_la_etapa(tmp_path, monkeypatch):
+    base = version_etapa(tmp_path, monkeypatch, "etapas_base")
+
+    # Otra función del módulo no cuenta; la etapa, sus auxiliares y sus constantes sí
+    assert version_etapa(tmp_path, monkeypatch, "etapas_resta", resta=5) == base
+    assert version_etapa(tmp_path, monkeypatch, "etapas_factor", factor=3) != base
+    assert version_etapa(tmp_path, monkeypatch, "etapas_auxiliar", suma=1) != base
+    assert version_etapa(tmp_path, monkeypatch, "etapas_otra", funcion="otra_etapa") != base
@@ -0,0 +1,66 @@
+import sqlite3
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+import almacen_gold
+import esquema_db
+import etl_raw_to_gold
+
+
+def escribir_libro(ruta, horas, semilla=0):
+    """
+    Libro con una hoja por cliente (Fecha, Presion, Temperatura, Volumen), como Datos.xlsx.
+    Con la misma semilla, un libro con más horas extiende al más corto.
+    """
+    rng = np.random.default_rng(semilla)
+    with pd.ExcelWriter(ruta) as libro:
+        for cliente in ["CLIENTE1", "CLIENTE2"]:
+            valores = rng.normal(20, 1, (120, 3))[:horas]
+            pd.DataFrame({
+                "Fecha": pd.date_range("2019-01-14", periods=horas, freq="h"),
+                "Presion": valores[:, 0],
+                "Temperatura": valores[:, 1],
+                "Volumen": valores[:, 2],
+            }).to_excel(libro, sheet_name=cliente, index=False)
+    return ruta
+
+
+class FalloAlmacen(Exception):
+    pass
+
+
+def test_marcas_de_agua_no_avanzan_si_falla_el_almacen(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    db = str(tmp_path / "optigas.db")
+    etl_raw_to_gold.procesar_hojas_excel(escribir_libro(tmp_path / "inicial.xlsx", 72), db, export_csv=False,
+                                         usar_checkpoints=False)
+    libro = escribir_libro(tmp_path / "completo.xlsx", 120)
+
+    def fallar(*args, **kwargs):
+        raise FalloAlmacen()
+
+    actualizar_tabla = almacen_gold.actualizar_tabla
+    monkeypatch.setattr(almacen_gold, "actualizar_tabla", fallar)
+    with pytest.raises(FalloAlmacen):
+        etl_raw_to_gold.procesar_incremental(libro, db)
+    with sqlite3.connect(db) as conn:
+        assert set(etl_raw_to_gold.leer_marcas_agua(conn).values()) == {pd.Timestamp("2019-01-16 23:00")}
+
+    # La siguiente ejecución vuelve a procesar las mismas lecturas
+    monkeypatch.setattr(almacen_gold, "actualizar_tabla", actualizar_tabla)
+    etl_raw_to_gold.procesar_incremental(libro, db)
+
+    with sqlite3.connect(db) as conn:
+        sqlite = esquema_db.leer_sql(f"SELECT cliente_id, timestamp FROM {etl_raw_to_gold.TABLA_GOLD}", conn)
+    almacen = almacen_gold.leer_tabla("lecturas_completas", columnas=["cliente_id", "timestamp"])
+    assert len(sqlite) == 2 * 120
+    pd.testing.assert_frame_equal(
+        almacen[["cliente_id", "timestamp"]].astype({"cliente_id": str}).sort_values(["cliente_id", "timestamp"])
+        .reset_index(drop=True),
+        sqlite.sort_values(["cliente_id", "timestamp"]).reset_index(drop=True),
+    )
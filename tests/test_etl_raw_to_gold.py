@@ -0,0 +1,117 @@
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+import etl_raw_to_gold
+
+
+def hojas(filas):
+    """
+    DataFrame con la forma de las hojas del Excel crudo a partir de tuplas
+    (Fecha, Presion, Temperatura, Volumen, Cliente).
+    """
+    df = pd.DataFrame(filas, columns=["Fecha", "Presion", "Temperatura", "Volumen", "Cliente"])
+    df["Fecha"] = pd.to_datetime(df["Fecha"])
+    return df
+
+
+def test_tratar_duplicados():
+    df = hojas([
+        ("2019-01-01 00:00", 7.0, 1.0, 1.0, "CLIENTE1"),
+        ("2019-01-01 00:00", 1.0, 10.0, 1.0, "CLIENTE2"),
+        ("2019-01-01 00:00", 3.0, 20.0, 2.0, "CLIENTE2"),
+        ("2019-01-01 01:00", 5.0, 5.0, 5.0, "CLIENTE2"),
+        ("2019-01-01 00:00", 1.0, 1.0, 2.0, "CLIENTE3"),
+        ("2019-01-01 00:00", 9.0, 1.0, 1.0, "CLIENTE1"),
+        ("2019-01-01 00:00", 8.0, 60.0, 3.0, "CLIENTE2"),
+        ("2019-01-01 00:00", 2.0, 4.0, np.nan, "CLIENTE3"),
+        ("2019-01-01 00:00", 1.0, 3.0, 1.0, "CLIENTE18"),
+        ("2019-01-01 00:00", 2.0, 5.0, 10.0, "CLIENTE18"),
+    ])
+    resultado = etl_raw_to_gold.tratar_duplicados(df)
+
+    # Los clientes sin estrategia quedan intactos (con sus duplicados) y al inicio;
+    # luego un registro por (Cliente, Fecha) en orden de cliente y fecha
+    esperado = hojas([
+        ("2019-01-01 00:00", 7.0, 1.0, 1.0, "CLIENTE1"),
+        ("2019-01-01 00:00", 9.0, 1.0, 1.0, "CLIENTE1"),
+        # CLIENTE18: promedio de presión y temperatura, mediana del volumen
+        ("2019-01-01 00:00", 1.5, 4.0, 5.5, "CLIENTE18"),
+        # CLIENTE2: mediana
+        ("2019-01-01 00:00", 3.0, 20.0, 2.0, "CLIENTE2"),
+        ("2019-01-01 01:00", 5.0, 5.0, 5.0, "CLIENTE2"),
+        # CLIENTE3: promedio, ignorando los NaN
+        ("2019-01-01 00:00", 1.5, 2.5, 2.0, "CLIENTE3"),
+    ])
+    pd.testing.assert_frame_equal(resultado[esperado.columns], esperado)
+
+
+def test_regularizar_horario():
+    df = hojas([
+        ("2019-01-01 00:00", 0.0, 20.0, 1.0, "CLIENTE2"),
+        ("2019-01-01 03:00", 3.0, 26.0, 4.0, "CLIENTE2"),
+        ("2019-01-01 05:00", np.nan, np.nan, 1.0, "CLIENTE1"),
+        ("2019-01-01 06:00", 2.0, 10.0, 2.0, "CLIENTE1"),
+        ("2019-01-01 08:00", 4.0, np.nan, 6.0, "CLIENTE1"),
+    ])
+    resultado, calidad = etl_raw_to_gold.regularizar_horario(df)
+
+    # Grilla horaria por cliente en el orden de aparición; la interpolación no
+    # cruza clientes: los NaN iniciales se mantienen y los finales toman el último valor
+    esperado = hojas([
+        ("2019-01-01 00:00", 0.0, 20.0, 1.0, "CLIENTE2"),
+        ("2019-01-01 01:00", 1.0, 22.0, 2.0, "CLIENTE2"),
+        ("2019-01-01 02:00", 2.0, 24.0, 3.0, "CLIENTE2"),
+        ("2019-01-01 03:00", 3.0, 26.0, 4.0, "CLIENTE2"),
+        ("2019-01-01 05:00", np.nan, np.nan, 1.0, "CLIENTE1"),
+        ("2019-01-01 06:00", 2.0, 10.0, 2.0, "CLIENTE1"),
+        ("2019-01-01 07:00", 3.0, 10.0, 4.0, "CLIENTE1"),
+        ("2019-01-01 08:00", 4.0, 10.0, 6.0, "CLIENTE1"),
+    ])
+    pd.testing.assert_frame_equal(resultado, esperado, check_index_type=False)
+    assert calidad["horas"].tolist() == [4, 4]
+    assert calidad["horas_imputadas"].tolist() == [2, 1]
+    assert calidad["pct_imputadas"].tolist() == [50.0, 25.0]
+    assert calidad.index.tolist() == ["CLIENTE2", "CLIENTE1"]
+
+
+def test_escalar_datos():
+    df = pd.DataFrame({
+        "Cliente": ["CLIENTE1", "CLIENTE2", "CLIENTE1", "CLIENTE1", "CLIENTE2"],
+        "Presion": [1.0, 4.0, 2.0, 3.0, 4.0],
+        "TemperaturaSinTendencia": [0.5, 10.0, 0.5, -1.0, 20.0],
+        "Volumen": [5.0, 1.0, 5.0, 5.0, 3.0],
+    })
+    resultado = etl_raw_to_gold.escalar_datos(df)
+
+    # StandardScaler por cliente (desviación poblacional); las series constantes quedan en 0
+    z = np.sqrt(1.5)
+    esperado = np.array([
+        [-z, np.sqrt(0.5), 0.0],
+        [0.0, -1.0, -1.0],
+        [0.0, np.sqrt(0.5), 0.0],
+        [z, -np.sqrt(2.0), 0.0],
+        [0.0, 1.0, 1.0],
+    ])
+    escaladas = resultado[["Presion_scaled", "Temperatura_scaled", "Volumen_scaled"]]
+    assert (escaladas.dtypes == "float32").all()
+    np.testing.assert_allclose(escaladas.to_numpy(), esperado, atol=1e-6)
+
+
+def test_escalar_por_cliente_usa_parametros_guardados():
+    historia = pd.DataFrame({
+        "Cliente": ["CLIENTE1"] * 3,
+        "Presion": [1.0, 2.0, 3.0],
+        "TemperaturaSinTendencia": [0.0, 1.0, 2.0],
+        "Volumen": [2.0, 4.0, 6.0],
+    })
+    _, parametros = etl_raw_to_gold.escalar_por_cliente(historia)
+
+    # Las lecturas nuevas se transforman con la media y escala de la historia, sin reajustar
+    nuevas = historia.iloc[[2]].assign(Presion=5.0)
+    resultado, parametros_despues = etl_raw_to_gold.escalar_por_cliente(nuevas, parametros)
+    pd.testing.assert_frame_equal(parametros_despues, parametros)
+    np.testing.assert_allclose(resultado["Presion_scaled"], [3 / np.sqrt(2 / 3)], rtol=1e-6)
@@ -0,0 +1,49 @@
+import sys
+from pathlib import Path
+
+import numpy as np
+from sklearn.cluster import DBSCAN
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+import grafo_vecinos
+
+
+def features_cliente(semilla=0):
+    """
+    Dos grupos densos, puntos dispersos y lecturas repetidas (distancia 0 entre sí).
+    """
+    rng = np.random.default_rng(semilla)
+    features = np.vstack([
+        rng.normal(0, 0.2, (300, 3)),
+        rng.normal(2, 0.3, (200, 3)),
+        rng.uniform(-3, 5, (30, 3)),
+    ])
+    return np.vstack([features, features[:20]])
+
+
+def test_dbscan_sobre_grafo_guardado_igual_a_dbscan(tmp_path):
+    features = features_cliente()
+    esperado = DBSCAN(eps=0.3, min_samples=5).fit(features)
+
+    # La primera llamada construye y guarda el grafo con radio 0.5; la segunda lo lee y lo recorta
+    for _ in range(2):
+        modelo = grafo_vecinos.ajustar_dbscan_grafo(features, 0.3, 5, "CLIENTE1", radio=0.5, directorio=tmp_path)
+        np.testing.assert_array_equal(modelo.labels_, esperado.labels_)
+        np.testing.assert_array_equal(modelo.core_sample_indices_, esperado.core_sample_indices_)
+    assert len(list(tmp_path.glob("CLIENTE1-*.npz"))) == 1
+    assert (esperado.labels_ == -1).any() and esperado.labels_.max() >= 1
+
+
+def test_recortar_grafo_igual_a_construirlo_con_eps_menor():
+    features = features_cliente(semilla=1)
+    recortado = grafo_vecinos.recortar_grafo(grafo_vecinos.construir_grafo(features, 0.6, tamano_lote=128), 0.25)
+    directo = grafo_vecinos.construir_grafo(features, 0.25, tamano_lote=128)
+
+    # Dentro de cada fila los vecinos a igual distancia pueden venir en otro orden
+    recortado, directo = recortado.sorted_indices(), directo.sorted_indices()
+
+    np.testing.assert_array_equal(recortado.indptr, directo.indptr)
+    np.testing.assert_array_equal(recortado.indices, directo.indices)
+    np.testing.assert_array_equal(recortado.data, directo.data)
+    # Se conservan los ceros explícitos de cada punto consigo mismo y de las lecturas repetidas
+    assert (recortado.data == 0).sum() == len(features) + 2 * 20
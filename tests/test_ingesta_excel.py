@@ -0,0 +1,70 @@
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+import ingesta_excel
+
+
+def escribir_libro(ruta, volumen_cliente2=1.0):
+    with pd.ExcelWriter(ruta) as libro:
+        for cliente, volumen in [("CLIENTE1", 1.0), ("CLIENTE2", volumen_cliente2)]:
+            pd.DataFrame({
+                "Fecha": pd.date_range("2019-01-14", periods=24, freq="h"),
+                "Presion": np.linspace(17, 18, 24),
+                "Temperatura": np.linspace(20, 25, 24),
+                "Volumen": np.full(24, volumen),
+            }).to_excel(libro, sheet_name=cliente, index=False)
+    return ruta
+
+
+@pytest.fixture
+def hojas_parseadas(monkeypatch):
+    """
+    Registra las hojas que se parsean del Excel (las que no salen de la caché).
+    """
+    parseadas = []
+    parse = pd.ExcelFile.parse
+
+    def registrar(self, sheet_name=0, **kwargs):
+        parseadas.append(sheet_name)
+        return parse(self, sheet_name=sheet_name, **kwargs)
+
+    monkeypatch.setattr(pd.ExcelFile, "parse", registrar)
+    return parseadas
+
+
+def test_segunda_lectura_sale_de_la_cache(tmp_path, hojas_parseadas):
+    libro = escribir_libro(tmp_path / "Datos.xlsx")
+    cache = tmp_path / "cache"
+
+    primera = ingesta_excel.leer_hojas_excel(libro, cache)
+    assert hojas_parseadas == ["CLIENTE1", "CLIENTE2"]
+
+    segunda = ingesta_excel.leer_hojas_excel(libro, cache)
+    assert hojas_parseadas == ["CLIENTE1", "CLIENTE2"]
+    pd.testing.assert_frame_equal(segunda, primera)
+    assert sorted(primera["Cliente"].unique()) == ["CLIENTE1", "CLIENTE2"]
+
+
+def test_hoja_modificada_invalida_solo_su_entrada(tmp_path, hojas_parseadas):
+    cache = tmp_path / "cache"
+    antes = ingesta_excel.hash_hojas(escribir_libro(tmp_path / "Datos.xlsx"))
+    ingesta_excel.leer_hojas_excel(tmp_path / "Datos.xlsx", cache)
+    cache_cliente1 = ingesta_excel.ruta_cache("CLIENTE1", antes["CLIENTE1"], cache)
+
+    libro = escribir_libro(tmp_path / "Datos.xlsx", volumen_cliente2=5.0)
+    despues = ingesta_excel.hash_hojas(libro)
+    assert despues["CLIENTE1"] == antes["CLIENTE1"]
+    assert despues["CLIENTE2"] != antes["CLIENTE2"]
+
+    df = ingesta_excel.leer_hojas_excel(libro, cache)
+    assert hojas_parseadas == ["CLIENTE1", "CLIENTE2", "CLIENTE2"]
+    assert (df.loc[df["Cliente"] == "CLIENTE2", "Volumen"] == 5.0).all()
+
+    # La entrada de CLIENTE1 se conserva y la versión anterior de CLIENTE2 se elimina
+    assert sorted(p.name for p in cache.iterdir()) == sorted([
+        cache_cliente1.name, ingesta_excel.ruta_cache("CLIENTE2", despues["CLIENTE2"], cache).name])
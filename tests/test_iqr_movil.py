@@ -0,0 +1,60 @@
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+import iqr_movil
+
+
+def test_alertas_iqr_movil_igual_a_rolling_quantile():
+    rng = np.random.default_rng(0)
+    # Lecturas horarias con huecos, NaN y picos
+    tiempos = pd.DatetimeIndex(np.sort(rng.choice(pd.date_range("2019-01-01", periods=24 * 90, freq="h"), 1500,
+                                                  replace=False)))
+    valores = rng.normal(20, 1, (len(tiempos), 2))
+    valores[rng.choice(len(tiempos), 30, replace=False), 0] *= 1.5
+    valores[rng.choice(len(tiempos), 10, replace=False), 1] = np.nan
+
+    ventana = "7D"
+    esperado = np.empty(valores.shape, dtype=bool)
+    for j in range(valores.shape[1]):
+        serie = pd.Series(valores[:, j], index=tiempos)
+        q1 = serie.rolling(ventana).quantile(0.25)
+        q3 = serie.rolling(ventana).quantile(0.75)
+        iqr = q3 - q1
+        esperado[:, j] = ~serie.between(q1 - 1.5 * iqr, q3 + 1.5 * iqr)
+
+    np.testing.assert_array_equal(iqr_movil.alertas_iqr_movil(tiempos, valores, ventana), esperado)
+    assert esperado.any()
+
+    # El orden de llegada no cambia el resultado
+    orden = rng.permutation(len(tiempos))
+    np.testing.assert_array_equal(iqr_movil.alertas_iqr_movil(tiempos[orden], valores[orden], ventana),
+                                  esperado[orden])
+
+
+def test_iqr_movil_agrega_y_descarta_lecturas():
+    movil = iqr_movil.IQRMovil("3h")
+    t = pd.Timestamp("2019-01-01")
+
+    movil.actualizar(t, 1.0)
+    movil.actualizar(t + pd.Timedelta(hours=1), 3.0)
+    movil.actualizar(t + pd.Timedelta(hours=2), np.nan)
+    assert list(movil.valores) == [1.0, 3.0]
+
+    # La ventana es (t - 3h, t]: a las 3h sale la lectura de las 0h
+    lim_inf, lim_sup, alerta = movil.actualizar(t + pd.Timedelta(hours=3), 2.0)
+    assert list(movil.valores) == [2.0, 3.0]
+    assert (lim_inf, lim_sup) == (2.25 - 1.5 * 0.5, 2.75 + 1.5 * 0.5)
+    assert not alerta
+
+    # A las 5h solo quedan la lectura de las 3h y la nueva
+    lim_inf, lim_sup, alerta = movil.actualizar(t + pd.Timedelta(hours=5), 10.0)
+    assert list(movil.valores) == [2.0, 10.0]
+    assert not alerta
+
+    with pytest.raises(ValueError):
+        movil.actualizar(t + pd.Timedelta(hours=4), 1.0)
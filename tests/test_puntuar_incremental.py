@@ -0,0 +1,71 @@
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+import almacen_gold
+import anomaly_detection
+import esquema_db
+
+
+def lecturas_gold(clientes, inicio, horas, semilla=0):
+    """
+    Lecturas horarias con las columnas de gold_lecturas_completas.
+    """
+    rng = np.random.default_rng(semilla)
+    fechas = pd.date_range(inicio, periods=horas, freq="h")
+    df = pd.DataFrame({
+        "cliente_id": np.repeat(clientes, horas),
+        "timestamp": np.tile(fechas, len(clientes)),
+    })
+    for columna in ["presion", "temperatura", "volumen"]:
+        df[columna] = rng.normal(10, 1, len(df))
+    df["TemperaturaSinTendencia"] = df["temperatura"] - 10
+    for columna in ["Presion_scaled", "Temperatura_scaled", "Volumen_scaled"]:
+        df[columna] = rng.normal(0, 1, len(df))
+    return df
+
+
+class FalloAlmacen(Exception):
+    pass
+
+
+def test_reintenta_lecturas_si_falla_el_almacen(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    Path("db").mkdir()
+    db = "db/optigas.db"
+    clientes = ["CLIENTE1", "CLIENTE2"]
+
+    conn = esquema_db.conectar(db)
+    esquema_db.cargar_tabla(conn, lecturas_gold(clientes, "2019-02-15", 72), "gold_lecturas_completas")
+    conn.close()
+    anomaly_detection.entrenar_por_cliente(db)
+
+    conn = esquema_db.conectar(db)
+    esquema_db.upsert_tabla(conn, lecturas_gold(clientes, "2019-02-18", 48, semilla=1), "gold_lecturas_completas")
+    conn.close()
+
+    def fallar(*args, **kwargs):
+        raise FalloAlmacen()
+
+    actualizar_tabla = almacen_gold.actualizar_tabla
+    monkeypatch.setattr(almacen_gold, "actualizar_tabla", fallar)
+    with pytest.raises(FalloAlmacen):
+        anomaly_detection.puntuar_incremental(db)
+
+    # SQLite no avanzó, así que la siguiente ejecución vuelve a puntuar las mismas lecturas
+    monkeypatch.setattr(almacen_gold, "actualizar_tabla", actualizar_tabla)
+    anomaly_detection.puntuar_incremental(db)
+
+    conn = esquema_db.conectar(db)
+    sqlite = esquema_db.leer_sql("SELECT cliente_id, timestamp FROM gold_anomalias", conn)
+    conn.close()
+    almacen = almacen_gold.leer_tabla("anomalias", columnas=["cliente_id", "timestamp"])
+    assert len(sqlite) == 2 * (72 + 48)
+    pd.testing.assert_frame_equal(
+        almacen[["cliente_id", "timestamp"]].astype({"cliente_id": str}).sort_values(["cliente_id", "timestamp"]).reset_index(drop=True),
+        sqlite.sort_values(["cliente_id", "timestamp"]).reset_index(drop=True),
+    )
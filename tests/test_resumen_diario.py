@@ -0,0 +1,57 @@
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+import almacen_gold
+import esquema_db
+import resumen_diario
+
+
+def anomalias(clientes, inicio, horas, semilla=0):
+    """
+    Lecturas horarias puntuadas con las columnas que usa el resumen diario.
+    """
+    rng = np.random.default_rng(semilla)
+    fechas = pd.date_range(inicio, periods=horas, freq="h")
+    return pd.DataFrame({
+        "cliente_id": np.repeat(clientes, horas),
+        "timestamp": np.tile(fechas, len(clientes)),
+        "volumen": rng.normal(100, 10, len(clientes) * horas),
+        "severidad": rng.choice(resumen_diario.SEVERIDADES, len(clientes) * horas),
+    })
+
+
+def ordenar(df):
+    return df.sort_values(["cliente_id", "timestamp"]).reset_index(drop=True)
+
+
+def test_actualizar_equivale_a_calcular_todo(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    conn = esquema_db.conectar("optigas.db")
+    clientes = ["CLIENTE1", "CLIENTE2"]
+
+    # Hasta el mediodía del 2019-02-17; el resto de ese día llega con las lecturas nuevas
+    historia = anomalias(clientes, "2019-02-15", 60)
+    esquema_db.cargar_tabla(conn, historia, "gold_anomalias")
+    resumen_diario.guardar(conn, historia)
+
+    # Como en el modo incremental, las lecturas nuevas vienen de leer_sql, que en
+    # pandas 3 devuelve datetime64[s]
+    nuevas = anomalias(clientes, "2019-02-17 12:00", 60, semilla=1)
+    nuevas["timestamp"] = nuevas["timestamp"].astype("datetime64[s]")
+    esquema_db.upsert_tabla(conn, nuevas, "gold_anomalias")
+    resumen_diario.actualizar(conn, nuevas)
+
+    esperado = ordenar(resumen_diario.calcular(esquema_db.leer_sql("SELECT * FROM gold_anomalias", conn)))
+    sqlite = ordenar(esquema_db.leer_sql(f"SELECT * FROM {resumen_diario.TABLA}", conn))
+    sqlite["ultima_lectura"] = pd.to_datetime(sqlite["ultima_lectura"], unit="s")
+    almacen = ordenar(almacen_gold.leer_tabla(resumen_diario.TABLA_ALMACEN).astype({"cliente_id": str}))
+    conn.close()
+
+    assert esperado["timestamp"].dt.strftime("%Y-%m-%d").unique().tolist() == [
+        "2019-02-15", "2019-02-16", "2019-02-17", "2019-02-18", "2019-02-19"]
+    pd.testing.assert_frame_equal(sqlite[esperado.columns], esperado, check_dtype=False)
+    pd.testing.assert_frame_equal(almacen[esperado.columns], esperado, check_dtype=False)
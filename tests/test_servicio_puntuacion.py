@@ -0,0 +1,46 @@
+import sys
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+RAIZ = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(RAIZ / "src"))
+from registro_modelos import RegistroModelos
+from servicio_puntuacion import ClienteSinGrupo, LecturaInvalida, ServicioPuntuacion
+
+
+@pytest.fixture
+def servicio():
+    registro = RegistroModelos(modelos_dir=RAIZ / "src" / "modelos")
+    return ServicioPuntuacion(registro, asignacion={"CLIENTE1": "grupo1"}, precargar=False)
+
+
+def lecturas(*clientes):
+    return pd.DataFrame({
+        "cliente_id": list(clientes),
+        "volumen": [100.0] * len(clientes),
+        "presion": [17.0] * len(clientes),
+        "temperatura": [25.0] * len(clientes),
+    })
+
+
+def test_cliente_sin_grupo_es_un_error(servicio):
+    with pytest.raises(ClienteSinGrupo, match="CLIENTE2"):
+        servicio.puntuar(lecturas("CLIENTE1", "CLIENTE2"))
+    assert "CLIENTE2" not in servicio.asignacion
+
+
+def test_respuesta_incluye_el_grupo(servicio):
+    assert servicio.puntuar(lecturas("CLIENTE1"))["grupo"].tolist() == ["grupo1"]
+    assert servicio.puntuar(lecturas("CLIENTE2"), grupo="grupo2")["grupo"].tolist() == ["grupo2"]
+
+
+def test_lectura_sin_variables_es_un_error_corto(servicio):
+    lote = lecturas("CLIENTE1", "CLIENTE1", "CLIENTE1")
+    lote.loc[1, "presion"] = None
+    with pytest.raises(LecturaInvalida, match=r"^Lectura 1 sin valor numérico en: presion \(1 lectura"):
+        servicio.puntuar(lote)
+
+    with pytest.raises(LecturaInvalida, match="Faltan las columnas: temperatura"):
+        servicio.puntuar(lote.drop(columns="temperatura"))
@@ -0,0 +1,42 @@
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "app"))
+from secciones import submuestreo
+
+
+def serie_cliente(n, semilla=0):
+    rng = np.random.default_rng(semilla)
+    df = pd.DataFrame({
+        "timestamp": pd.date_range("2019-01-01", periods=n, freq="h"),
+        "volumen": rng.normal(100, 10, n),
+        "presion": rng.normal(17, 1, n),
+        "severidad": rng.choice(["OK", "Alto", "Potencial"], n, p=[0.97, 0.02, 0.01]),
+    })
+    df.loc[rng.choice(n, 50, replace=False), "volumen"] = np.nan
+    # Llegan desordenadas, como tras filtrar y concatenar
+    return df.sample(frac=1, random_state=0)
+
+
+def test_conserva_todas_las_alertas_y_respeta_el_limite():
+    df = serie_cliente(50_000)
+    alertas = df["severidad"].isin(submuestreo.SEVERIDADES_ALERTA)
+
+    for columnas in (["volumen"], ["volumen", "presion"]):
+        resultado = submuestreo.submuestrear(df, columnas, puntos=600)
+        assert len(resultado) <= 600 + alertas.sum()
+        assert set(df.index[alertas]) <= set(resultado.index)
+        assert resultado["timestamp"].is_monotonic_increasing
+
+        # Cada cubeta conserva su mínimo y máximo, así que el rango de la serie no cambia
+        for columna in columnas:
+            assert resultado[columna].min() == df[columna].min()
+            assert resultado[columna].max() == df[columna].max()
+
+
+def test_series_cortas_sin_cambios():
+    df = serie_cliente(500)
+    pd.testing.assert_frame_equal(submuestreo.submuestrear(df, ["volumen"], puntos=600), df)